@@ -0,0 +1,3 @@
+# backtest/__init__.py
+from backtest.engine import run_backtest, backtest_percent, backtest_range, backtest_dca, BacktestResult
+from backtest.store import OHLCVStore, Candles
@@ -0,0 +1,225 @@
+# backtest/engine.py
+"""
+Бэктест стратегий Percent, Range и DCA на массивах цен (NumPy).
+
+Правила решений те же, что в percent_job / range_job / dca_job:
+- ордер пропускается, если amount * price < MIN_ORDER_USD;
+- стратегия останавливается на первой сделке, для которой не хватает баланса;
+- Percent: сделка при |Δ| >= step от base_price, после сделки base_price = price;
+- Range: покупка при price <= low, продажа при price >= high — на каждом тике вне диапазона;
+- DCA: покупка amount на каждом тике.
+
+Стратегия видит цену раз в interval минут: из минутных свечей берётся каждая
+interval / bar_minutes-я цена закрытия.
+
+Range и DCA считаются целиком векторно (сделки фиксированного размера, балансы — cumsum).
+Percent зависит от пути (base_price сдвигается после сделки) — для него плотный цикл,
+который компилируется numba, если она установлена, и идёт в чистом Python, если нет.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping
+
+import numpy as np
+
+from constants import MIN_ORDER_USD
+
+try:
+    from numba import njit
+except ImportError:  # numba не обязательна
+    njit = None
+
+FILL_DTYPE = np.dtype([
+    ("index", np.int64),    # номер тика
+    ("ts", np.int64),       # время тика (мс), если переданы timestamps
+    ("side", np.int8),      # +1 покупка, -1 продажа
+    ("price", np.float64),  # цена исполнения (с проскальзыванием)
+    ("qty", np.float64),
+    ("fee", np.float64),    # комиссия в quote
+])
+
+
+@dataclass
+class BacktestResult:
+    fills: np.ndarray       # структурированный массив FILL_DTYPE
+    equity: np.ndarray      # стоимость портфеля в quote на каждом тике
+    prices: np.ndarray      # цены тиков, которые видела стратегия
+    fees: float
+    start_equity: float
+    stopped_at: int | None  # тик, на котором стратегия остановилась из-за баланса
+
+    @property
+    def trades(self) -> int:
+        return len(self.fills)
+
+    @property
+    def final_equity(self) -> float:
+        return float(self.equity[-1]) if len(self.equity) else self.start_equity
+
+    @property
+    def return_pct(self) -> float:
+        return (self.final_equity / self.start_equity - 1.0) * 100.0 if self.start_equity else 0.0
+
+    @property
+    def max_drawdown_pct(self) -> float:
+        if not len(self.equity):
+            return 0.0
+        peak = np.maximum.accumulate(self.equity)
+        return float(np.max((peak - self.equity) / peak) * 100.0)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "return_pct": round(self.return_pct, 4),
+            "max_drawdown_pct": round(self.max_drawdown_pct, 4),
+            "trades": self.trades,
+            "fees": round(self.fees, 8),
+            "final_equity": round(self.final_equity, 8),
+            "stopped_at": self.stopped_at,
+        }
+
+
+# --- подготовка тиков ---
+def _ticks(prices: np.ndarray, timestamps: np.ndarray | None, interval: float, bar_minutes: float):
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 2:
+        prices = prices[:, 4]  # OHLCV: [ts, open, high, low, close, volume]
+    every = max(int(round(interval / bar_minutes)), 1)
+    ticks = prices[::every]
+    ts = np.asarray(timestamps, dtype=np.int64)[::every] if timestamps is not None else np.arange(len(ticks), dtype=np.int64)
+    return ticks, ts
+
+
+# --- сборка результата по индексам сделок ---
+def _build(ticks, ts, idx, sides, amount, quote, base, fee_rate, slippage, stopped_at) -> BacktestResult:
+    px = ticks[idx] * (1.0 + sides * slippage)
+    notional = px * amount
+    fee = notional * fee_rate
+
+    fills = np.empty(len(idx), dtype=FILL_DTYPE)
+    fills["index"] = idx
+    fills["ts"] = ts[idx]
+    fills["side"] = sides
+    fills["price"] = px
+    fills["qty"] = amount
+    fills["fee"] = fee
+
+    base_delta = np.zeros(len(ticks))
+    quote_delta = np.zeros(len(ticks))
+    base_delta[idx] = sides * amount
+    quote_delta[idx] = -sides * notional - fee
+    equity = (quote + np.cumsum(quote_delta)) + (base + np.cumsum(base_delta)) * ticks
+
+    start = quote + base * (ticks[0] if len(ticks) else 0.0)
+    return BacktestResult(fills, equity, ticks, float(fee.sum()), float(start), stopped_at)
+
+
+def _fixed_size(ticks, ts, candidates, sides, amount, quote, base, fee_rate, slippage) -> BacktestResult:
+    """Сделки фиксированного размера: балансы перед каждой сделкой — накопленные суммы."""
+    px = ticks[candidates] * (1.0 + sides * slippage)
+    cost = px * amount
+    fee = cost * fee_rate
+    quote_after = quote + np.cumsum(-sides * cost - fee)
+    base_after = base + np.cumsum(sides * amount)
+    quote_before = np.concatenate(([quote], quote_after[:-1]))
+    base_before = np.concatenate(([base], base_after[:-1]))
+    ok = np.where(sides > 0, quote_before >= cost + fee, base_before >= amount)
+
+    stopped_at = None
+    if not ok.all():
+        first_bad = int(np.argmin(ok))
+        stopped_at = int(candidates[first_bad])
+        candidates, sides = candidates[:first_bad], sides[:first_bad]
+    return _build(ticks, ts, candidates, sides, amount, quote, base, fee_rate, slippage, stopped_at)
+
+
+# --- Percent: цикл по тикам ---
+def _percent_loop(ticks, step, amount, min_value, quote, base, fee_rate, slippage):
+    n = len(ticks)
+    idx = np.empty(n, dtype=np.int64)
+    sides = np.empty(n, dtype=np.int8)
+    count = 0
+    stopped_at = -1
+    base_price = ticks[0] if n else 0.0
+    for i in range(n):
+        price = ticks[i]
+        diff = (price - base_price) / base_price * 100.0
+        if abs(diff) < step or amount * price < min_value:
+            continue
+        if diff < 0:
+            cost = price * (1.0 + slippage) * amount
+            fee = cost * fee_rate
+            if quote < cost + fee:
+                stopped_at = i
+                break
+            quote -= cost + fee
+            base += amount
+            sides[count] = 1
+        else:
+            if base < amount:
+                stopped_at = i
+                break
+            proceeds = price * (1.0 - slippage) * amount
+            quote += proceeds - proceeds * fee_rate
+            base -= amount
+            sides[count] = -1
+        idx[count] = i
+        count += 1
+        base_price = price
+    return idx[:count], sides[:count], stopped_at
+
+
+_percent_compiled = njit(cache=True)(_percent_loop) if njit is not None else None
+
+
+def backtest_percent(prices, step: float, amount: float, interval: float = 1, *, timestamps=None,
+                     bar_minutes: float = 1, quote: float = 1000.0, base: float = 0.0,
+                     fee_rate: float = 0.001, slippage: float = 0.0,
+                     min_order: float = float(MIN_ORDER_USD)) -> BacktestResult:
+    ticks, ts = _ticks(prices, timestamps, interval, bar_minutes)
+    args = (float(step), float(amount), min_order, float(quote), float(base), fee_rate, slippage)
+    if _percent_compiled is not None:
+        idx, sides, stopped = _percent_compiled(ticks, *args)
+    else:
+        idx, sides, stopped = _percent_loop(ticks.tolist(), *args)
+    return _build(ticks, ts, idx, sides.astype(np.float64), float(amount), float(quote), float(base),
+                  fee_rate, slippage, None if stopped < 0 else int(stopped))
+
+
+def backtest_range(prices, low: float, high: float, amount: float, interval: float = 1, *, timestamps=None,
+                   bar_minutes: float = 1, quote: float = 1000.0, base: float = 0.0,
+                   fee_rate: float = 0.001, slippage: float = 0.0,
+                   min_order: float = float(MIN_ORDER_USD)) -> BacktestResult:
+    ticks, ts = _ticks(prices, timestamps, interval, bar_minutes)
+    amount = float(amount)
+    tradable = ticks * amount >= min_order
+    buy = tradable & (ticks <= low)
+    sell = tradable & (ticks >= high) & ~buy
+    candidates = np.flatnonzero(buy | sell)
+    sides = np.where(buy[candidates], 1.0, -1.0)
+    return _fixed_size(ticks, ts, candidates, sides, amount, float(quote), float(base), fee_rate, slippage)
+
+
+def backtest_dca(prices, amount: float, interval: float = 1, *, timestamps=None,
+                 bar_minutes: float = 1, quote: float = 1000.0, base: float = 0.0,
+                 fee_rate: float = 0.001, slippage: float = 0.0,
+                 min_order: float = float(MIN_ORDER_USD)) -> BacktestResult:
+    ticks, ts = _ticks(prices, timestamps, interval, bar_minutes)
+    amount = float(amount)
+    candidates = np.flatnonzero(ticks * amount >= min_order)
+    sides = np.ones(len(candidates))
+    return _fixed_size(ticks, ts, candidates, sides, amount, float(quote), float(base), fee_rate, slippage)
+
+
+def run_backtest(strategy: str, prices, params: Mapping[str, Any], **kwargs) -> BacktestResult:
+    """
+    Бэктест по типу стратегии и её параметрам в том же виде, что хранится в state
+    ({"amount", "step" | "low"/"high", "interval"}), либо cfg.model_dump() конфига.
+    """
+    st = strategy.lower()
+    interval = float(params.get("interval", 1))
+    if st == "percent":
+        return backtest_percent(prices, float(params["step"]), float(params["amount"]), interval, **kwargs)
+    if st == "range":
+        return backtest_range(prices, float(params["low"]), float(params["high"]), float(params["amount"]), interval, **kwargs)
+    if st == "dca":
+        return backtest_dca(prices, float(params["amount"]), interval, **kwargs)
+    raise ValueError(f"Неизвестный тип стратегии: {strategy}")
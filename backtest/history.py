@@ -0,0 +1,37 @@
+# backtest/history.py
+"""Загрузка исторических свечей с биржи (ccxt fetch_ohlcv, постранично)."""
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PAGE_LIMIT = 1000  # свечей за запрос (максимум Binance)
+
+
+def download_ohlcv(exchange, symbol: str, timeframe: str = "1m", since_ms: int | None = None,
+                   until_ms: int | None = None, days: float = 30) -> np.ndarray:
+    """
+    Свечи [ts, open, high, low, close, volume] за период как массив float64 (N, 6).
+    Блокирующая: из async-кода вызывать через asyncio.to_thread.
+    """
+    step_ms = exchange.parse_timeframe(timeframe) * 1000
+    until_ms = until_ms or int(time.time() * 1000)
+    since_ms = since_ms if since_ms is not None else until_ms - int(days * 86_400_000)
+
+    pages = []
+    cursor = since_ms
+    while cursor < until_ms:
+        rows = exchange.fetch_ohlcv(symbol, timeframe, since=cursor, limit=PAGE_LIMIT)
+        if not rows:
+            break
+        pages.append(np.asarray(rows, dtype=np.float64))
+        cursor = int(rows[-1][0]) + step_ms
+
+    if not pages:
+        return np.empty((0, 6), dtype=np.float64)
+    data = np.concatenate(pages)
+    data = data[data[:, 0] < until_ms]
+    logger.info(f"📥 {symbol} {timeframe}: загружено {len(data)} свечей")
+    return data
@@ -0,0 +1,300 @@
+# backtest/replay.py
+"""
+Детерминированный прогон записанных цен через настоящие percent_job / range_job / dca_job.
+
+В отличие от engine.py (векторная модель правил), здесь исполняется сам код стратегий
+вместе с utils (get_price, has_enough_balance, place_market_order_safe), журналом
+ордеров и декоратором resilient_strategy. Подменяется только окружение:
+
+- часы — виртуальные: задачи идут по очереди в порядке (время запуска, номер), время
+  перескакивает к следующему запуску, ожидания нет;
+- job_queue / context / bot — простые объекты, сообщения бота собираются в список;
+- биржа — бумажная (exchange.paper.PaperExchange) поверх ценового ряда на виртуальном времени;
+- asyncio.to_thread и пулы executors выполняются сразу в том же потоке, поэтому порядок
+  вызовов не зависит от планировщика потоков;
+- журнал ордеров — в памяти, clientOrderId нумеруются с нуля;
+- реестр стратегий — свой (Replay.registry), файл стратегий не трогается.
+
+Одинаковый вход всегда даёт одинаковые ордера и сообщения (ReplayResult.digest).
+"""
+import asyncio
+import hashlib
+import heapq
+import json
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import ccxt
+import numpy as np
+
+from exchange.paper import PaperExchange
+from order_journal import OrderJournal
+from strategy_registry import StrategyRecord, StrategyRegistry, registry
+
+MIN_COST = 5.0  # limits.cost.min рынков FeedSource (как у Binance для USDT-пар)
+
+
+# --- ценовой ряд ---
+class PriceFeed:
+    """Ряд цен одного символа: ts (мс, по возрастанию), bid, ask, last."""
+
+    def __init__(self, ts, last, bid=None, ask=None):
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.last = np.asarray(last, dtype=np.float64)
+        self.bid = self.last if bid is None else np.asarray(bid, dtype=np.float64)
+        self.ask = self.last if ask is None else np.asarray(ask, dtype=np.float64)
+
+    @classmethod
+    def from_ticks(cls, ticks: np.ndarray) -> "PriceFeed":
+        """Из записи tick_recorder (TICK_DTYPE); тики без last отбрасываются."""
+        ticks = ticks[~np.isnan(ticks["last"])]
+        return cls(ticks["ts"], ticks["last"], ticks["bid"], ticks["ask"])
+
+    @classmethod
+    def from_candles(cls, candles) -> "PriceFeed":
+        """Из backtest.store.Candles: цена закрытия на момент закрытия свечи."""
+        return cls(candles.timestamps + candles.step_ms, candles.close)
+
+    @property
+    def start_ms(self) -> int:
+        return int(self.ts[0])
+
+    @property
+    def end_ms(self) -> int:
+        return int(self.ts[-1])
+
+    def at(self, now_ms: int) -> int | None:
+        """Индекс последнего тика не позже now_ms."""
+        i = int(np.searchsorted(self.ts, now_ms, side="right")) - 1
+        return i if i >= 0 else None
+
+
+# --- источник цен для бумажной биржи ---
+class FeedSource:
+    """Цены на виртуальном времени now_ms — источник для exchange.paper.PaperExchange."""
+
+    def __init__(self, feeds: Dict[str, PriceFeed]):
+        self.feeds = feeds
+        self.now_ms = 0
+        self.markets = {s: {"symbol": s, "limits": {"cost": {"min": MIN_COST}}} for s in feeds}
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        feed = self.feeds.get(symbol)
+        i = feed.at(self.now_ms) if feed is not None else None
+        if i is None:
+            raise ccxt.BadSymbol(f"нет цены {symbol} на {self.now_ms}")
+        return {"symbol": symbol, "timestamp": int(feed.ts[i]),
+                "bid": float(feed.bid[i]), "ask": float(feed.ask[i]), "last": float(feed.last[i])}
+
+
+class _MemoryJournal(OrderJournal):
+    """Журнал ордеров без файла; номера clientOrderId с нуля — для воспроизводимости."""
+
+    def __init__(self):
+        super().__init__(Path("/nonexistent/replay-journal"))
+        self.node = "rply"
+        self._seq = 0
+
+    def _append(self, rec: Dict[str, Any]):
+        self._orders.setdefault(rec["client_id"], {}).update(rec)
+
+
+class _InlineExecutor(ThreadPoolExecutor):
+    """Исполнитель по умолчанию для прогона: вызов сразу, в текущем потоке."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+# --- планировщик и контекст ---
+class ReplayJob:
+    def __init__(self, callback, interval: float, chat_id: int, name: str, data: Dict[str, Any], next_t: float):
+        self.callback = callback
+        self.interval = interval  # секунды; стратегия может его менять (adaptive_delay)
+        self.chat_id = chat_id
+        self.name = name
+        self.data = data
+        self.next_t = next_t
+        self.removed = False
+
+    def schedule_removal(self):
+        self.removed = True
+
+
+class ReplayJobQueue:
+    """То подмножество telegram.ext.JobQueue, которым пользуются стратегии."""
+
+    def __init__(self, clock):
+        self._clock = clock
+        self._heap: List[tuple] = []
+        self._seq = 0
+
+    def run_repeating(self, callback, interval: float, first: float | None = None,
+                      chat_id: int | None = None, name: str | None = None, data: Any = None, **_):
+        job = ReplayJob(callback, interval, chat_id, name or callback.__name__, data,
+                        self._clock() + (interval if first is None else first))
+        self._push(job)
+        return job
+
+    def _push(self, job: ReplayJob):
+        self._seq += 1
+        heapq.heappush(self._heap, (job.next_t, self._seq, job))
+
+    def pop(self, until: float) -> ReplayJob | None:
+        while self._heap and self._heap[0][0] <= until:
+            job = heapq.heappop(self._heap)[2]
+            if not job.removed:
+                return job
+        return None
+
+    def jobs(self) -> List[ReplayJob]:
+        return [entry[2] for entry in self._heap if not entry[2].removed]
+
+
+class ReplayBot:
+    def __init__(self, clock):
+        self._clock = clock
+        self.messages: List[Dict[str, Any]] = []
+
+    async def send_message(self, chat_id, text, **_):
+        self.messages.append({"t": self._clock(), "chat_id": chat_id, "text": text})
+
+
+@dataclass
+class ReplayResult:
+    orders: List[Dict[str, Any]]
+    messages: List[Dict[str, Any]]
+    runs: int                   # вызовов job-функций (решений)
+    wall_seconds: float
+    virtual_seconds: float
+    balances: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def decisions_per_sec(self) -> float:
+        return self.runs / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def speedup(self) -> float:
+        """Во сколько раз быстрее реального времени."""
+        return self.virtual_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+    def digest(self) -> str:
+        """Хэш ордеров и сообщений: совпадает, если поведение стратегий не изменилось."""
+        payload = json.dumps({"orders": self.orders, "messages": self.messages},
+                             sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "orders": len(self.orders),
+            "messages": len(self.messages),
+            "decisions_per_sec": round(self.decisions_per_sec, 1),
+            "speedup": round(self.speedup, 1),
+            "digest": self.digest()[:16],
+        }
+
+
+def _job_callbacks():
+    # импорт здесь: стратегии тянут telegram и utils, а backtest импортируется и без них
+    from strategies import percent_job, range_job, dca_job, grid_job
+    return {"percent": percent_job, "range": range_job, "dca": dca_job, "grid": grid_job}
+
+
+class Replay:
+    """
+    replay = Replay({"BTC/USDT": PriceFeed.from_ticks(read_ticks("BTC/USDT"))}, {"USDT": 1000})
+    replay.add("percent", "BTC/USDT", amount=0.001, step=0.5, interval=5)
+    result = replay.run()
+    """
+
+    def __init__(self, feeds: Dict[str, PriceFeed], balances: Dict[str, float], *,
+                 fee_rate: float = 0.001, slippage: float = 0.0, start_ms: int | None = None):
+        self.source = FeedSource(feeds)
+        self.exchange = PaperExchange(self.source, balances, fee_rate=fee_rate, slippage=slippage,
+                                      clock=lambda: self.source.now_ms)
+        self.now = (start_ms if start_ms is not None else min(f.start_ms for f in feeds.values())) / 1000
+        self.job_queue = ReplayJobQueue(lambda: self.now)
+        self.bot = ReplayBot(lambda: self.now)
+        self.application = SimpleNamespace(user_data={}, bot_data={}, bot=self.bot, job_queue=self.job_queue)
+        self.registry = StrategyRegistry(limit=float("inf"))
+
+    def add(self, strategy: str, symbol: str, *, interval: float, chat_id: int = 0, **params) -> ReplayJob:
+        """Стратегия как после start_*_strategy: interval в минутах, params — поля job.data."""
+        from state import make_job_key
+
+        callback = _job_callbacks()[strategy.lower()]
+        name = make_job_key(strategy.lower(), symbol, interval=interval, **params)
+        job = self.job_queue.run_repeating(callback, interval * 60, chat_id=chat_id, name=name,
+                                           data={"symbol": symbol, **params})
+        self.registry.add(StrategyRecord(chat_id, name, strategy.lower(), symbol,
+                                         {"interval": interval, **params}, job, created_at=self.now))
+        return job
+
+    @contextmanager
+    def _environment(self):
+        import executors
+        import utils
+        from connection_manager import connection
+
+        saved = (connection.exchange, utils.journal, utils.record_api_call, utils.ticks.enabled, utils._order_locks, utils._scales)
+        saved_lanes = {name: lane.executor for name, lane in executors.LANES.items()}
+        for lane in executors.LANES.values():
+            lane.executor = _InlineExecutor()
+        connection.exchange = self.exchange
+        utils.journal = _MemoryJournal()
+        utils.record_api_call = lambda: None  # нагрузка на API не копится — adaptive_delay не тормозит
+        utils.ticks.enabled = False           # воспроизведённые цены не пишутся обратно в кольца
+        utils._order_locks = {}
+        utils._scales = {}
+        try:
+            with registry.substituted(self.registry):
+                yield
+        finally:
+            (connection.exchange, utils.journal, utils.record_api_call,
+             utils.ticks.enabled, utils._order_locks, utils._scales) = saved
+            for name, executor in saved_lanes.items():
+                executors.LANES[name].executor = executor
+
+    async def _loop(self, until: float) -> int:
+        asyncio.get_running_loop().set_default_executor(_InlineExecutor())
+        runs = 0
+        while (job := self.job_queue.pop(until)) is not None:
+            self.now = job.next_t
+            self.source.now_ms = int(self.now * 1000)
+            context = SimpleNamespace(job=job, bot=self.bot, application=self.application,
+                                      job_queue=self.job_queue, user_data=self.application.user_data.get(job.chat_id, {}))
+            await job.callback(context)
+            runs += 1
+            if not job.removed:
+                job.next_t = self.now + job.interval
+                self.job_queue._push(job)
+        return runs
+
+    def run(self, until_ms: int | None = None) -> ReplayResult:
+        """Прогоняет все задачи до until_ms (по умолчанию — до конца самого длинного ряда)."""
+        until_ms = until_ms if until_ms is not None else max(f.end_ms for f in self.source.feeds.values())
+        start = self.now
+        t0 = time.perf_counter()
+        with self._environment():
+            runs = asyncio.run(self._loop(until_ms / 1000))
+        wall = time.perf_counter() - t0
+        return ReplayResult(
+            orders=[{k: o[k] for k in ("timestamp", "clientOrderId", "symbol", "side", "amount", "price", "cost")}
+                    for o in self.exchange.orders],
+            messages=list(self.bot.messages),
+            runs=runs,
+            wall_seconds=wall,
+            virtual_seconds=until_ms / 1000 - start,
+            balances=self.exchange.fetch_balance()["total"],
+        )
@@ -0,0 +1,185 @@
+# backtest/store.py
+"""
+Локальное хранилище свечей: колонки фиксированной ширины на диске, чтение через np.memmap.
+
+data/ohlcv/<BASE_QUOTE>/<timeframe>/
+    open.f64  high.f64  low.f64  close.f64  volume.f64   — по 8 байт на свечу в каждой колонке
+    meta.json                                            — {"start_ms", "step_ms", "count"}
+
+Свечи лежат плотной сеткой с шагом таймфрейма, поэтому время свечи не хранится
+(ts = start_ms + i * step_ms), а поиск по времени — арифметика индекса.
+Итого 40 байт на свечу. Пропуски биржи (простои) заполняются последней ценой
+закрытия с нулевым объёмом, чтобы в рядах не было NaN.
+
+sync() докачивает только недостающие куски слева и справа от уже сохранённого,
+поэтому повторный анализ того же периода не ходит в сеть. Срезы — представления
+memmap без копирования. Писатель один; читатели в других процессах видят
+ровно count свечей из meta.json, который заменяется атомарно после записи данных.
+"""
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from backtest.history import download_ohlcv
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path("data/ohlcv")
+COLUMNS = ("open", "high", "low", "close", "volume")
+DTYPE = np.dtype(np.float64)
+
+
+class Candles:
+    """Набор колонок (memmap или их срезы) на общей временной сетке."""
+
+    def __init__(self, start_ms: int, step_ms: int, columns: Dict[str, np.ndarray]):
+        self.start_ms = start_ms
+        self.step_ms = step_ms
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns["close"])
+
+    @property
+    def end_ms(self) -> int:
+        """Время открытия свечи, следующей за последней."""
+        return self.start_ms + len(self) * self.step_ms
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.start_ms + np.arange(len(self), dtype=np.int64) * self.step_ms
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        if name in COLUMNS:
+            return self.columns[name]
+        raise AttributeError(name)
+
+    def slice(self, since_ms: int | None = None, until_ms: int | None = None) -> "Candles":
+        """Свечи с открытием в [since_ms, until_ms) — без копирования."""
+        n = len(self)
+        i0 = 0 if since_ms is None else min(max(-(-(since_ms - self.start_ms) // self.step_ms), 0), n)
+        i1 = n if until_ms is None else min(max(-(-(until_ms - self.start_ms) // self.step_ms), i0), n)
+        return Candles(self.start_ms + i0 * self.step_ms, self.step_ms,
+                       {c: a[i0:i1] for c, a in self.columns.items()})
+
+    def to_array(self) -> np.ndarray:
+        """Копия в формате fetch_ohlcv: (N, 6) [ts, open, high, low, close, volume]."""
+        return np.column_stack([self.timestamps.astype(np.float64)] + [self.columns[c] for c in COLUMNS])
+
+
+class OHLCVStore:
+    def __init__(self, root: Path = DATA_DIR):
+        self.root = Path(root)
+
+    def _dir(self, symbol: str, timeframe: str) -> Path:
+        return self.root / symbol.replace("/", "_").upper() / timeframe
+
+    def _meta(self, path: Path) -> Dict[str, int] | None:
+        try:
+            return json.loads((path / "meta.json").read_text("utf-8"))
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, path: Path, meta: Dict[str, int]):
+        tmp = path / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, path / "meta.json")
+
+    def open(self, symbol: str, timeframe: str = "1m") -> Candles | None:
+        """Сохранённые свечи (только чтение) или None, если их нет."""
+        path = self._dir(symbol, timeframe)
+        meta = self._meta(path)
+        if not meta or not meta["count"]:
+            return None
+        n = meta["count"]
+        columns = {c: np.memmap(path / f"{c}.f64", dtype=DTYPE, mode="r", shape=(n,)) for c in COLUMNS}
+        return Candles(meta["start_ms"], meta["step_ms"], columns)
+
+    # --- запись ---
+    @staticmethod
+    def _dense(rows: np.ndarray, start_ms: int, step_ms: int, count: int, prev_close: float | None) -> np.ndarray:
+        """Строки fetch_ohlcv → плотный блок (count, 5); пропуски — последняя цена закрытия, объём 0."""
+        block = np.full((count, len(COLUMNS)), np.nan)
+        if len(rows):
+            idx = ((rows[:, 0].astype(np.int64) - start_ms) // step_ms)
+            keep = (idx >= 0) & (idx < count)
+            block[idx[keep]] = rows[keep, 1:6]
+        missing = np.isnan(block[:, 3])
+        if missing.any():
+            last = np.maximum.accumulate(np.where(missing, -1, np.arange(count)))
+            fill = np.where(last >= 0, block[np.maximum(last, 0), 3], np.nan if prev_close is None else prev_close)
+            block[missing, :4] = fill[missing, None]
+            block[missing, 4] = 0.0
+        return block
+
+    def _append(self, path: Path, block: np.ndarray):
+        for i, c in enumerate(COLUMNS):
+            with open(path / f"{c}.f64", "ab") as f:
+                f.write(np.ascontiguousarray(block[:, i], dtype=DTYPE).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _prepend(self, path: Path, block: np.ndarray):
+        for i, c in enumerate(COLUMNS):
+            target = path / f"{c}.f64"
+            tmp = path / f"{c}.f64.tmp"
+            with open(tmp, "wb") as f:
+                f.write(np.ascontiguousarray(block[:, i], dtype=DTYPE).tobytes())
+                if target.exists():
+                    f.write(target.read_bytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, target)
+
+    def sync(self, exchange, symbol: str, timeframe: str = "1m", days: float = 30,
+             since_ms: int | None = None, until_ms: int | None = None) -> Candles | None:
+        """
+        Докачивает недостающие свечи за [since_ms, until_ms) и возвращает этот период.
+        По умолчанию — последние days дней до последней закрытой свечи.
+        Блокирующая: из async-кода вызывать через asyncio.to_thread.
+        """
+        step_ms = exchange.parse_timeframe(timeframe) * 1000
+        now_ms = int(time.time() * 1000)
+        until_ms = min(until_ms or now_ms, now_ms) // step_ms * step_ms  # только закрытые свечи
+        since_ms = (since_ms if since_ms is not None else until_ms - int(days * 86_400_000)) // step_ms * step_ms
+
+        path = self._dir(symbol, timeframe)
+        path.mkdir(parents=True, exist_ok=True)
+        meta = self._meta(path) or {"start_ms": since_ms, "step_ms": step_ms, "count": 0}
+        if meta["step_ms"] != step_ms:
+            raise ValueError(f"{path}: шаг {meta['step_ms']} мс не совпадает с таймфреймом {timeframe}")
+
+        if meta["count"] == 0:
+            rows = download_ohlcv(exchange, symbol, timeframe, since_ms, until_ms)
+            if len(rows):
+                # история начинается с первой реальной свечи (пара могла появиться позже since_ms)
+                start = int(rows[0, 0])
+                count = (until_ms - start) // step_ms
+                self._append(path, self._dense(rows, start, step_ms, count, None))
+                meta = {"start_ms": start, "step_ms": step_ms, "count": count}
+                self._write_meta(path, meta)
+        else:
+            start, end = meta["start_ms"], meta["start_ms"] + meta["count"] * step_ms
+            if since_ms < start:
+                rows = download_ohlcv(exchange, symbol, timeframe, since_ms, start)
+                if len(rows):
+                    head = int(rows[0, 0])
+                    count = (start - head) // step_ms
+                    self._prepend(path, self._dense(rows, head, step_ms, count, None))
+                    meta = {"start_ms": head, "step_ms": step_ms, "count": meta["count"] + count}
+                    self._write_meta(path, meta)
+            if until_ms > end:
+                rows = download_ohlcv(exchange, symbol, timeframe, end, until_ms)
+                count = (until_ms - end) // step_ms
+                last_close = float(self.open(symbol, timeframe).close[-1])
+                self._append(path, self._dense(rows, end, step_ms, count, last_close))
+                meta = {**meta, "count": meta["count"] + count}
+                self._write_meta(path, meta)
+
+        candles = self.open(symbol, timeframe)
+        return candles.slice(since_ms, until_ms) if candles is not None else None
@@ -0,0 +1,193 @@
+# backtest/sweep.py
+"""
+Перебор параметров стратегий поверх бэктестера.
+
+Сетка (все комбинации) или случайный поиск по пространству параметров.
+Работа делится между процессами (ProcessPoolExecutor); история цен кладётся
+один раз в shared memory, воркеры подключаются к ней по имени и видят тот же
+массив без копирования и pickle. Каждому воркеру уходит только пачка словарей
+параметров, обратно — короткие сводки.
+
+Комбинации проверяются теми же моделями, что и запуск стратегии (PercentConfig,
+RangeConfig, DCAConfig): в перебор не попадает то, что бот не дал бы запустить.
+"""
+import itertools
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+from pydantic import BaseModel, ValidationError
+
+from backtest.engine import run_backtest
+
+# Порядок сортировки: для каждой метрики — больше лучше (True) или меньше (False)
+RANK_KEYS = {
+    "return_pct": True,
+    "max_drawdown_pct": False,
+    "trades": True,
+}
+
+_prices: np.ndarray | None = None  # история цен внутри воркера
+_shm: shared_memory.SharedMemory | None = None
+
+
+# --- пространство параметров ---
+def parse_space(specs: Iterable[str], max_values: int | None = None) -> Dict[str, List[float]]:
+    """
+    ["step=0.2:2:0.2", "interval=5,15,60", "amount=0.01"] →
+    {"step": [0.2, 0.4, ..., 2.0], "interval": [5, 15, 60], "amount": [0.01]}
+    Формат: имя=начало:конец:шаг (конец включительно) или имя=v1,v2,...
+    max_values — ValueError, если в одном параметре больше значений (до построения списка).
+    """
+    space: Dict[str, List[float]] = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if not values:
+            raise ValueError(f"Ожидается имя=значения, получено: {spec}")
+        if ":" in values:
+            start, stop, step = (float(x) for x in values.split(":"))
+            if step <= 0:
+                raise ValueError(f"Шаг должен быть > 0: {spec}")
+            count = int(round((stop - start) / step)) + 1
+            if max_values is not None and count > max_values:
+                raise ValueError(f"{name.strip()}: {count} значений, допустимо до {max_values}")
+            space[name.strip()] = [round(start + i * step, 10) for i in range(count)]
+        else:
+            space[name.strip()] = [float(x) for x in values.split(",")]
+    return space
+
+
+def space_size(space: Dict[str, Sequence[float]]) -> int:
+    """Число комбинаций полной сетки — без их построения."""
+    return math.prod(len(values) for values in space.values())
+
+
+def _config(strategy: str) -> type[BaseModel]:
+    # модели импортируются здесь, а не при импорте модуля: воркерам пула они не нужны
+    from strategies.percent_config import PercentConfig
+    from strategies.range_config import RangeConfig
+    from strategies.dca_config import DCAConfig
+
+    configs = {"percent": PercentConfig, "range": RangeConfig, "dca": DCAConfig}
+    if strategy not in configs:
+        raise ValueError(f"Стратегия: {', '.join(configs)}")
+    return configs[strategy]
+
+
+def check_space(strategy: str, space: Dict[str, Sequence[float]]) -> type[BaseModel]:
+    """Модель параметров стратегии; ValueError — неизвестная стратегия или в space не хватает параметров."""
+    config = _config(strategy)
+    required = {name for name, field in config.model_fields.items() if field.is_required()}
+    missing = required - set(space) - {"symbol", "interval"}  # interval по умолчанию 1 (как в бэктесте)
+    if missing:
+        raise ValueError(f"Не хватает параметров {strategy}: {', '.join(sorted(missing))}")
+    return config
+
+
+def _valid(config: type[BaseModel], params: Dict[str, float]) -> bool:
+    try:
+        config(symbol="SWEEP/USDT", **{"interval": 1, **params})
+    except ValidationError:
+        return False
+    return True
+
+
+def grid(strategy: str, space: Dict[str, Sequence[float]]) -> List[Dict[str, float]]:
+    config = check_space(strategy, space)
+    names = list(space)
+    combos = (dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names)))
+    return [c for c in combos if _valid(config, c)]
+
+
+def random_search(strategy: str, space: Dict[str, Sequence[float]], samples: int,
+                  seed: int | None = None) -> List[Dict[str, float]]:
+    """Случайные комбинации: для диапазонов значения берутся равномерно между min и max."""
+    config = check_space(strategy, space)
+    rnd = random.Random(seed)
+    out: List[Dict[str, float]] = []
+    attempts = 0
+    while len(out) < samples and attempts < samples * 20:
+        attempts += 1
+        combo = {}
+        for name, values in space.items():
+            lo, hi = min(values), max(values)
+            combo[name] = values[0] if lo == hi else round(rnd.uniform(lo, hi), 10)
+            if name == "interval":
+                combo[name] = float(max(int(combo[name]), 1))
+        if _valid(config, combo):
+            out.append(combo)
+    return out
+
+
+# --- воркеры ---
+def _attach(name: str, shape: tuple, dtype: str):
+    global _prices, _shm
+    _shm = shared_memory.SharedMemory(name=name)
+    _prices = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_shm.buf)
+
+
+def _evaluate(strategy: str, prices: np.ndarray, batch: List[Dict[str, float]], kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    results = []
+    for params in batch:
+        summary = run_backtest(strategy, prices, params, **kwargs).summary()
+        summary["params"] = params
+        results.append(summary)
+    return results
+
+
+def _run_batch(strategy: str, batch: List[Dict[str, float]], kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return _evaluate(strategy, _prices, batch, kwargs)
+
+
+def rank(results: List[Dict[str, Any]], by: str = "return_pct") -> List[Dict[str, Any]]:
+    """Сортировка: сначала по выбранной метрике, затем по остальным из RANK_KEYS."""
+    order = [by] + [k for k in RANK_KEYS if k != by]
+    return sorted(results, key=lambda r: tuple(-r[k] if RANK_KEYS[k] else r[k] for k in order))
+
+
+def run_sweep(strategy: str, prices: np.ndarray, candidates: List[Dict[str, float]], *,
+              workers: int = 0, top: int = 10, by: str = "return_pct", mp_context=None,
+              **kwargs) -> List[Dict[str, Any]]:
+    """
+    Прогоняет все candidates через бэктест и возвращает top лучших по метрике by.
+    workers=0 — по числу ядер; workers=1 — без пула процессов, в текущем процессе.
+    mp_context — способ запуска воркеров (multiprocessing.get_context("spawn") из
+    многопоточного процесса: fork копирует блокировки, занятые другими потоками).
+    kwargs уходят в backtest_* (quote, base, fee_rate, slippage, bar_minutes).
+    """
+    if by not in RANK_KEYS:
+        raise ValueError(f"Метрика ранжирования: {', '.join(RANK_KEYS)}")
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(candidates) < 2:
+        return rank(_evaluate(strategy, prices, candidates, kwargs), by)[:top]
+
+    # ~4 пачки на воркер: и накладные расходы малы, и нагрузка выравнивается
+    size = max(len(candidates) // (workers * 4), 1)
+    batches = [candidates[i:i + size] for i in range(0, len(candidates), size)]
+
+    shm = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+    try:
+        np.ndarray(prices.shape, dtype=prices.dtype, buffer=shm.buf)[:] = prices
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_attach,
+                                 initargs=(shm.name, prices.shape, prices.dtype.str)) as pool:
+            futures = [pool.submit(_run_batch, strategy, b, kwargs) for b in batches]
+            results = [r for f in futures for r in f.result()]
+    finally:
+        shm.close()
+        shm.unlink()
+    return rank(results, by)[:top]
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    lines = []
+    for i, r in enumerate(results, 1):
+        params = ", ".join(f"{k}={v:g}" for k, v in r["params"].items())
+        lines.append(
+            f"{i}. {params} → {r['return_pct']:+.2f}% / DD {r['max_drawdown_pct']:.2f}% / сделок {r['trades']}"
+        )
+    return "\n".join(lines)
@@ -12,18 +12,29 @@ from telegram.ext import (
     ConversationHandler, ContextTypes, MessageHandler,
     CallbackQueryHandler, filters
 )
+from telegram.request import HTTPXRequest
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES
 
 from decimal import Decimal, InvalidOperation
-from settings import TELEGRAM_TOKEN
+import metrics
+from settings import TELEGRAM_TOKEN, settings
 from menus import get_main_menu, get_strategies_menu, get_back_menu
-from state import stop_all_jobs, get_jobs, remove_job
+from strategy_registry import registry
+from connection_manager import connection
+from supervisor import supervisor
+import state_manager
 from strategies.percent import start_percent_strategy
 from strategies.dca import start_dca_strategy
 from strategies.range import start_range_strategy
-from utils import get_price as sync_get_price, get_balance as sync_get_balance, place_market_order_safe as sync_place_market_order
-from state_manager import load_strategies, save_strategies
+from strategies.grid import start_grid_strategy, cancel_grid_orders
+from utils import get_price as sync_get_price, get_prices as sync_get_prices, get_balance as sync_get_balance, place_market_order_safe as sync_place_market_order
 from restore_strategies import restore_strategies
-from constants import MIN_ORDER_USD, MIN_USD_VALUE, MAX_PRICE_CHECKS, MAJOR_ASSETS
+from constants import (
+    MIN_ORDER_USD, MIN_USD_VALUE, MAX_PRICE_CHECKS, MAJOR_ASSETS, MAX_WATCHLIST_SIZE,
+    MAX_SWEEP_COMBINATIONS, MAX_SWEEP_DAYS, MAX_SWEEP_WORKERS, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS,
+)
+from loop_watchdog import watchdog, sample_profile, format_profile
+from executors import market_data, account, orders
 
 
 
@@ -37,6 +48,7 @@ RANGE_SYMBOL, RANGE_AMOUNT, RANGE_MIN, RANGE_MAX, RANGE_INTERVAL = range(7, 12)
 BUY_SYMBOL, BUY_AMOUNT = range(12, 14)
 SELL_SYMBOL, SELL_AMOUNT = range(14, 16)
 PRICE_SYMBOL = 16
+GRID_SYMBOL, GRID_AMOUNT, GRID_LOW, GRID_HIGH, GRID_LEVELS, GRID_SPACING, GRID_INTERVAL = range(17, 24)
 
 # ----------------- Start -----------------
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -69,25 +81,89 @@ def _user_from(update=None, context=None):
 
 
 
+# ----------------- Price helpers -----------------
+def _to_pair(raw: str) -> str:
+    """'btc' -> 'BTC/USDT', 'eth/btc' -> 'ETH/BTC'."""
+    symbol = raw.strip().upper()
+    if "/" not in symbol:
+        symbol = f"{symbol}/USDT"
+    return symbol
+
+
+async def _format_prices(pairs: List[str]) -> List[str]:
+    """Запрашивает цены всех пар одним пакетом и форматирует по строке на пару."""
+    prices = await market_data.run(sync_get_prices, pairs)
+    lines: List[str] = []
+    for pair in pairs:
+        price = prices.get(pair)
+        if price is None:
+            lines.append(f"{pair}: ❌ Ошибка")
+        else:
+            lines.append(f"{pair}: {price:.2f}")
+    return lines
+
+
 # ----------------- Price (CLI) -----------------
 async def check_price_cli(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда /price BTC/USDT (CLI)"""
+    """Команда /price BTC/USDT [ETH SOL ...] (CLI)"""
     if not context.args:
-        await update.message.reply_text("Укажи валютную пару (например `/price BTC/USDT`).", parse_mode="Markdown")
+        await update.message.reply_text("Укажи валютную пару (например `/price BTC/USDT` или `/price BTC ETH SOL`).", parse_mode="Markdown")
         return
-    symbol = context.args[0].strip().upper()
-    if "/" not in symbol:
-        symbol = f"{symbol}/USDT"
+    pairs = list(dict.fromkeys(_to_pair(a) for a in context.args))
     try:
-        price = await asyncio.to_thread(sync_get_price, symbol)
-        if price is None:
-            await update.message.reply_text(f"❌ Пара {symbol} не поддерживается.")
-        else:
-            await update.message.reply_text(f"💹 Цена {symbol}: {price:.2f}")
+        if len(pairs) == 1:
+            symbol = pairs[0]
+            price = await market_data.run(sync_get_price, symbol)
+            if price is None:
+                await update.message.reply_text(f"❌ Пара {symbol} не поддерживается.")
+            else:
+                await update.message.reply_text(f"💹 Цена {symbol}: {price:.2f}")
+            return
+        lines = await _format_prices(pairs)
+        await update.message.reply_text("💹 Цены:\n" + "\n".join(lines))
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка при получении цены: {e}")
 
 
+# ----------------- Избранное (watchlist) -----------------
+async def watch_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /watch BTC ETH ... — добавить пары в избранное."""
+    if not context.args:
+        await update.message.reply_text("Укажи пары (например `/watch BTC ETH/BTC`).", parse_mode="Markdown")
+        return
+    watchlist: List[str] = context.user_data.setdefault("watchlist", [])
+    for pair in (_to_pair(a) for a in context.args):
+        if pair not in watchlist:
+            watchlist.append(pair)
+    if len(watchlist) > MAX_WATCHLIST_SIZE:
+        del watchlist[MAX_WATCHLIST_SIZE:]
+        await update.message.reply_text(f"⚠️ В избранном не больше {MAX_WATCHLIST_SIZE} пар, лишние отброшены.")
+    await update.message.reply_text("⭐ Избранное: " + ", ".join(watchlist))
+
+
+async def watch_remove(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /unwatch BTC ... — убрать пары из избранного."""
+    watchlist: List[str] = context.user_data.setdefault("watchlist", [])
+    for pair in (_to_pair(a) for a in context.args or []):
+        if pair in watchlist:
+            watchlist.remove(pair)
+    await update.message.reply_text("⭐ Избранное: " + (", ".join(watchlist) or "пусто"))
+
+
+async def watch_show(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /watchlist — цены всех пар из избранного одним запросом."""
+    watchlist: List[str] = context.user_data.get("watchlist", [])
+    if not watchlist:
+        await update.message.reply_text("⚠️ Избранное пусто. Добавь пары: /watch BTC ETH")
+        return
+    try:
+        lines = await _format_prices(watchlist)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Ошибка при получении цен: {e}")
+        return
+    await update.message.reply_text("⭐ Избранное:\n" + "\n".join(lines))
+
+
 # ----------------- Price (интерактивная проверка) -----------------
 async def price_symbol(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Введите валютную пару для проверки (например BTC/USDT или просто BTC):", reply_markup=get_back_menu())
@@ -111,7 +187,7 @@ async def price_run(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
 
     try:
-        price = await asyncio.to_thread(sync_get_price, symbol)
+        price = await market_data.run(sync_get_price, symbol)
         if price is None:
             await update.message.reply_text(f"❌ Пара {symbol} не поддерживается.", reply_markup=get_main_menu())
         else:
@@ -124,30 +200,107 @@ async def price_run(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ----------------- Список основных курсов (USDT) -----------------
 async def list_major_prices(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    lines: List[str] = []
-    for asset in MAJOR_ASSETS:
-        if asset == "USDT":  # пропускаем бессмысленную пару
-            continue
-        pair = f"{asset}/USDT"
-        try:
-            price = await asyncio.to_thread(sync_get_price, pair)
-            if price is None:
-                lines.append(f"{pair}: ❌ Ошибка")
-            else:
-                lines.append(f"{pair}: {price:.2f}")
-        except Exception:
-            lines.append(f"{pair}: ❌ Ошибка")
+    pairs = [f"{asset}/USDT" for asset in MAJOR_ASSETS if asset != "USDT"]  # пропускаем бессмысленную пару
+    try:
+        lines = await _format_prices(pairs)
+    except Exception:
+        lines = [f"{pair}: ❌ Ошибка" for pair in pairs]
     await update.message.reply_text("💹 Курсы основных валют (USDT):\n" + "\n".join(lines), reply_markup=get_main_menu())
 
 
+# ----------------- Подбор параметров (/sweep) -----------------
+async def sweep_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /sweep percent BTC step=0.2:2:0.2 amount=0.001 interval=5,15 [days=7] [samples=200]"""
+    if update.effective_user.id not in settings.admin_ids:
+        await update.message.reply_text("⛔ Команда только для администраторов.")
+        return
+    import multiprocessing
+    import os
+    from utils import get_exchange
+    from backtest.store import OHLCVStore
+    from backtest.sweep import parse_space, space_size, check_space, grid, random_search, run_sweep, format_results
+
+    args = context.args or []
+    if len(args) < 3:
+        await update.message.reply_text(
+            "Использование: `/sweep percent BTC step=0.2:2:0.2 amount=0.001 interval=5,15 days=7`",
+            parse_mode="Markdown",
+        )
+        return
+    strategy, symbol = args[0].lower(), _to_pair(args[1])
+    options = {k: v for k, _, v in (a.partition("=") for a in args[2:]) if k in ("days", "samples")}
+    try:
+        days = min(float(options.get("days", 7)), MAX_SWEEP_DAYS)
+        if not days > 0:
+            raise ValueError("days должно быть больше 0")
+        samples = int(options.get("samples", 0))
+        space = parse_space((a for a in args[2:] if a.partition("=")[0] not in options),
+                            max_values=MAX_SWEEP_COMBINATIONS)
+        check_space(strategy, space)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ Неверные параметры: {e}")
+        return
+    # размер — до построения комбинаций: большое пространство отклоняется сразу
+    size = samples or space_size(space)
+    if not 0 < size <= MAX_SWEEP_COMBINATIONS:
+        await update.message.reply_text(f"❌ Комбинаций: {size} (допустимо 1–{MAX_SWEEP_COMBINATIONS}).")
+        return
+    # построение и проверка моделями (до MAX_SWEEP_COMBINATIONS штук) — не в event loop
+    if samples:
+        candidates = await asyncio.to_thread(random_search, strategy, space, samples)
+    else:
+        candidates = await asyncio.to_thread(grid, strategy, space)
+    if not candidates:
+        await update.message.reply_text("❌ Ни одна комбинация не прошла проверку параметров.")
+        return
+
+    await update.message.reply_text(f"⏳ Подбор {strategy} для {symbol}: {len(candidates)} комбинаций за {days:g} дн...")
+    try:
+        candles = await market_data.run(lambda: OHLCVStore().sync(get_exchange(), symbol, "1m", days=days))
+        if candles is None or not len(candles):
+            await update.message.reply_text(f"❌ Нет истории для {symbol}.")
+            return
+        # spawn: fork из многопоточного бота унаследовал бы чужие занятые блокировки
+        workers = min(MAX_SWEEP_WORKERS, os.cpu_count() or 1)
+        results = await asyncio.to_thread(run_sweep, strategy, candles.close, candidates, top=5, workers=workers,
+                                          mp_context=multiprocessing.get_context("spawn"))
+    except Exception as e:
+        await update.message.reply_text(f"❌ Ошибка подбора: {e}")
+        return
+    await update.message.reply_text(f"🏆 Лучшие параметры {strategy} {symbol}:\n" + format_results(results))
+
+
+# ----------------- /profile (админ) -----------------
+async def profile_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /profile [секунд] — выборочный профиль event loop и его задержки."""
+    if update.effective_user.id not in settings.admin_ids:
+        await update.message.reply_text("⛔ Команда только для администраторов.")
+        return
+    try:
+        seconds = float(context.args[0]) if context.args else PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        await update.message.reply_text("Использование: /profile [секунд]")
+        return
+    seconds = min(max(seconds, 1), PROFILE_MAX_SECONDS)
+    if watchdog.loop_thread is None:
+        await update.message.reply_text("⚠️ Watchdog event loop не запущен.")
+        return
+
+    await update.message.reply_text(f"⏳ Профилирую event loop {seconds:g} с...")
+    profile = await asyncio.to_thread(sample_profile, watchdog.loop_thread, seconds)
+    lag = watchdog.summary()
+    await update.message.reply_text(
+        f"{format_profile(profile)}\n\n"
+        f"🩺 Задержка loop: p50 {lag['p50_ms']} мс / p99 {lag['p99_ms']} мс / max {lag['max_ms']} мс "
+        f"({lag['samples']} замеров), зависаний: {lag['stalls']}"
+    )
+
+
 # ----------------- Список стратегий -----------------
 async def list_strategies(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
 
-    # Берем из общего хранилища, где restore_strategies записывает активные стратегии
-    all_active = context.application.bot_data.get("active_strategies", {})
-
-    user_strats = all_active.get(chat_id, [])
+    user_strats = registry.user(chat_id)
 
     if not user_strats:
         await update.message.reply_text("⚠️ Нет запущенных стратегий.")
@@ -155,10 +308,8 @@ async def list_strategies(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     lines = []
     for s in user_strats:
-        lines.append(
-            f"📊 {s['symbol']}: шаг {s.get('params', {}).get('step', '?')}% / "
-            f"объём {s.get('params', {}).get('amount', '?')}"
-        )
+        params = ", ".join(f"{k}={v}" for k, v in s.params.items())
+        lines.append(f"📊 {s.type.upper()} {s.symbol}: {params}")
 
     await update.message.reply_text("📋 Активные стратегии:\n" + "\n".join(lines))
 
@@ -166,9 +317,9 @@ async def list_strategies(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ----------------- Стоп всех стратегий -----------------
 async def stop_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    stopped = stop_all_jobs(context.user_data)
+    stopped = registry.remove_user(update.effective_chat.id)
     if stopped:
-        text = "🛑 Остановлены стратегии:\n" + "\n".join(stopped)
+        text = "🛑 Остановлены стратегии:\n" + "\n".join(s.id for s in stopped)
     else:
         text = "⚠️ Нет запущенных стратегий."
     await update.message.reply_text(text)
@@ -220,12 +371,12 @@ async def buy_run(update: Update, context: ContextTypes.DEFAULT_TYPE):
         base, quote = symbol.split("/")
 
         # Цена и баланс
-        price = await asyncio.to_thread(sync_get_price, symbol)
+        price = await market_data.run(sync_get_price, symbol)
         if not price:
             await update.message.reply_text(f"❌ Пара {symbol} не поддерживается.", reply_markup=get_main_menu())
             return ConversationHandler.END
 
-        balance = await asyncio.to_thread(sync_get_balance)
+        balance = await account.run(sync_get_balance)
         quote_balance = Decimal(str(balance.get(quote, 0)))
 
         # Проверка минимального ордера и достаточности средств
@@ -299,12 +450,12 @@ async def sell_run(update: Update, context: ContextTypes.DEFAULT_TYPE):
         base, quote = symbol.split("/")
 
         # Цена и баланс
-        price = await asyncio.to_thread(sync_get_price, symbol)
+        price = await market_data.run(sync_get_price, symbol)
         if not price:
             await update.message.reply_text(f"❌ Пара {symbol} не поддерживается.", reply_markup=get_main_menu())
             return ConversationHandler.END
 
-        balance = await asyncio.to_thread(sync_get_balance)
+        balance = await account.run(sync_get_balance)
         base_balance = Decimal(str(balance.get(base, 0)))
 
         if base_balance < amount:
@@ -334,7 +485,7 @@ async def sell_run(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
-# ----------------- Percent / DCA / Range (Conversation flows) -----------------
+# ----------------- Percent / DCA / Range / Grid (Conversation flows) -----------------
 
 # ----------------- Percent -----------------
 async def percent_symbol(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -505,6 +656,87 @@ async def range_run(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+# ----------------- Grid -----------------
+async def grid_symbol(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text("Введите валютную пару (например BTC/USDT):", reply_markup=get_back_menu())
+    return GRID_SYMBOL
+
+async def grid_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data["grid_symbol"] = update.message.text.strip().upper()
+    await update.message.reply_text("Введите объём ордера на одном уровне (например 0.001):", reply_markup=get_back_menu())
+    return GRID_AMOUNT
+
+async def grid_low(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        context.user_data["grid_amount"] = float(update.message.text.strip())
+    except Exception:
+        await update.message.reply_text("❌ Неверный формат суммы. Операция отменена.", reply_markup=get_main_menu())
+        return ConversationHandler.END
+    await update.message.reply_text("Введите нижнюю границу сетки:", reply_markup=get_back_menu())
+    return GRID_LOW
+
+async def grid_high(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        context.user_data["grid_low"] = float(update.message.text.strip())
+    except Exception:
+        await update.message.reply_text("❌ Неверный формат минимума. Операция отменена.", reply_markup=get_main_menu())
+        return ConversationHandler.END
+    await update.message.reply_text("Введите верхнюю границу сетки:", reply_markup=get_back_menu())
+    return GRID_HIGH
+
+async def grid_levels(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        context.user_data["grid_high"] = float(update.message.text.strip())
+    except Exception:
+        await update.message.reply_text("❌ Неверный формат максимума.", reply_markup=get_main_menu())
+        return ConversationHandler.END
+    await update.message.reply_text("Введите число уровней (например 20):", reply_markup=get_back_menu())
+    return GRID_LEVELS
+
+async def grid_spacing(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        context.user_data["grid_levels"] = int(update.message.text.strip())
+    except Exception:
+        await update.message.reply_text("❌ Неверное число уровней.", reply_markup=get_main_menu())
+        return ConversationHandler.END
+    await update.message.reply_text(
+        "Шаг сетки: 1 — равный в цене (арифметический), 2 — равный в процентах (геометрический):",
+        reply_markup=get_back_menu()
+    )
+    return GRID_SPACING
+
+async def grid_interval(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    spacing = {"1": "arithmetic", "2": "geometric"}.get(update.message.text.strip())
+    if spacing is None:
+        await update.message.reply_text("❌ Введите 1 или 2.", reply_markup=get_main_menu())
+        return ConversationHandler.END
+    context.user_data["grid_spacing"] = spacing
+    await update.message.reply_text("Введите интервал в минутах:", reply_markup=get_back_menu())
+    return GRID_INTERVAL
+
+async def grid_run(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        interval = float(update.message.text.strip().replace(",", "."))
+        if interval <= 0:
+            raise ValueError
+    except Exception:
+        await update.message.reply_text(
+            "❌ Неверный формат интервала. Введите положительное число (например 1 или 0.5).",
+            reply_markup=get_main_menu()
+        )
+        return ConversationHandler.END
+
+    params = [context.user_data.get(f"grid_{k}") for k in ("symbol", "amount", "low", "high", "levels", "spacing")]
+    if any(p is None for p in params):
+        await update.message.reply_text("❌ Ошибка параметров.", reply_markup=get_main_menu())
+        return ConversationHandler.END
+
+    started = await start_grid_strategy(update, context, *params, interval)
+    if started:
+        await update.message.reply_text("✅ Grid-стратегия запущена.", reply_markup=get_main_menu())
+    return ConversationHandler.END
+
+
 # ----------------- STOP callback -----------------
 async def stop_strategy_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -513,11 +745,8 @@ async def stop_strategy_callback(update: Update, context: ContextTypes.DEFAULT_T
     await query.answer()
     job_key = query.data.replace("STOP:", "")
 
-    res = remove_job(context.user_data, job_key)
-    if res:
-        # remove_job возвращает (key, job) по твоему обновлённому state.py
-        key, _ = res
-        await query.edit_message_text(f"🛑 Стратегия {key} остановлена.")
+    if registry.remove(update.effective_chat.id, job_key):
+        await query.edit_message_text(f"🛑 Стратегия {job_key} остановлена.")
     else:
         await query.edit_message_text("⚠️ Стратегия уже не активна.")
 
@@ -525,7 +754,7 @@ async def stop_strategy_callback(update: Update, context: ContextTypes.DEFAULT_T
 # ----------------- Баланс (с фильтрацией и порогами) -----------------
 async def show_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        raw_bal: Dict[str, Any] = await asyncio.to_thread(sync_get_balance)
+        raw_bal: Dict[str, Any] = await account.run(sync_get_balance)
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка получения баланса: {e}")
         return
@@ -554,7 +783,7 @@ async def show_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
             continue
         pair = f"{asset}/USDT"
         try:
-            price = await asyncio.to_thread(sync_get_price, pair)
+            price = await market_data.run(sync_get_price, pair)
             usd = price * amt
             display.append(f"{asset}: {amt} (≈ {usd:.2f} USDT)")
         except Exception:
@@ -573,7 +802,7 @@ async def show_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 continue
         pair = f"{asset}/USDT"
         try:
-            price = await asyncio.to_thread(sync_get_price, pair)
+            price = await market_data.run(sync_get_price, pair)
             usd = price * amt
             checks += 1
             if usd >= MIN_USD_VALUE:
@@ -621,6 +850,9 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif text == "Range":
         return await range_symbol(update, context)
 
+    elif text == "Grid":
+        return await grid_symbol(update, context)
+
     elif text == "🛑 Стоп все":
         return await stop_all(update, context)
 
@@ -642,17 +874,112 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # прочие текстовые события обрабатываются ConversationHandler'ами
 
 
+# ----------------- Startup -----------------
+async def on_startup(app):
+    watchdog.start()
+    connection.attach(asyncio.get_running_loop())  # report_failure из потоков переподключает здесь
+
+    logger.info("🔁 Восстановление стратегий при старте...")
+    from datetime import datetime
+    from utils import reconcile_orders
+
+    # Сверяем ордера, исход которых неизвестен после прошлого запуска
+    try:
+        await orders.run(reconcile_orders)
+    except Exception as e:
+        logger.warning(f"Не удалось сверить журнал ордеров: {e}")
+
+    # Восстанавливаем
+    restored = await restore_strategies(app)
+    logger.info(f"✅ Стратегии восстановлены: {restored}")
+
+    bot = app.bot
+
+    # Если ничего не восстановлено
+    if not restored:
+        logger.info("⚠️ Нет сохранённых стратегий для уведомления.")
+        return
+
+    # Формируем время
+    time_now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # Рассылаем уведомления пользователям
+    for chat_id in registry.users():
+        strategies = registry.user(chat_id)
+        msg = (
+                f"✅ Стратегии успешно восстановлены\n"
+                f"🕒 Перезапуск: {time_now}\n\n"
+                f"📋 Активные стратегии:\n"
+                + "\n".join(f"• {s.type.upper()} — {s.symbol}" for s in strategies)
+        )
+
+        try:
+            await bot.send_message(chat_id=chat_id, text=msg)
+        except Exception as e:
+            logger.warning(f"Не удалось отправить уведомление пользователю {chat_id}: {e}")
+
+
 # ----------------- Main -----------------
-def main():
-    logger.info("🚀 Запуск Telegram-бота...")
+def _watch_overlaps(app: Application):
+    """Запуск пропущен планировщиком, потому что предыдущий ещё идёт — считаем в метриках."""
+    scheduler = app.job_queue.scheduler
+
+    def on_max_instances(event):
+        job = scheduler.get_job(event.job_id)
+        strategy = job.name.split(":", 1)[0] if job is not None and job.name else "unknown"
+        metrics.labeled(metrics.JOB_SKIPPED, strategy, metrics.OVERLAP).inc()
+
+    scheduler.add_listener(on_max_instances, EVENT_JOB_MAX_INSTANCES)
+
 
-    app = Application.builder().token(TELEGRAM_TOKEN).build()
+def _count_active(record):
+    metrics.labeled(metrics.ACTIVE_STRATEGIES, str(record.user_id)).set(registry.count(record.user_id))
+
+
+def _forget_health(record):
+    supervisor.forget(record.key)
+
+
+def _bind_registry():
+    """Файл стратегий, метрики и supervisor следуют за реестром (подписки идемпотентны)."""
+    registry.on_added(state_manager.persist_added)
+    registry.on_removed(state_manager.persist_removed)
+    registry.on_added(_count_active)
+    registry.on_removed(_count_active)
+    registry.on_removed(_forget_health)
+    registry.on_removed(cancel_grid_orders)
+
+
+async def on_shutdown(app):
+    await state_manager.flush()
+
+
+def build_application(token: str = TELEGRAM_TOKEN, request=None, get_updates_request=None) -> Application:
+    """
+    Приложение со всеми обработчиками. request / get_updates_request — свой транспорт
+    Bot API (например, фейковый Telegram в нагрузочном тесте scripts/loadtest.py).
+    Запросы бота (кроме getUpdates) идут через metrics.InstrumentedRequest.
+    """
+    bot_request = request if request is not None else HTTPXRequest(connection_pool_size=256)  # как у PTB по умолчанию
+    builder = Application.builder().token(token).post_init(on_startup).post_shutdown(on_shutdown)
+    builder = builder.request(metrics.InstrumentedRequest(bot_request))
+    if request is not None:
+        builder = builder.get_updates_request(get_updates_request or request)
+    app = builder.build()
+    metrics.UPDATE_QUEUE.set_function(app.update_queue.qsize)
+    _watch_overlaps(app)
+    _bind_registry()
 
     # Команды
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("list_strategies", list_strategies))
     app.add_handler(CommandHandler("stop_grid", stop_all))
     app.add_handler(CommandHandler("price", check_price_cli))
+    app.add_handler(CommandHandler("watch", watch_add))
+    app.add_handler(CommandHandler("unwatch", watch_remove))
+    app.add_handler(CommandHandler("watchlist", watch_show))
+    app.add_handler(CommandHandler("sweep", sweep_cmd))
+    app.add_handler(CommandHandler("profile", profile_cmd))
     app.add_handler(CallbackQueryHandler(stop_strategy_callback, pattern="^STOP:"))
 
     # ConversationHandlers
@@ -707,6 +1034,23 @@ def main():
     )
     app.add_handler(conv_range)
 
+    conv_grid = ConversationHandler(
+        entry_points=[MessageHandler(filters.Regex("^Grid$"), grid_symbol)],
+        states={
+            GRID_SYMBOL: [MessageHandler(filters.TEXT & ~filters.COMMAND, grid_amount)],
+            GRID_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, grid_low)],
+            GRID_LOW: [MessageHandler(filters.TEXT & ~filters.COMMAND, grid_high)],
+            GRID_HIGH: [MessageHandler(filters.TEXT & ~filters.COMMAND, grid_levels)],
+            GRID_LEVELS: [MessageHandler(filters.TEXT & ~filters.COMMAND, grid_spacing)],
+            GRID_SPACING: [MessageHandler(filters.TEXT & ~filters.COMMAND, grid_interval)],
+            GRID_INTERVAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, grid_run)],
+        },
+        fallbacks=[],
+        name="conv_grid",
+        persistent=False,
+    )
+    app.add_handler(conv_grid)
+
     conv_buy = ConversationHandler(
         entry_points=[MessageHandler(filters.Regex("^💵 Купить$"), buy_symbol)],
         states={
@@ -733,49 +1077,15 @@ def main():
 
     # Общий обработчик текста
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
-    logger.info("Bot started")
-
-    # --- Асинхронное восстановление стратегий при запуске ---
-    # --- Асинхронное восстановление стратегий при запуске ---
-    async def on_startup(app):
-        logger.info("🔁 Восстановление стратегий при старте...")
-        from restore_strategies import restore_strategies
-        from datetime import datetime
-
-        # Восстанавливаем
-        await restore_strategies(app)
-        logger.info("✅ Стратегии восстановлены.")
+    return app
 
-        bot = app.bot
-        restored = app.bot_data.get("active_strategies", {})
-
-        # Если ничего не восстановлено
-        if not restored:
-            logger.info("⚠️ Нет сохранённых стратегий для уведомления.")
-            return
 
-        # Формируем время
-        time_now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Рассылаем уведомления пользователям
-        for chat_id, strategies in restored.items():
-            if not strategies:
-                continue
-
-            msg = (
-                    f"✅ Стратегии успешно восстановлены\n"
-                    f"🕒 Перезапуск: {time_now}\n\n"
-                    f"📋 Активные стратегии:\n"
-                    + "\n".join(f"• {s['type'].upper()} — {s['symbol']}" for s in strategies)
-            )
-
-            try:
-                await bot.send_message(chat_id=chat_id, text=msg)
-            except Exception as e:
-                logger.warning(f"Не удалось отправить уведомление пользователю {chat_id}: {e}")
-
-    # Привязываем хук
-    app.post_init = on_startup
+def main():
+    logger.info("🚀 Запуск Telegram-бота...")
+    if settings.METRICS_PORT:
+        metrics.start_server(settings.METRICS_HOST, settings.METRICS_PORT)
+    app = build_application()
+    logger.info("Bot started")
 
     # 🚀 Запуск polling
     logger.info("✅ Telegram-бот запущен. Ожидаю команды...")
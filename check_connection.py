@@ -3,6 +3,7 @@ import ccxt
 import logging
 import os
 from settings import settings
+from connection_manager import ConnectionManager
 
 # Временно устанавливаем уровень логов для отладки
 logging.basicConfig(level=logging.INFO)
@@ -22,7 +23,11 @@ def check_connection():
                 "default_spot_url": "https://testnet.binance.vision"
             }
         })
-        exchange.set_sandbox_mode(True)
+        if settings.BINANCE_BASE_URL:
+            # локальный мок (exchange/mock_server.py) или другой совместимый адрес
+            ConnectionManager._point_to(exchange, settings.BINANCE_BASE_URL)
+        else:
+            exchange.set_sandbox_mode(True)
 
         # 🔹 Добавляем обновление данных и проверку ключей
         exchange.check_required_credentials()
@@ -0,0 +1,63 @@
+# circuit_breaker.py
+"""
+Предохранитель (circuit breaker).
+
+closed    — запросы идут, ошибки подряд считаются;
+open      — после failure_threshold ошибок подряд запросы сразу отклоняются;
+half_open — через reset_timeout пропускается ровно один пробный запрос:
+            успех закрывает предохранитель, ошибка снова открывает его.
+"""
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def retry_in(self) -> float:
+        """Сколько секунд осталось до пробного запроса (0, если можно уже сейчас)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._state = CLOSED
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """Пробный запрос завершился без вердикта (например, отменён) — разрешить следующий."""
+        self._probing = False
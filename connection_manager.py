@@ -0,0 +1,227 @@
+# connection_manager.py
+"""
+Единственная точка подключения к бирже (ccxt).
+
+- Здоровье соединения отслеживается пассивно: по результатам обычных запросов
+  (report_success / report_failure), без пробных fetch_time() на каждый вызов.
+  После FAILURE_THRESHOLD сетевых ошибок подряд report_failure сам запускает
+  переподключение (в event loop, привязанном через attach). Счётчик меняется под
+  блокировкой (report_failure зовут потоки executors); пока запущенное так
+  переподключение не закончилось, новые ошибки второе не запускают.
+- Одновременно выполняется не больше одного переподключения; все, кто попросил
+  reconnect во время него, ждут тот же результат — или его ошибку.
+- При переподключении уже загруженные markets переносятся в новый объект,
+  load_markets() повторно не вызывается.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any
+
+import ccxt
+
+from settings import settings, EXCHANGE_NAME, USE_TESTNET
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 3        # сетевых ошибок подряд, после которых соединение считается нездоровым
+RECONNECT_COOLDOWN = 30      # секунд: повторные просьбы о reconnect в этом окне используют свежее соединение
+
+
+class ConnectionManager:
+    def __init__(self):
+        self.exchange: Any = None
+        self.failures = 0              # сетевых ошибок подряд
+        self.reconnects = 0            # выполненных переподключений
+        self.last_ok: float = 0.0
+        self.connected_at: float = 0.0
+        self._lock = threading.Lock()  # защищает создание объекта биржи между потоками
+        self._failures_lock = threading.Lock()  # failures и _reconnecting (не _lock: его держит _connect)
+        self._reconnecting = False     # переподключение по порогу ошибок запущено и не закончено
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.exchange is not None and self.failures < FAILURE_THRESHOLD
+
+    # --- пассивный учёт здоровья ---
+    def report_success(self):
+        with self._failures_lock:
+            self.failures = 0
+        self.last_ok = time.time()
+
+    def report_failure(self, exc: BaseException):
+        """Вызывается из любого потока; на пороге ошибок запускает общее переподключение."""
+        if not isinstance(exc, ccxt.NetworkError):
+            return
+        with self._failures_lock:
+            self.failures += 1
+            failures = self.failures
+            start = failures >= FAILURE_THRESHOLD and not self._reconnecting
+            if start:
+                self._reconnecting = True
+        if start:
+            logger.warning(f"⚠️ Соединение с биржей нездорово: {failures} сетевых ошибок подряд ({exc})")
+            self._schedule_reconnect()
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Event loop, в котором report_failure из потоков запускает переподключение."""
+        self._loop = loop
+
+    def _schedule_reconnect(self):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        loop = running or self._loop
+        try:
+            if loop is None or loop.is_closed():
+                raise RuntimeError("нет event loop")
+            if loop is running:
+                self._start_reconnect()
+            else:
+                loop.call_soon_threadsafe(self._start_reconnect)
+        except RuntimeError:
+            # без event loop (CLI) — переподключится следующий get_exchange(force_reconnect=True)
+            self._reconnect_done()
+
+    def _start_reconnect(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._reconnect(0))
+            self._task.add_done_callback(_retrieve)
+        self._task.add_done_callback(self._reconnect_done)
+        return self._task
+
+    def _reconnect_done(self, task: asyncio.Task | None = None):
+        # следующая ошибка сверх порога (например, переподключение не удалось) запустит новое
+        with self._failures_lock:
+            self._reconnecting = False
+
+    # --- подключение ---
+    def get(self):
+        """Текущее подключение; при первом вызове создаёт его (блокирующе, вызывать из потока)."""
+        if self.exchange is None:
+            with self._lock:
+                if self.exchange is None:
+                    self._connect()
+        return self.exchange
+
+    def _connect(self):
+        """Создаёт новый объект биржи. Вызывается под self._lock."""
+        logger.info("🔄 Подключение к бирже...")
+        try:
+            exchange_class = getattr(ccxt, EXCHANGE_NAME)
+            new_exchange = exchange_class({
+                "apiKey": settings.api_key,
+                "secret": settings.api_secret,
+                "enableRateLimit": True,
+                "options": {
+                    "defaultType": "spot",
+                    "adjustForTimeDifference": True
+                }
+            })
+
+            if settings.BINANCE_BASE_URL:
+                self._point_to(new_exchange, settings.BINANCE_BASE_URL)
+            elif USE_TESTNET and hasattr(new_exchange, "set_sandbox_mode"):
+                new_exchange.set_sandbox_mode(True)
+                logger.info("🧪 Используется тестовая сеть Binance (Testnet).")
+
+            if not settings.is_paper:
+                new_exchange.check_required_credentials()
+            old = self.exchange
+            if old is not None and getattr(old, "markets", None):
+                new_exchange.set_markets(old.markets, old.currencies)
+            else:
+                new_exchange.load_markets()
+            new_exchange.fetch_time()  # пробное обращение
+            if settings.is_paper:
+                new_exchange = self._paper(old, new_exchange)
+        except ccxt.AuthenticationError:
+            logger.error("❌ Ошибка API-ключей. Проверь .env.")
+            raise
+        except ccxt.NetworkError as e:
+            self.report_failure(e)
+            logger.warning(f"⚠️ Ошибка сети при подключении: {e}")
+            raise
+
+        self.exchange = new_exchange
+        self.connected_at = time.time()
+        self.report_success()
+        logger.info("✅ Успешное подключение к бирже.")
+
+    @staticmethod
+    def _point_to(exchange, base_url: str):
+        """Все спотовые REST-адреса ccxt — на base_url (например, локальный мок Binance)."""
+        base_url = base_url.rstrip("/")
+        exchange.urls["api"] = {
+            name: base_url + "/api/" + url.split("/api/", 1)[1]
+            if isinstance(url, str) and url.startswith("https://api.binance.com/api/") else url
+            for name, url in exchange.urls["api"].items()
+        }
+        exchange.options["fetchMarkets"] = ["spot"]
+        exchange.options["fetchCurrencies"] = False
+        logger.info(f"🧪 REST API биржи: {base_url}")
+
+    @staticmethod
+    def _paper(old, source):
+        """MODE=paper: ордера и балансы локальные, ccxt — только источник цен."""
+        from exchange.paper import PaperExchange, parse_balances
+
+        if isinstance(old, PaperExchange):
+            old.source = source  # при переподключении балансы и ордера сохраняются
+            return old
+        logger.info("📝 Бумажная торговля: ордера исполняются локально.")
+        return PaperExchange(source, parse_balances(settings.PAPER_BALANCE),
+                             fee_rate=settings.PAPER_FEE_RATE, slippage=settings.PAPER_SLIPPAGE)
+
+    def reconnect_blocking(self):
+        """Синхронное переподключение (для кода, работающего в потоках)."""
+        with self._lock:
+            if time.time() - self.connected_at < RECONNECT_COOLDOWN and self.healthy:
+                return self.exchange
+            self._connect()
+            self.reconnects += 1
+        return self.exchange
+
+    async def reconnect(self, delay: float = 0):
+        """
+        Переподключение без блокировки event loop.
+        Если переподключение уже идёт — ждёт его; если только что прошло и соединение
+        здорово — возвращает его. Неудачное переподключение поднимает ошибку у всех ожидающих.
+        """
+        self._loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            if time.time() - self.connected_at < RECONNECT_COOLDOWN and self.healthy:
+                return self.exchange
+            self._task = asyncio.ensure_future(self._reconnect(delay))
+            self._task.add_done_callback(_retrieve)
+        return await asyncio.shield(self._task)
+
+    async def _reconnect(self, delay: float):
+        if delay:
+            logger.warning(f"♻️ Переподключение к бирже через {delay} секунд...")
+            await asyncio.sleep(delay)
+
+        def _run():
+            with self._lock:
+                self._connect()
+                self.reconnects += 1
+            return self.exchange
+
+        try:
+            return await asyncio.to_thread(_run)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка переподключения: {e}")
+            raise
+
+
+def _retrieve(task: asyncio.Task):
+    # ошибку получают ожидающие; если их нет (запуск из report_failure) — она уже в логе
+    if not task.cancelled():
+        task.exception()
+
+
+connection = ConnectionManager()
@@ -16,11 +16,49 @@ MAX_PRICE_CHECKS = 40              # максимум запросов цены
 
 # === Интервалы и тайминги ===
 DEFAULT_STRATEGY_INTERVAL = 5      # интервал по умолчанию (минуты)
-MAX_STRATEGIES_PER_USER = 10       # лимит на количество активных стратегий
+MAX_STRATEGIES_PER_USER = 20       # лимит на количество активных стратегий
+MAX_PARALLEL_PRICE_REQUESTS = 8    # параллельных запросов цены, если пакетный запрос недоступен
+EXECUTOR_MARKET_DATA_WORKERS = 8   # потоков для цен и истории (executors.market_data)
+EXECUTOR_ACCOUNT_WORKERS = 4       # потоков для баланса и проверок перед ордером (executors.account)
+EXECUTOR_ORDERS_WORKERS = 4        # потоков для ордеров (executors.orders)
+TICK_BUDGET_SHARE = 0.8            # доля интервала задачи, отведённая на один запуск
+TICK_BUDGET_MAX = 120              # потолок бюджета запуска (сек)
+SUPERVISOR_FAILURE_THRESHOLD = 3   # ошибок биржи подряд до паузы стратегии
+SUPERVISOR_BACKOFF_BASE = 60       # первая пауза стратегии (сек), дальше удваивается
+SUPERVISOR_BACKOFF_MAX = 1800      # максимальная пауза стратегии (сек)
+
+STRATEGIES_SAVE_DELAY = 1.0        # изменения стратегий пишутся в файл пачкой раз в столько секунд
+
+# === Сеточная стратегия (Grid) ===
+GRID_MAX_LEVELS = 500              # максимум уровней в сетке
+GRID_ACTIVE_BUYS = 10              # лимитных покупок на ближайших уровнях ниже цены (окно)
+
+# === Журнал ордеров ===
+ORDER_JOURNAL_COMPACT_EVERY = 1000 # завершённых ордеров между сжатиями журнала
+ORDER_JOURNAL_KEEP_FINISHED = 200  # последних завершённых ордеров, которые сжатие оставляет
 
 # === Биржевые настройки ===
 DEFAULT_EXCHANGE = "binance"       # биржа по умолчанию
 DEFAULT_USE_TESTNET = True         # использовать тестовую сеть, если не указано иное
 
 # === Отображение и логика ===
-MAJOR_ASSETS = ["BTC", "ETH", "BNB", "SOL", "XRP", "ADA", "LTC", "DOT", "TRX", "MATIC"]
\ No newline at end of file
+MAJOR_ASSETS = ["BTC", "ETH", "BNB", "SOL", "XRP", "ADA", "LTC", "DOT", "TRX", "MATIC"]
+MAX_WATCHLIST_SIZE = 30            # максимум пар в избранном пользователя
+
+# === Бэктест и подбор параметров ===
+MAX_SWEEP_COMBINATIONS = 5000      # лимит комбинаций для /sweep в Telegram
+MAX_SWEEP_DAYS = 90                # максимальная глубина истории для /sweep (дней)
+MAX_SWEEP_WORKERS = 2              # процессов на один /sweep (остальные ядра — боту)
+
+# === Пакетные решения стратегий ===
+BATCH_KERNEL_MIN = 64              # с какого размера пакета решать ядрами NumPy, а не по одной (scripts/bench.py)
+
+# === Запись тиков ===
+TICK_RING_CAPACITY = 262_144      # записей в кольце на символ (32 байта каждая, ~8 МБ)
+
+# === Наблюдение за event loop ===
+LOOP_LAG_PROBE_INTERVAL = 0.1      # как часто мерить задержку loop (сек)
+LOOP_STALL_THRESHOLD = 0.25        # задержка, после которой снимается стек зависшего колбэка (сек)
+PROFILE_DEFAULT_SECONDS = 10       # /profile без аргумента
+PROFILE_MAX_SECONDS = 60           # максимум для /profile
+PROFILE_SAMPLE_INTERVAL = 0.005    # период выборки стека профайлером (сек)
@@ -0,0 +1,86 @@
+# deadline.py
+"""
+Дедлайн текущего запуска стратегии.
+
+resilient_strategy задаёт дедлайн на каждый запуск задачи (scope), он живёт в
+contextvars и поэтому виден во всём, что вызвано из запуска, в том числе в потоках
+asyncio.to_thread (контекст копируется). Вызовы биржи перед началом проверяют его
+(check) и не начинаются, если время вышло; асинхронный клиент ещё и ограничивает
+таймаут запроса и повторы оставшимся временем (remaining).
+
+Ордер, записанный в журнал, отправляется вне дедлайна и до конца
+(complete_if_cancelled): обрыв на середине оставил бы его исход неизвестным.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import Context, ContextVar, copy_context
+
+
+class DeadlineExceeded(TimeoutError):
+    """Время запуска вышло — новые вызовы биржи не начинаются."""
+
+
+class Deadline:
+    __slots__ = ("expires_at",)
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+_current: ContextVar[Deadline | None] = ContextVar("deadline", default=None)
+
+
+def detached() -> Context:
+    """Копия текущего контекста без дедлайна — для работы, которую нельзя обрывать на середине."""
+    context = copy_context()
+    context.run(_current.set, None)
+    return context
+
+
+async def complete_if_cancelled(coro):
+    """
+    Выполняет coro без дедлайна и до конца, даже если вызвавшую задачу отменили:
+    ордер, ушедший на биржу, должен попасть в журнал, а блокировка пары — держаться,
+    пока он не записан. Отмена пробрасывается после завершения.
+    """
+    task = asyncio.get_running_loop().create_task(coro, context=detached())
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await asyncio.wait([task])
+        if not task.cancelled():
+            task.exception()  # исход уже в журнале и логе; отмена важнее
+        raise
+
+
+@contextmanager
+def scope(seconds: float | None):
+    """Дедлайн через seconds секунд для всего, что выполняется внутри блока (None — без дедлайна)."""
+    token = _current.set(None if seconds is None else Deadline(seconds))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def remaining() -> float | None:
+    """Сколько секунд осталось (None — дедлайна нет)."""
+    current = _current.get()
+    return None if current is None else current.remaining()
+
+
+def check(what: str = ""):
+    """DeadlineExceeded, если дедлайн уже прошёл."""
+    current = _current.get()
+    if current is not None and current.remaining() <= 0:
+        raise DeadlineExceeded(f"дедлайн запуска истёк{': ' + what if what else ''}")
+
+
+def cap(timeout: float) -> float:
+    """timeout, урезанный до оставшегося времени (не меньше 0)."""
+    left = remaining()
+    return timeout if left is None else max(min(timeout, left), 0.0)
@@ -2,20 +2,18 @@
 import ccxt
 import logging
 import asyncio
-from datetime import datetime, timedelta
+import time
 
-from utils import get_exchange
-from state import remove_job
+import deadline
+import metrics
+from constants import TICK_BUDGET_SHARE, TICK_BUDGET_MAX
+from logging_config import SAMPLE
 
-logger = logging.getLogger(__name__)
+from utils import reconnect_exchange
+from strategy_registry import registry
+from supervisor import supervisor, postpone
 
-async def reconnect_exchange():
-    """
-    Переподключение к бирже.
-    """
-    logger.info("🔁 Переподключение к бирже...")
-    await asyncio.sleep(5)
-    return await get_exchange()
+logger = logging.getLogger(__name__)
 
 
 async def safe_notify(context, chat_id, text):
@@ -23,61 +21,107 @@ async def safe_notify(context, chat_id, text):
     try:
         await context.bot.send_message(chat_id, text)
     except Exception as e:
-        logger.debug(f"Не удалось отправить сообщение пользователю {chat_id}: {e}")
+        logger.debug(f"Не удалось отправить сообщение пользователю {chat_id}: {e}", extra=SAMPLE)
+
+def tick_budget(job) -> float | None:
+    """Бюджет одного запуска: доля интервала задачи, не больше TICK_BUDGET_MAX секунд."""
+    scheduled = getattr(job, "job", None)
+    if scheduled is not None:
+        interval = getattr(getattr(scheduled, "trigger", None), "interval", None)
+        interval = interval.total_seconds() if interval is not None else None
+    else:
+        interval = getattr(job, "interval", None)
+    if not interval:
+        return None
+    return min(interval * TICK_BUDGET_SHARE, TICK_BUDGET_MAX)
+
 
 def resilient_strategy(func):
     """
     Универсальный декоратор для стратегий:
-    - защищает от сетевых и API-ошибок;
-    - делает переподключение через reconnect_exchange();
-    - не падает даже при временной потере интернета.
+    - запуск ограничен дедлайном (tick_budget от планового времени): опоздавший
+      запуск пропускается, не уложившийся — отменяется;
+    - ошибки биржи (сеть, API, таймаут) не повторяются внутри запуска — их считает
+      supervisor: после нескольких подряд стратегия ставится на паузу с растущим
+      интервалом (следующий запуск переносится), затем пробует снова сама;
+    - при сетевой ошибке переподключение запускается в фоне, запуск его не ждёт;
+    - прочие ошибки — стратегия останавливается и освобождает слот.
     """
+    strategy = func.__name__.removesuffix("_job")  # метка в метриках: percent, range, dca
+
     async def wrapper(context, *args, **kwargs):
         job = getattr(context, "job", None)
         chat_id = getattr(job, "chat_id", None)
-        retry_count = 0
-        max_retries = 5
-        retry_delay = 30  # секунд между попытками
-
-        while retry_count < max_retries:
-            try:
-                await func(context, *args, **kwargs)
-                if retry_count > 0:
-                    logger.info(f"✅ Стратегия {func.__name__} восстановилась после {retry_count} попыток.")
-                return
-
-            except ccxt.NetworkError as e:
-                retry_count += 1
-                logger.warning(f"🌐 NetworkError ({retry_count}/{max_retries}) в {func.__name__}: {e}")
-                await safe_notify(context, chat_id, f"🌐 Потеря связи, переподключение #{retry_count}...")
-                await reconnect_exchange(delay=10)
-                await asyncio.sleep(retry_delay)
-
-            except ccxt.ExchangeError as e:
-                retry_count += 1
-                logger.warning(f"⚠️ ExchangeError ({retry_count}/{max_retries}) в {func.__name__}: {e}")
-                await safe_notify(context, chat_id, f"⚠️ Ошибка API, попытка #{retry_count}...")
-                await asyncio.sleep(retry_delay)
-
-            except Exception as e:
-                logger.exception(f"💥 Ошибка в {func.__name__}: {e}")
-                if job:
-                    job.schedule_removal()
-                    if chat_id:
-                        remove_job(context.application.user_data.get(chat_id, {}), job.name)
-                        await safe_notify(context, chat_id, f"❌ Ошибка {func.__name__}: {e}")
-                break
-
-        # Если после 5 попыток не восстановилось
-        if retry_count >= max_retries:
-            logger.error(f"❌ Стратегия {func.__name__} упала окончательно после {max_retries} попыток.")
-            if chat_id:
-                await safe_notify(context, chat_id, f"❌ {func.__name__} не удалось восстановить связь. Попробует снова через 5 мин...")
+        name = getattr(job, "name", None) or func.__name__
+        key = (chat_id, name)
+
+        lag = metrics.job_lag(job)
+        if lag is not None:
+            metrics.labeled(metrics.JOB_LAG, strategy).observe(lag)
+
+        budget = tick_budget(job)
+        left = None if budget is None else budget - (lag or 0.0)
+        if left is not None and left <= 0:
+            metrics.labeled(metrics.JOB_SKIPPED, strategy, metrics.LATE).inc()
+            logger.warning(f"⏭ {func.__name__} ({name}) опоздал на {lag:.1f} с — запуск пропущен.")
+            return
+        if not supervisor.allow(key):
+            metrics.labeled(metrics.JOB_SKIPPED, strategy, metrics.BACKOFF).inc()
+            logger.debug(f"⏸ {func.__name__} ({name}) на паузе ещё {supervisor.retry_in(key):.0f} с.", extra=SAMPLE)
+            return
+
+        started = time.perf_counter()
+        try:
+            with deadline.scope(left):
+                async with asyncio.timeout(left):
+                    await func(context, *args, **kwargs)
+
+        except TimeoutError as e:  # в том числе deadline.DeadlineExceeded из вызовов биржи
+            metrics.labeled(metrics.JOB_SKIPPED, strategy, metrics.TIMEOUT).inc()
+            limit = f"не уложился в {budget:.1f} с" if budget is not None else f"таймаут: {e}"
+            logger.warning(f"⏱ {func.__name__} ({name}) {limit} — запуск прерван.")
+            await _failed(context, job, key, e)
+
+        except ccxt.NetworkError as e:
+            logger.warning(f"🌐 NetworkError в {func.__name__} ({name}): {e}")
+            supervisor.spawn(reconnect_exchange(delay=0))
+            await _failed(context, job, key, e)
+
+        except ccxt.ExchangeError as e:
+            logger.warning(f"⚠️ ExchangeError в {func.__name__} ({name}): {e}")
+            await _failed(context, job, key, e)
+
+        except Exception as e:
+            logger.exception(f"💥 Ошибка в {func.__name__}: {e}")
+            supervisor.forget(key)
             if job:
-                try:
-                    new_run_time = datetime.now() + timedelta(minutes=5)
-                    job.reschedule(trigger='date', run_date=new_run_time)
-                    logger.info(f"♻️ Перезапуск {func.__name__} запланирован на {new_run_time}")
-                except Exception as e:
-                    logger.error(f"Не удалось перепланировать задачу {func.__name__}: {e}")
+                if registry.remove(chat_id, name) is None:
+                    job.schedule_removal()
+                if chat_id:
+                    await safe_notify(context, chat_id, f"❌ Ошибка {func.__name__}: {e}")
+
+        except BaseException:
+            supervisor.release(key)  # отменён (остановка приложения) — пробный запуск не потрачен
+            raise
+
+        else:
+            if supervisor.record_success(key):
+                logger.info(f"✅ Стратегия {func.__name__} ({name}) возобновлена.")
+                if chat_id:
+                    await safe_notify(context, chat_id, f"✅ {name}: связь восстановлена, стратегия снова работает.")
+
+        finally:
+            metrics.labeled(metrics.JOB_DURATION, strategy).observe(time.perf_counter() - started)
+
+    async def _failed(context, job, key, error):
+        pause = supervisor.record_failure(key)
+        if pause is None:
+            return
+        chat_id, name = key
+        metrics.labeled(metrics.STRATEGY_PAUSES, strategy).inc()
+        logger.error(f"⏸ {func.__name__} ({name}): ошибки подряд, пауза {pause:.0f} с. Последняя: {error}")
+        postpone(job, pause)
+        if chat_id:
+            await safe_notify(context, chat_id, f"⏸ {name}: ошибки биржи, пауза {pause / 60:.1f} мин. Затем попробует снова.")
+
     return wrapper
@@ -0,0 +1,14 @@
+# exchange/__init__.py
+from exchange.base import Exchange
+from exchange.binance import BinanceExchange
+from exchange.paper import PaperExchange
+
+
+def create_exchange() -> Exchange:
+    """Асинхронная биржа по settings.MODE: "paper" — бумажная (общая с utils), иначе Binance."""
+    from settings import settings
+
+    if settings.is_paper:
+        from connection_manager import connection
+        return connection.get()
+    return BinanceExchange()
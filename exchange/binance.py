@@ -1,69 +1,172 @@
 import time
+import json
+import asyncio
 import hmac
 import hashlib
+import logging
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import AsyncRetrying, stop_after_attempt, stop_before_delay, wait_exponential, wait_random, retry_if_exception
 from aiolimiter import AsyncLimiter
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from settings import settings
+from singleflight import AsyncSingleFlight
+from circuit_breaker import CircuitBreaker
+import deadline
+import metrics
+from order_journal import journal, INTENT, PLACED
+from executors import orders
+from fixed import Scale
+from constants import MAX_PARALLEL_PRICE_REQUESTS
+from exchange.errors import (
+    classify, ExchangeAPIError, RetryableError, NotExecutedError, RateLimitError, PermanentError, CircuitOpenError,
+    ORDER_NOT_FOUND_CODE,
+)
+
+logger = logging.getLogger(__name__)
 
 _BINANCE_BASE = "https://api.binance.com"
 _BINANCE_TEST = "https://testnet.binance.vision"
 
+MAX_ATTEMPTS = 3          # попыток на один запрос (включая первую)
+RETRY_BUDGET = 10.0       # секунд: после этого новых попыток не начинаем
+MAX_RETRY_AFTER = 5.0     # ждём Retry-After только если он не длиннее; иначе ошибка сразу
+
+# 0.25, 0.5, 1 … до 1.75 с плюс случайные до 0.25 с — не больше 2 с
+_backoff = wait_exponential(multiplier=0.25, max=1.75) + wait_random(0, 0.25)
+
+
+def _should_retry(exc: BaseException) -> bool:
+    if isinstance(exc, RateLimitError):
+        return exc.retry_after <= MAX_RETRY_AFTER
+    return isinstance(exc, RetryableError)
+
+
+def _wait(retry_state) -> float:
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RateLimitError):
+        return exc.retry_after
+    return _backoff(retry_state)
+
+
 class BinanceExchange:
     def __init__(self):
         self.api_key = settings.BINANCE_API_KEY
         self.secret = settings.BINANCE_API_SECRET.encode()
-        self.base = _BINANCE_TEST if settings.MODE == "testnet" else _BINANCE_BASE
+        self.base = settings.BINANCE_BASE_URL or (_BINANCE_TEST if settings.MODE == "testnet" else _BINANCE_BASE)
         # Простой лимитер: 10 запросов/сек — подстрой под реальные лимиты
         self.limiter = AsyncLimiter(10, 1)
-        self._client = httpx.AsyncClient(base_url=self.base, timeout=20.0)
+        # Сколько поштучных запросов цены можно держать одновременно (fallback для get_prices)
+        self.max_parallel = MAX_PARALLEL_PRICE_REQUESTS
+        self._client = httpx.AsyncClient(base_url=self.base, timeout=httpx.Timeout(10.0, connect=5.0))
+
+        # Одинаковые одновременные GET-запросы (тикер, баланс, exchangeInfo, открытые ордера)
+        # делят один HTTP-вызов; стоит под TTL-кэшем exchangeInfo
+        self._reads = AsyncSingleFlight("binance")
+
+        # Предохранитель на каждый эндпоинт ("GET /api/v3/account" и т.п.)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # После 429/418 все запросы ждут до этого момента (time.monotonic)
+        self._banned_until: float = 0.0
 
         self._exchange_info_cache: Optional[Dict[str, Any]] = None
         self._exchange_info_ts: float = 0.0
+        # Шаги пар из exchangeInfo (fixed.Scale) — для форматирования и проверки ордеров
+        self._scales: Dict[str, Scale] = {}
 
     async def _auth_headers(self) -> Dict[str, str]:
         return {"X-MBX-APIKEY": self.api_key}
 
     def _sign(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        query = httpx.QueryParams(params).encode()
+        query = str(httpx.QueryParams(params)).encode()
         sig = hmac.new(self.secret, query, hashlib.sha256).hexdigest()
         params["signature"] = sig
         return params
 
-    @retry(
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=0.5, min=0.5, max=8),
-        retry=retry_if_exception_type(httpx.HTTPError),
-        reraise=True,
-    )
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+    async def _send(self, method: str, path: str, params: Dict[str, Any] | None, signed: bool):
+        """
+        Одна попытка запроса. Любая ошибка httpx превращается в ExchangeAPIError.
+        Таймаут урезается до остатка дедлайна запуска; если он истёк — DeadlineExceeded.
+        """
+        endpoint = f"{method} {path}"
+        deadline.check(endpoint)
+        banned_for = self._banned_until - time.monotonic()
+        if banned_for > 0:
+            raise RateLimitError(endpoint, "ожидание после лимита запросов", banned_for)
+        breaker = self._breaker(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(endpoint, breaker.retry_in())
+
+        params = dict(params) if params else {}
+        try:
+            async with self.limiter:
+                if signed:
+                    params["timestamp"] = int(time.time() * 1000)
+                    params = self._sign(params)
+                started = time.perf_counter()  # ожидание лимитера — не латентность биржи
+                timeout = httpx.Timeout(deadline.cap(10.0), connect=deadline.cap(5.0))
+                r = await self._client.request(method, path, params=params, timeout=timeout,
+                                               headers=(await self._auth_headers() if signed else None))
+                metrics.observe_weight("binance", r.headers)
+                r.raise_for_status()
+        except httpx.HTTPError as e:
+            left = deadline.remaining()
+            if isinstance(e, httpx.TimeoutException) and left is not None and left <= 0:
+                # таймаут урезан дедлайном запуска — эндпоинт тут ни при чём
+                metrics.observe_rest("binance", endpoint, started, e)
+                breaker.release()
+                raise deadline.DeadlineExceeded(endpoint) from e
+            err = classify(e, endpoint)
+            metrics.observe_rest("binance", endpoint, started, err)
+            if isinstance(err, RetryableError):
+                breaker.record_failure()
+            elif isinstance(err, RateLimitError):
+                breaker.release()
+                self._banned_until = max(self._banned_until, time.monotonic() + err.retry_after)
+            else:
+                breaker.record_success()  # биржа ответила осмысленной ошибкой — эндпоинт жив
+            raise err from e
+        except BaseException:
+            breaker.release()
+            raise
+        metrics.observe_rest("binance", endpoint, started)
+        breaker.record_success()
+        return r.json()
+
+    async def _request(self, method: str, path: str, params: Dict[str, Any] | None = None, signed: bool = False, retry: bool = True):
+        """
+        Запрос с повторами только для временных ошибок и лимитов с коротким Retry-After.
+        Постоянные ошибки (4xx) и открытый предохранитель возвращаются сразу.
+        """
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(MAX_ATTEMPTS if retry else 1) | stop_before_delay(deadline.cap(RETRY_BUDGET)),
+            wait=_wait,
+            retry=retry_if_exception(_should_retry),
+            reraise=True,
+        )
+        async for attempt in retrying:
+            with attempt:
+                return await self._send(method, path, params, signed)
+
     async def _get(self, path: str, params: Dict[str, Any] | None = None, signed: bool = False):
-        async with self.limiter:
-            if signed:
-                if params is None:
-                    params = {}
-                params["timestamp"] = int(time.time() * 1000)
-                params = self._sign(params)
-            r = await self._client.get(path, params=params, headers=(await self._auth_headers() if signed else None))
-            r.raise_for_status()
-            return r.json()
-
-    @retry(
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=0.5, min=0.5, max=8),
-        retry=retry_if_exception_type(httpx.HTTPError),
-        reraise=True,
-    )
-    async def _post(self, path: str, params: Dict[str, Any] | None = None, signed: bool = False):
-        async with self.limiter:
-            if signed:
-                if params is None:
-                    params = {}
-                params["timestamp"] = int(time.time() * 1000)
-                params = self._sign(params)
-            r = await self._client.post(path, params=params, headers=(await self._auth_headers() if signed else None))
-            r.raise_for_status()
-            return r.json()
+        return await self._request("GET", path, params, signed)
+
+    async def _post(self, path: str, params: Dict[str, Any] | None = None, signed: bool = False, retry: bool = False):
+        # POST по умолчанию не повторяется: повтор безопасен только если доказана идемпотентность
+        return await self._request("POST", path, params, signed, retry=retry)
+
+    async def _delete(self, path: str, params: Dict[str, Any] | None = None, signed: bool = False):
+        return await self._request("DELETE", path, params, signed)
+
+    async def _get_shared(self, path: str, params: Dict[str, Any] | None = None, signed: bool = False):
+        """GET, объединяющий одинаковые одновременные запросы в один."""
+        key = (path, signed, tuple(sorted((params or {}).items())))
+        return await self._reads.do(key, self._get, path, dict(params) if params else None, signed)
 
     async def close(self):
         await self._client.aclose()
@@ -71,36 +174,177 @@ class BinanceExchange:
     async def get_exchange_info(self) -> Dict[str, Any]:
         now = time.time()
         if not self._exchange_info_cache or now - self._exchange_info_ts > 900:  # 15 минут
-            data = await self._get("/api/v3/exchangeInfo")
+            data = await self._get_shared("/api/v3/exchangeInfo")
             self._exchange_info_cache = data
             self._exchange_info_ts = now
         return self._exchange_info_cache
 
+    async def _scale(self, sym: str) -> Scale:
+        scale = self._scales.get(sym)
+        if scale is None:
+            try:
+                info = await self.get_exchange_info()
+            except ExchangeAPIError as e:
+                logger.warning(f"⚠️ exchangeInfo недоступен, шаги {sym} по умолчанию: {e}")
+                return Scale()  # не кэшируем — в следующий раз попробуем снова
+            filters = next((s.get("filters") or [] for s in info.get("symbols", []) if s.get("symbol") == sym), [])
+            scale = self._scales[sym] = Scale.from_filters(filters)
+        return scale
+
     async def _normalize_symbol(self, symbol: str) -> str:
         return symbol.replace("/", "").upper()
 
     async def get_price(self, symbol: str) -> float:
         sym = await self._normalize_symbol(symbol)
-        data = await self._get("/api/v3/ticker/price", params={"symbol": sym})
+        data = await self._get_shared("/api/v3/ticker/price", params={"symbol": sym})
         return float(data["price"])
 
+    async def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Цены нескольких пар одним запросом; при ошибке — параллельно, не более max_parallel."""
+        if not symbols:
+            return {}
+        by_sym = {await self._normalize_symbol(s): s for s in symbols}
+        try:
+            data = await self._get_shared(
+                "/api/v3/ticker/price",
+                params={"symbols": json.dumps(list(by_sym), separators=(",", ":"))},
+            )
+            return {by_sym[d["symbol"]]: float(d["price"]) for d in data if d["symbol"] in by_sym}
+        except ExchangeAPIError:
+            # Binance отклоняет весь пакет, если хотя бы один символ неизвестен
+            pass
+
+        sem = asyncio.Semaphore(self.max_parallel)
+
+        async def _one(symbol: str):
+            async with sem:
+                try:
+                    return symbol, await self.get_price(symbol)
+                except ExchangeAPIError:
+                    return symbol, None
+
+        pairs = await asyncio.gather(*(_one(s) for s in by_sym.values()))
+        return {s: p for s, p in pairs if p is not None}
+
     async def place_order(self, symbol: str, side: str, type_: str, quantity: float, price: float | None = None, client_id: str | None = None) -> Dict[str, Any]:
+        if client_id:
+            # повтор с тем же clientOrderId: сначала журнал, затем биржа
+            entry = journal.get(client_id)
+            if entry and entry.get("status") == PLACED:
+                metrics.count_order(side, metrics.DUPLICATE)
+                return entry["order"]
+            if entry and entry.get("status") == INTENT:
+                existing = await self.get_order(symbol, client_id=client_id)
+                if existing is not None:
+                    await orders.run(journal.record_placed, client_id, existing)
+                    metrics.count_order(side, metrics.RECOVERED)
+                    return existing
+        else:
+            client_id = journal.new_client_id()
+
         sym = await self._normalize_symbol(symbol)
+        # Объём вниз до stepSize, цена до tickSize — целыми, без float-форматирования;
+        # заведомо отклоняемый биржей ордер не отправляется (как ответ -1013 FILTER_FAILURE)
+        scale = await self._scale(sym)
+        qty = scale.qty(quantity)
+        if qty <= 0:
+            raise PermanentError("POST /api/v3/order", f"LOT_SIZE: объём {quantity} меньше шага {scale.format_qty(scale.lot)}", code=-1013)
         params: Dict[str, Any] = {
             "symbol": sym,
             "side": side.upper(),
             "type": type_.upper(),
-            "quantity": f"{quantity:.8f}".rstrip("0").rstrip("."),
-            "newClientOrderId": client_id or f"ftb_{int(time.time()*1000)}",
+            "quantity": scale.format_qty(qty),
+            "newClientOrderId": client_id,
         }
         if type_.upper() == "LIMIT":
             assert price is not None
-            params["price"] = f"{price:.8f}".rstrip("0").rstrip(".")
+            px = scale.px(price)
+            if qty * px < scale.min_cost:
+                raise PermanentError("POST /api/v3/order", f"NOTIONAL: сумма {scale.format_cost(qty * px)} меньше {scale.format_cost(scale.min_cost)}", code=-1013)
+            params["price"] = scale.format_px(px)
             params["timeInForce"] = "GTC"
 
-        # Пре-чек шагов и minNotional можно добавить здесь, используя exchangeInfo
+        deadline.check("POST /api/v3/order")
+        # намерение на диске (fsync в потоке executors.orders) до отправки ордера
+        await orders.run(journal.record_intent, client_id, symbol, side, type_, quantity, price)
+
+        async def _submit():
+            try:
+                order = await self._submit_order(symbol, params)
+            except NotExecutedError as e:
+                await orders.run(journal.record_failed, client_id, e)  # до биржи не дошёл
+                metrics.count_order(side, metrics.FAILED)
+                raise
+            except RetryableError:
+                metrics.count_order(side, metrics.UNKNOWN)
+                raise  # исход неизвестен — ордер остаётся в журнале незавершённым до сверки
+            except ExchangeAPIError as e:
+                await orders.run(journal.record_failed, client_id, e)
+                metrics.count_order(side, metrics.FAILED)
+                raise
+            await orders.run(journal.record_placed, client_id, order)
+            metrics.count_order(side, metrics.PLACED)
+            return order
+
+        # ордер, записанный в журнал, отправляется без дедлайна и до конца, даже если
+        # запуск отменили (asyncio.timeout): обрыв посередине — неясный исход
+        return await deadline.complete_if_cancelled(_submit())
 
-        return await self._post("/api/v3/order", params=params, signed=True)
+    async def reconcile_orders(self) -> int:
+        """Сверяет незавершённые ордера журнала с биржей по origClientOrderId."""
+        done = 0
+        for entry in journal.pending():
+            try:
+                order = await self.get_order(entry["symbol"], client_id=entry["client_id"])
+            except ExchangeAPIError:
+                continue
+            if order is None:
+                await orders.run(journal.record_failed, entry["client_id"], "не найден на бирже при сверке")
+            else:
+                await orders.run(journal.record_placed, entry["client_id"], order)
+            done += 1
+        return done
+
+    async def _submit_order(self, symbol: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Отправка ордера. Повтор только когда доказано, что предыдущая попытка не исполнилась:
+        соединение не установлено или биржа отклонила запрос до исполнения (NotExecutedError,
+        429 с коротким Retry-After). После неясного исхода (таймаут, 5xx) ордер один раз
+        ищется по origClientOrderId; не найден — значит, ещё не виден, а не «не создан»:
+        RetryableError уходит вызывающему, ордер остаётся INTENT до сверки (reconcile_orders).
+        """
+        client_id = params["newClientOrderId"]
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                return await self._post("/api/v3/order", params=params, signed=True)
+            except (NotExecutedError, RateLimitError) as e:
+                if attempt == MAX_ATTEMPTS or not _should_retry(e):
+                    raise
+                delay = e.retry_after if isinstance(e, RateLimitError) else min(0.25 * 2 ** attempt, 2.0)
+                await asyncio.sleep(delay)
+            except RetryableError:
+                try:
+                    existing = await self.get_order(symbol, client_id=client_id)
+                except ExchangeAPIError:
+                    existing = None  # проверить не удалось — исход по-прежнему неизвестен
+                if existing is not None:
+                    return existing
+                raise
+
+    async def get_order(self, symbol: str, order_id: str | None = None, client_id: str | None = None) -> Dict[str, Any] | None:
+        """Статус ордера по orderId или origClientOrderId; None, если такого ордера нет."""
+        sym = await self._normalize_symbol(symbol)
+        params: Dict[str, Any] = {"symbol": sym}
+        if order_id:
+            params["orderId"] = order_id
+        if client_id:
+            params["origClientOrderId"] = client_id
+        try:
+            return await self._get("/api/v3/order", params=params, signed=True)
+        except PermanentError as e:
+            if e.code == ORDER_NOT_FOUND_CODE:
+                return None
+            raise
 
     async def cancel(self, symbol: str, order_id: str | None = None, client_id: str | None = None) -> Dict[str, Any]:
         sym = await self._normalize_symbol(symbol)
@@ -111,26 +355,15 @@ class BinanceExchange:
             params["origClientOrderId"] = client_id
         return await self._delete("/api/v3/order", params=params, signed=True)
 
-    @retry(
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=0.5, min=0.5, max=8),
-        retry=retry_if_exception_type(httpx.HTTPError),
-        reraise=True,
-    )
-    async def _delete(self, path: str, params: Dict[str, Any] | None = None, signed: bool = False):
-        async with self.limiter:
-            if signed:
-                if params is None:
-                    params = {}
-                params["timestamp"] = int(time.time() * 1000)
-                params = self._sign(params)
-            r = await self._client.delete(path, params=params, headers=(await self._auth_headers() if signed else None))
-            r.raise_for_status()
-            return r.json()
-
     async def get_balance(self, asset: str) -> float:
-        data = await self._get("/api/v3/account", signed=True)
+        data = await self._get_shared("/api/v3/account", signed=True)
         for b in data.get("balances", []):
             if b["asset"] == asset.upper():
                 return float(b["free"])
         return 0.0
+
+    async def get_open_orders(self, symbol: str | None = None) -> List[Dict[str, Any]]:
+        params: Dict[str, Any] = {}
+        if symbol:
+            params["symbol"] = await self._normalize_symbol(symbol)
+        return await self._get_shared("/api/v3/openOrders", params=params, signed=True)
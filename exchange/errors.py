@@ -0,0 +1,100 @@
+# exchange/errors.py
+"""
+Классификация ошибок REST API Binance.
+
+- RetryableError  — сеть, таймаут, 5xx, рассинхрон времени: повтор может помочь;
+  исход запроса при этом неизвестен — биржа могла его исполнить;
+- NotExecutedError — RetryableError, когда точно известно, что запрос не исполнен
+  (соединение не установлено, -1021): повтор POST не создаст второй ордер;
+- RateLimitError  — 429/418 и коды лимитов: ждать не меньше Retry-After, повтор раньше только продлит бан;
+- PermanentError  — остальные 4xx (неверное количество, нет баланса, неизвестный символ): повтор бесполезен;
+- CircuitOpenError — эндпоинт временно отключён предохранителем, запрос не отправлялся.
+"""
+import httpx
+
+# Коды Binance, которые означают временную проблему, а не ошибку запроса
+_RETRYABLE_CODES = {
+    -1000,  # UNKNOWN
+    -1001,  # DISCONNECTED
+    -1006,  # UNEXPECTED_RESP — статус исполнения неизвестен
+    -1007,  # TIMEOUT — статус исполнения неизвестен
+}
+# Запрос отклонён до исполнения — повтор с новым timestamp
+_NOT_EXECUTED_CODES = {
+    -1021,  # INVALID_TIMESTAMP
+}
+# Коды лимитов запросов / ордеров
+_RATE_LIMIT_CODES = {
+    -1003,  # TOO_MANY_REQUESTS
+    -1015,  # TOO_MANY_ORDERS
+}
+# Ответ на запрос ордера по origClientOrderId, если такого ордера нет
+ORDER_NOT_FOUND_CODE = -2013
+
+DEFAULT_RETRY_AFTER = 1.0  # секунд, если 429 пришёл без заголовка Retry-After
+
+
+class ExchangeAPIError(Exception):
+    def __init__(self, endpoint: str, message: str, status: int | None = None, code: int | None = None):
+        super().__init__(f"{endpoint}: {message}")
+        self.endpoint = endpoint
+        self.status = status
+        self.code = code
+
+
+class RetryableError(ExchangeAPIError):
+    pass
+
+
+class NotExecutedError(RetryableError):
+    pass
+
+
+class RateLimitError(ExchangeAPIError):
+    def __init__(self, endpoint: str, message: str, retry_after: float, status: int | None = None, code: int | None = None):
+        super().__init__(endpoint, message, status, code)
+        self.retry_after = retry_after
+
+
+class PermanentError(ExchangeAPIError):
+    pass
+
+
+class CircuitOpenError(ExchangeAPIError):
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(endpoint, f"предохранитель открыт, повтор через {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return max(float(response.headers.get("Retry-After", DEFAULT_RETRY_AFTER)), 0.0)
+    except ValueError:
+        return DEFAULT_RETRY_AFTER
+
+
+def classify(exc: httpx.HTTPError, endpoint: str) -> ExchangeAPIError:
+    """Превращает ошибку httpx в одну из ExchangeAPIError."""
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout)):
+        # соединение не установлено — запрос до биржи не дошёл
+        return NotExecutedError(endpoint, f"{type(exc).__name__}: {exc}")
+    if not isinstance(exc, httpx.HTTPStatusError):
+        # таймауты, обрывы соединения, ошибки протокола
+        return RetryableError(endpoint, f"{type(exc).__name__}: {exc}")
+
+    response = exc.response
+    status = response.status_code
+    code, msg = None, response.text[:200]
+    try:
+        body = response.json()
+        code, msg = body.get("code"), body.get("msg", msg)
+    except Exception:
+        pass
+
+    if status in (418, 429) or code in _RATE_LIMIT_CODES:
+        return RateLimitError(endpoint, f"{status} {msg}", _retry_after(response), status, code)
+    if code in _NOT_EXECUTED_CODES:
+        return NotExecutedError(endpoint, f"{status} {msg}", status, code)
+    if status >= 500 or code in _RETRYABLE_CODES:
+        return RetryableError(endpoint, f"{status} {msg}", status, code)
+    return PermanentError(endpoint, f"{status} {msg}", status, code)
@@ -0,0 +1,437 @@
+# exchange/mock_server.py
+"""
+Локальный мок Binance Spot REST + WebSocket (aiohttp) для офлайн-нагрузки и отладки.
+
+REST (формат ответов и коды ошибок как у Binance):
+    GET    /api/v3/ping, /api/v3/time, /api/v3/exchangeInfo
+    GET    /api/v3/ticker/price, /api/v3/ticker/bookTicker, /api/v3/ticker/24hr
+    GET    /api/v3/account                               (подпись)
+    POST   /api/v3/order, GET /api/v3/order, DELETE /api/v3/order, GET /api/v3/openOrders (подпись)
+WebSocket:
+    /ws/<stream>[/<stream>...] и /stream?streams=a/b — потоки <symbol>@bookTicker и <symbol>@ticker
+Управление моком:
+    GET /mock/stats, POST /mock/faults {"latency": 0.05, "error_rate": 0.01, ...}
+
+Ордера исполняет PaperExchange над ценами мока; цены — случайное блуждание с шагом
+tick_interval (воспроизводимое при заданном seed). Вес запросов считается по окну
+в минуту (X-MBX-USED-WEIGHT-1M), ордера — за 10 секунд (X-MBX-ORDER-COUNT-10S);
+превышение — 429 с Retry-After. Задержка, ошибки 5xx и внеплановые 429 — через Faults.
+
+Подключение бота: BINANCE_BASE_URL=http://127.0.0.1:8765 (BinanceExchange и ccxt).
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import math
+import random
+import re
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List
+from urllib.parse import parse_qsl
+
+from aiohttp import web, WSMsgType
+
+from exchange.errors import PermanentError
+from exchange.paper import PaperExchange
+
+logger = logging.getLogger(__name__)
+
+WEIGHT_LIMIT_1M = 6000         # как у Binance Spot с 2023 года
+ORDER_LIMIT_10S = 100
+DEFAULT_PRICES = {"BTC/USDT": 60000.0, "ETH/USDT": 3000.0, "BNB/USDT": 550.0, "SOL/USDT": 150.0}
+DEFAULT_BALANCES = {"USDT": 100000.0, "BTC": 1.0, "ETH": 10.0, "BNB": 50.0, "SOL": 100.0}
+
+# Вес эндпоинтов (упрощённо, по документации Binance)
+_WEIGHTS = {
+    "/api/v3/ping": 1, "/api/v3/time": 1, "/api/v3/exchangeInfo": 20,
+    "/api/v3/ticker/price": 2, "/api/v3/ticker/bookTicker": 2, "/api/v3/ticker/24hr": 2,
+    "/api/v3/account": 20, "/api/v3/order": 4, "/api/v3/openOrders": 6,
+}
+_SIGNATURE = re.compile(r"&?signature=[0-9a-fA-F]*")
+
+
+@dataclass
+class Faults:
+    latency: float = 0.0           # секунд до ответа
+    jitter: float = 0.0            # + равномерно [0, jitter]
+    error_rate: float = 0.0        # доля ответов 503 (-1001 DISCONNECTED)
+    rate_limit_rate: float = 0.0   # доля внеплановых 429 (-1003)
+    retry_after: int = 1           # Retry-After у внеплановых 429
+
+
+def _error(status: int, code: int, msg: str, headers: Dict[str, str] | None = None) -> web.Response:
+    return web.json_response({"code": code, "msg": msg}, status=status, headers=headers)
+
+
+def _fmt(x: float) -> str:
+    return f"{x:.8f}"
+
+
+class _Prices:
+    """Источник цен для PaperExchange: случайное блуждание со спредом."""
+
+    def __init__(self, prices: Dict[str, float], spread: float, volatility: float, rnd: random.Random):
+        self.last = dict(prices)
+        self.open = dict(prices)
+        self.high = dict(prices)
+        self.low = dict(prices)
+        self.volume = {s: 0.0 for s in prices}
+        self.spread = spread
+        self.volatility = volatility
+        self.rnd = rnd
+        self.markets = {s: {"symbol": s, "id": s.replace("/", "")} for s in prices}
+
+    def step(self):
+        for s, p in self.last.items():
+            p *= math.exp(self.rnd.gauss(0.0, self.volatility))
+            self.last[s] = p
+            self.high[s] = max(self.high[s], p)
+            self.low[s] = min(self.low[s], p)
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        p = self.last[symbol]
+        half = p * self.spread / 2
+        return {"symbol": symbol, "timestamp": int(time.time() * 1000), "bid": p - half, "ask": p + half, "last": p}
+
+
+class MockBinance:
+    def __init__(self, prices: Dict[str, float] | None = None, balances: Dict[str, float] | None = None, *,
+                 api_key: str | None = None, secret: str | None = None, faults: Faults | None = None,
+                 tick_interval: float = 0.5, volatility: float = 0.0005, spread: float = 0.0002,
+                 fee_rate: float = 0.001, weight_limit: int = WEIGHT_LIMIT_1M,
+                 order_limit: int = ORDER_LIMIT_10S, seed: int | None = None):
+        self.rnd = random.Random(seed)
+        self.prices = _Prices(prices or DEFAULT_PRICES, spread, volatility, self.rnd)
+        self.book = PaperExchange(self.prices, balances or DEFAULT_BALANCES, fee_rate=fee_rate)
+        self.api_key = api_key
+        self.secret = secret.encode() if secret else None
+        self.faults = faults or Faults()
+        self.tick_interval = tick_interval
+        self.weight_limit = weight_limit
+        self.order_limit = order_limit
+
+        self._minute = 0
+        self._weight = 0
+        self._order_window = 0
+        self._orders = 0
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "rate_limited": 0, "injected": 0}
+        self._subscribers: Dict[str, set] = {}  # поток → множество WebSocket
+        self._ticker_task: asyncio.Task | None = None
+        self._runner: web.AppRunner | None = None
+        self.app = self._build_app()
+
+    # --- приложение ---
+    def _build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        r = app.router
+        r.add_get("/api/v3/ping", lambda _: web.json_response({}))
+        r.add_get("/api/v3/time", lambda _: web.json_response({"serverTime": int(time.time() * 1000)}))
+        r.add_get("/api/v3/exchangeInfo", self.exchange_info)
+        r.add_get("/api/v3/ticker/price", self.ticker_price)
+        r.add_get("/api/v3/ticker/bookTicker", self.book_ticker)
+        r.add_get("/api/v3/ticker/24hr", self.ticker_24hr)
+        r.add_get("/api/v3/account", self.account)
+        r.add_post("/api/v3/order", self.new_order)
+        r.add_get("/api/v3/order", self.query_order)
+        r.add_delete("/api/v3/order", self.cancel_order)
+        r.add_get("/api/v3/openOrders", self.open_orders)
+        r.add_get("/ws/{streams:.+}", self.websocket)
+        r.add_get("/stream", self.websocket)
+        r.add_get("/mock/stats", lambda _: web.json_response({**self.stats, "faults": asdict(self.faults)}))
+        r.add_post("/mock/faults", self.set_faults)
+        app.on_startup.append(self._start_ticker)
+        app.on_cleanup.append(self._stop_ticker)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> str:
+        """Запуск в текущем event loop; возвращает базовый URL."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        logger.info(f"🧪 Мок Binance слушает http://{host}:{port}")
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # --- лимиты, неисправности, подпись ---
+    def _use_weight(self, path: str, method: str) -> web.Response | None:
+        now = time.time()
+        minute = int(now // 60)
+        if minute != self._minute:
+            self._minute, self._weight = minute, 0
+        self._weight += _WEIGHTS.get(path, 1)
+        if self._weight > self.weight_limit:
+            self.stats["rate_limited"] += 1
+            return _error(429, -1003, "Too much request weight used; current limit is "
+                          f"{self.weight_limit} request weight per 1 MINUTE.",
+                          {"Retry-After": str(60 - int(now) % 60)})
+        if path == "/api/v3/order" and method == "POST":
+            window = int(now // 10)
+            if window != self._order_window:
+                self._order_window, self._orders = window, 0
+            self._orders += 1
+            if self._orders > self.order_limit:
+                self.stats["rate_limited"] += 1
+                return _error(429, -1015, f"Too many new orders; current limit is {self.order_limit} orders per 10 SECOND.",
+                              {"Retry-After": str(10 - int(now) % 10)})
+        return None
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        path = request.path
+        if not path.startswith("/api/"):
+            return await handler(request)
+        self.stats["requests"] += 1
+        f = self.faults
+        if f.latency or f.jitter:
+            await asyncio.sleep(f.latency + self.rnd.uniform(0, f.jitter))
+        if f.error_rate and self.rnd.random() < f.error_rate:
+            self.stats["injected"] += 1
+            return _error(503, -1001, "Internal error; unable to process your request. Please try again.")
+        if f.rate_limit_rate and self.rnd.random() < f.rate_limit_rate:
+            self.stats["injected"] += 1
+            return _error(429, -1003, "Too many requests (injected).", {"Retry-After": str(f.retry_after)})
+
+        limited = self._use_weight(path, request.method)
+        if limited is not None:
+            response = limited
+        else:
+            try:
+                response = await handler(request)
+            except PermanentError as e:
+                self.stats["errors"] += 1
+                response = _error(e.status or 400, e.code or -1100, str(e).split(": ", 1)[-1])
+        response.headers["X-MBX-USED-WEIGHT-1M"] = str(self._weight)
+        if path == "/api/v3/order" and request.method == "POST":
+            response.headers["X-MBX-ORDER-COUNT-10S"] = str(self._orders)
+        return response
+
+    async def _params(self, request: web.Request, signed: bool) -> Dict[str, str]:
+        """Параметры из query и тела; для подписанных — проверка ключа и HMAC (totalParams)."""
+        body = await request.text() if request.can_read_body else ""
+        params = dict(parse_qsl(request.query_string))
+        params.update(parse_qsl(body))
+        if not signed:
+            return params
+        if self.api_key and request.headers.get("X-MBX-APIKEY") != self.api_key:
+            raise _Reject(401, -2015, "Invalid API-key, IP, or permissions for action.")
+        if "timestamp" not in params:
+            raise _Reject(400, -1102, "Mandatory parameter 'timestamp' was not sent.")
+        if self.secret:
+            payload = _SIGNATURE.sub("", request.query_string + body)
+            expected = hmac.new(self.secret, payload.encode(), hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(expected, params.get("signature", "")):
+                raise _Reject(400, -1022, "Signature for this request is not valid.")
+        return params
+
+    def _symbol(self, raw: str | None) -> str:
+        symbol = self.book._symbol(raw or "")
+        if symbol not in self.prices.last:
+            raise PermanentError("mock", "Invalid symbol.", 400, -1121)
+        return symbol
+
+    # --- публичные эндпоинты ---
+    async def exchange_info(self, request):
+        symbols = []
+        for s in self.prices.last:
+            base, quote = s.split("/")
+            symbols.append({
+                "symbol": base + quote, "status": "TRADING", "baseAsset": base, "quoteAsset": quote,
+                "baseAssetPrecision": 8, "quotePrecision": 8, "quoteAssetPrecision": 8,
+                "baseCommissionPrecision": 8, "quoteCommissionPrecision": 8,
+                "orderTypes": ["LIMIT", "MARKET"], "icebergAllowed": False, "ocoAllowed": False,
+                "isSpotTradingAllowed": True, "isMarginTradingAllowed": False, "permissions": ["SPOT"],
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "minPrice": "0.01000000", "maxPrice": "1000000.00000000", "tickSize": "0.01000000"},
+                    {"filterType": "LOT_SIZE", "minQty": "0.00001000", "maxQty": "9000.00000000", "stepSize": "0.00001000"},
+                    {"filterType": "NOTIONAL", "minNotional": "5.00000000", "maxNotional": "9000000.00000000"},
+                ],
+            })
+        return web.json_response({
+            "timezone": "UTC", "serverTime": int(time.time() * 1000),
+            "rateLimits": [
+                {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": self.weight_limit},
+                {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": self.order_limit},
+            ],
+            "symbols": symbols,
+        })
+
+    def _requested(self, params: Dict[str, str]) -> List[str] | None:
+        if "symbol" in params:
+            return [self._symbol(params["symbol"])]
+        if "symbols" in params:
+            return [self._symbol(s) for s in json.loads(params["symbols"])]
+        return None
+
+    def _reply(self, params, items):
+        return web.json_response(items[0] if "symbol" in params else items)
+
+    async def ticker_price(self, request):
+        params = await self._params(request, signed=False)
+        symbols = self._requested(params) or list(self.prices.last)
+        return self._reply(params, [{"symbol": s.replace("/", ""), "price": _fmt(self.prices.last[s])} for s in symbols])
+
+    async def book_ticker(self, request):
+        params = await self._params(request, signed=False)
+        symbols = self._requested(params) or list(self.prices.last)
+        return self._reply(params, [self._book_ticker(s) for s in symbols])
+
+    def _book_ticker(self, symbol: str) -> Dict[str, Any]:
+        t = self.book.fetch_ticker(symbol)
+        return {"symbol": symbol.replace("/", ""), "bidPrice": _fmt(t["bid"]), "bidQty": "1.00000000",
+                "askPrice": _fmt(t["ask"]), "askQty": "1.00000000"}
+
+    def _ticker_24hr(self, symbol: str) -> Dict[str, Any]:
+        t = self.book.fetch_ticker(symbol)
+        p = self.prices
+        now = int(time.time() * 1000)
+        return {
+            "symbol": symbol.replace("/", ""), "priceChange": _fmt(t["last"] - p.open[symbol]),
+            "priceChangePercent": f"{(t['last'] / p.open[symbol] - 1) * 100:.3f}",
+            "weightedAvgPrice": _fmt(t["last"]), "prevClosePrice": _fmt(p.open[symbol]),
+            "lastPrice": _fmt(t["last"]), "lastQty": "0.00100000",
+            "bidPrice": _fmt(t["bid"]), "bidQty": "1.00000000", "askPrice": _fmt(t["ask"]), "askQty": "1.00000000",
+            "openPrice": _fmt(p.open[symbol]), "highPrice": _fmt(p.high[symbol]), "lowPrice": _fmt(p.low[symbol]),
+            "volume": _fmt(p.volume[symbol]), "quoteVolume": _fmt(p.volume[symbol] * t["last"]),
+            "openTime": now - 86_400_000, "closeTime": now, "firstId": 0, "lastId": 0, "count": 0,
+        }
+
+    async def ticker_24hr(self, request):
+        params = await self._params(request, signed=False)
+        symbols = self._requested(params) or list(self.prices.last)
+        return self._reply(params, [self._ticker_24hr(s) for s in symbols])
+
+    # --- подписанные эндпоинты ---
+    async def account(self, request):
+        await self._params(request, signed=True)
+        bal = self.book.fetch_balance()
+        assets = sorted(set(bal["free"]) | set(bal["used"]))
+        return web.json_response({
+            "makerCommission": 10, "takerCommission": 10, "canTrade": True, "canWithdraw": False,
+            "canDeposit": False, "accountType": "SPOT", "permissions": ["SPOT"],
+            "updateTime": int(time.time() * 1000),
+            "balances": [{"asset": a, "free": _fmt(bal["free"].get(a, 0.0)), "locked": _fmt(bal["used"].get(a, 0.0))}
+                         for a in assets],
+        })
+
+    async def new_order(self, request):
+        p = await self._params(request, signed=True)
+        symbol = self._symbol(p.get("symbol"))
+        price = float(p["price"]) if "price" in p else None
+        order = await self.book.place_order(symbol, p.get("side", ""), p.get("type", ""), float(p.get("quantity", 0)),
+                                            price, p.get("newClientOrderId"))
+        self.prices.volume[symbol] += float(order["executedQty"])
+        return web.json_response({**order, "timeInForce": p.get("timeInForce", "GTC"), "fills": []})
+
+    async def query_order(self, request):
+        p = await self._params(request, signed=True)
+        order = await self.book.get_order(self._symbol(p.get("symbol")), p.get("orderId"), p.get("origClientOrderId"))
+        if order is None:
+            raise PermanentError("mock", "Order does not exist.", 400, -2013)
+        return web.json_response(order)
+
+    async def cancel_order(self, request):
+        p = await self._params(request, signed=True)
+        return web.json_response(await self.book.cancel(self._symbol(p.get("symbol")), p.get("orderId"), p.get("origClientOrderId")))
+
+    async def open_orders(self, request):
+        p = await self._params(request, signed=True)
+        symbol = self._symbol(p["symbol"]) if "symbol" in p else None
+        return web.json_response(await self.book.get_open_orders(symbol))
+
+    async def set_faults(self, request):
+        changes = await request.json()
+        for key, value in changes.items():
+            if hasattr(self.faults, key):
+                setattr(self.faults, key, type(getattr(self.faults, key))(value))
+        return web.json_response(asdict(self.faults))
+
+    # --- WebSocket ---
+    async def websocket(self, request):
+        raw = request.match_info.get("streams") or request.query.get("streams", "")
+        streams = [s for s in raw.split("/") if s]
+        combined = request.path == "/stream"
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        subscription = (ws, combined)
+        for s in streams:
+            self._subscribers.setdefault(s.lower(), set()).add(subscription)
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                # {"method": "SUBSCRIBE" | "UNSUBSCRIBE", "params": [...], "id": N}
+                data = json.loads(msg.data)
+                for s in data.get("params", []):
+                    subs = self._subscribers.setdefault(s.lower(), set())
+                    if data.get("method") == "SUBSCRIBE":
+                        subs.add(subscription)
+                    else:
+                        subs.discard(subscription)
+                await ws.send_json({"result": None, "id": data.get("id")})
+        finally:
+            for subs in self._subscribers.values():
+                subs.discard(subscription)
+        return ws
+
+    def _event(self, stream: str) -> Dict[str, Any] | None:
+        name, _, kind = stream.partition("@")
+        symbol = self.book._symbol(name)
+        if symbol not in self.prices.last:
+            return None
+        if kind == "bookticker":
+            return self._book_ticker(symbol)
+        if kind == "ticker":
+            t = self._ticker_24hr(symbol)
+            return {"e": "24hrTicker", "E": t["closeTime"], "s": t["symbol"], "c": t["lastPrice"],
+                    "b": t["bidPrice"], "a": t["askPrice"], "o": t["openPrice"], "h": t["highPrice"],
+                    "l": t["lowPrice"], "v": t["volume"], "q": t["quoteVolume"], "P": t["priceChangePercent"]}
+        return None
+
+    async def _start_ticker(self, app):
+        self._ticker_task = asyncio.create_task(self._ticker_loop())
+
+    async def _stop_ticker(self, app):
+        if self._ticker_task:
+            self._ticker_task.cancel()
+
+    async def _ticker_loop(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            self.prices.step()
+            for stream, subs in list(self._subscribers.items()):
+                if not subs:
+                    continue
+                event = self._event(stream)
+                if event is None:
+                    continue
+                for ws, combined in list(subs):
+                    try:
+                        await ws.send_json({"stream": stream, "data": event} if combined else event)
+                    except ConnectionError:
+                        subs.discard((ws, combined))
+
+
+class _Reject(PermanentError):
+    """Отказ на уровне запроса (ключ, подпись) со своим HTTP-статусом."""
+
+    def __init__(self, status: int, code: int, msg: str):
+        super().__init__("mock", msg, status, code)
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8765, **kwargs):
+    """Запуск мока до отмены (Ctrl+C)."""
+    mock = MockBinance(**kwargs)
+    await mock.start(host, port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await mock.stop()
@@ -0,0 +1,327 @@
+# exchange/paper.py
+"""
+Бумажная биржа: ордера исполняются локально против реальных или записанных цен.
+
+Источник цен (source) — любой объект с ccxt-методом fetch_ticker и словарём markets:
+публичное подключение ccxt (живые цены, ключи не нужны) или лента записанных цен
+(backtest.replay.FeedSource). Балансы, ордера и стакан лимитных заявок — в памяти.
+
+- рыночный ордер исполняется по ask (покупка) / bid (продажа) с проскальзыванием
+  slippage и комиссией fee_rate;
+- лимитный ордер сразу резервирует средства и ждёт в локальной книге; исполняется
+  по своей цене с комиссией maker_fee_rate, как только очередная цена его достанет
+  (при любом fetch_ticker / get_price по этой паре);
+- баланс проверяется как на бирже: не хватает свободных средств — InsufficientFunds.
+
+Два интерфейса над одним состоянием:
+- синхронный в стиле ccxt (fetch_ticker, fetch_balance, create_order, fetch_order, ...) —
+  им пользуются utils и стратегии через connection_manager при settings.MODE="paper";
+- асинхронный протокол exchange.base.Exchange с ответами в формате Binance REST.
+"""
+import asyncio
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import ccxt
+
+from exchange.errors import PermanentError, ORDER_NOT_FOUND_CODE
+
+REJECTED_CODE = -2010       # NEW_ORDER_REJECTED (в т.ч. недостаточно средств)
+BAD_SYMBOL_CODE = -1121     # Invalid symbol
+
+_BINANCE_STATUS = {"open": "NEW", "closed": "FILLED", "canceled": "CANCELED"}
+
+
+def parse_balances(spec: str) -> Dict[str, float]:
+    """"USDT=10000,BTC=0.1" → {"USDT": 10000.0, "BTC": 0.1}"""
+    out: Dict[str, float] = {}
+    for part in spec.split(","):
+        asset, _, amount = part.partition("=")
+        if asset.strip():
+            out[asset.strip().upper()] = float(amount or 0)
+    return out
+
+
+class PaperExchange:
+    def __init__(self, source, balances: Dict[str, float] | None = None, *,
+                 fee_rate: float = 0.001, maker_fee_rate: float | None = None, slippage: float = 0.0,
+                 clock: Callable[[], int] | None = None):
+        self.source = source
+        self.fee_rate = fee_rate
+        self.maker_fee_rate = fee_rate if maker_fee_rate is None else maker_fee_rate
+        self.slippage = slippage
+        self.clock = clock or (lambda: int(time.time() * 1000))
+
+        self.free: Dict[str, float] = {k.upper(): float(v) for k, v in (balances or {}).items()}
+        self.used: Dict[str, float] = {}
+        self.orders: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_client_id: Dict[str, Dict[str, Any]] = {}
+        # книга лимиток по символу: покупки по возрастанию цены, продажи по убыванию —
+        # лучшая заявка всегда в конце списка
+        self._bids: Dict[str, List[Dict[str, Any]]] = {}
+        self._asks: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_market_id: Dict[str, str] = {}
+        self._lock = threading.RLock()
+
+    # --- рынки (из источника цен) ---
+    @property
+    def markets(self) -> Dict[str, Any]:
+        return self.source.markets
+
+    @property
+    def currencies(self) -> Dict[str, Any]:
+        return getattr(self.source, "currencies", {}) or {}
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.markets or {})
+
+    def load_markets(self, reload: bool = False) -> Dict[str, Any]:
+        if hasattr(self.source, "load_markets"):
+            self.source.load_markets(reload)
+        return self.markets
+
+    def fetch_time(self) -> int:
+        return self.clock()
+
+    def _symbol(self, symbol: str) -> str:
+        """"BTCUSDT" или "btc/usdt" → "BTC/USDT"."""
+        symbol = symbol.upper()
+        if "/" in symbol:
+            return symbol
+        if not self._by_market_id:
+            self._by_market_id = {s.replace("/", ""): s for s in self.markets}
+        return self._by_market_id.get(symbol, symbol)
+
+    # --- цены ---
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        ticker = self.source.fetch_ticker(symbol)
+        if self._bids.get(symbol) or self._asks.get(symbol):
+            self._match(symbol, ticker)
+        return ticker
+
+    def fetch_tickers(self, symbols: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        return {s: self.fetch_ticker(s) for s in (symbols or self.symbols)}
+
+    # --- балансы ---
+    def fetch_balance(self) -> Dict[str, Any]:
+        with self._lock:
+            assets = set(self.free) | set(self.used)
+            total = {a: self.free.get(a, 0.0) + self.used.get(a, 0.0) for a in assets}
+            return {"free": dict(self.free), "used": dict(self.used), "total": total}
+
+    def _move(self, asset: str, free: float = 0.0, used: float = 0.0):
+        self.free[asset] = self.free.get(asset, 0.0) + free
+        if used:
+            left = self.used.get(asset, 0.0) + used
+            if abs(left) < 1e-12:  # остаток округления после снятия резерва
+                self.used.pop(asset, None)
+            else:
+                self.used[asset] = left
+
+    # --- ордера ---
+    def _new_order(self, symbol, type_, side, amount, price, params) -> Dict[str, Any]:
+        order_id = str(len(self.orders) + 1)
+        client_id = (params or {}).get("newClientOrderId") or f"paper-{order_id}"
+        order = {
+            "id": order_id, "clientOrderId": client_id, "timestamp": self.clock(),
+            "symbol": symbol, "type": type_, "side": side, "amount": amount, "price": price,
+            "filled": 0.0, "remaining": amount, "average": None, "cost": 0.0,
+            "fee": {"currency": symbol.split("/")[1], "cost": 0.0}, "status": "open",
+        }
+        self.orders.append(order)
+        self._by_id[order_id] = order
+        self._by_client_id[client_id] = order
+        return order
+
+    def _fill(self, order: Dict[str, Any], price: float, fee_rate: float):
+        base, quote = order["symbol"].split("/")
+        amount = order["amount"]
+        cost = price * amount
+        fee = cost * fee_rate
+        if order["side"] == "buy":
+            self._move(base, free=amount)
+            self._move(quote, free=-(cost + fee))
+        else:
+            self._move(base, free=-amount)
+            self._move(quote, free=cost - fee)
+        order.update(filled=amount, remaining=0.0, average=price, cost=cost, status="closed",
+                     fee={"currency": quote, "cost": fee}, lastTradeTimestamp=self.clock())
+        if order["price"] is None:
+            order["price"] = price
+
+    def create_order(self, symbol: str, type: str, side: str, amount: float, price: float | None = None,
+                     params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        symbol, type_, side, amount = self._symbol(symbol), type.lower(), side.lower(), float(amount)
+        if symbol not in self.markets:
+            raise ccxt.BadSymbol(f"paper: неизвестная пара {symbol}")
+        client_id = (params or {}).get("newClientOrderId")
+        if client_id and client_id in self._by_client_id:
+            raise ccxt.InvalidOrder(f"paper: clientOrderId {client_id} уже использован")
+        if amount <= 0:
+            raise ccxt.InvalidOrder("paper: количество должно быть > 0")
+        base, quote = symbol.split("/")
+
+        if type_ == "market":
+            ticker = self.fetch_ticker(symbol)
+            sign = 1 if side == "buy" else -1
+            ref = ticker.get("ask" if sign > 0 else "bid") or ticker["last"]
+            fill = ref * (1 + sign * self.slippage)
+            with self._lock:
+                need = fill * amount * (1 + self.fee_rate) if sign > 0 else amount
+                have = self.free.get(quote if sign > 0 else base, 0.0)
+                if have < need:
+                    raise ccxt.InsufficientFunds(f"paper: {quote if sign > 0 else base} {have:.8f} < {need:.8f}")
+                order = self._new_order(symbol, "market", side, amount, None, params)
+                self._fill(order, fill, self.fee_rate)
+                return dict(order)
+
+        if type_ != "limit" or price is None or price <= 0:
+            raise ccxt.InvalidOrder(f"paper: поддерживаются market и limit с ценой ({type_})")
+        price = float(price)
+        with self._lock:
+            asset, need = (quote, price * amount * (1 + self.maker_fee_rate)) if side == "buy" else (base, amount)
+            if self.free.get(asset, 0.0) < need:
+                raise ccxt.InsufficientFunds(f"paper: {asset} {self.free.get(asset, 0.0):.8f} < {need:.8f}")
+            self._move(asset, free=-need, used=need)
+            order = self._new_order(symbol, "limit", side, amount, price, params)
+            order["reserved"] = need
+            book = self._bids if side == "buy" else self._asks
+            bisect.insort(book.setdefault(symbol, []), order,
+                          key=lambda o: o["price"] if o["side"] == "buy" else -o["price"])
+        return dict(order)
+
+    def create_market_order(self, symbol: str, side: str, amount: float, price=None, params=None) -> Dict[str, Any]:
+        return self.create_order(symbol, "market", side, amount, None, params)
+
+    def create_limit_order(self, symbol: str, side: str, amount: float, price: float, params=None) -> Dict[str, Any]:
+        return self.create_order(symbol, "limit", side, amount, price, params)
+
+    def _match(self, symbol: str, ticker: Dict[str, Any]):
+        """Исполняет лимитки, которые достала цена тикера."""
+        ask = ticker.get("ask") or ticker.get("last")
+        bid = ticker.get("bid") or ticker.get("last")
+        with self._lock:
+            bids, asks = self._bids.get(symbol, []), self._asks.get(symbol, [])
+            while bids and ask is not None and bids[-1]["price"] >= ask:
+                self._fill_resting(bids.pop())
+            while asks and bid is not None and asks[-1]["price"] <= bid:
+                self._fill_resting(asks.pop())
+
+    def _fill_resting(self, order: Dict[str, Any]):
+        base, quote = order["symbol"].split("/")
+        reserved = order.pop("reserved")
+        self._move(quote if order["side"] == "buy" else base, free=reserved, used=-reserved)
+        self._fill(order, order["price"], self.maker_fee_rate)
+
+    def _find(self, id: str | None, params: Dict[str, Any] | None) -> Dict[str, Any]:
+        client_id = (params or {}).get("origClientOrderId")
+        order = self._by_client_id.get(client_id) if client_id else self._by_id.get(str(id))
+        if order is None:
+            raise ccxt.OrderNotFound(f"paper: ордер {id or client_id} не найден")
+        return order
+
+    def fetch_order(self, id, symbol: str | None = None, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._find(id, params))
+
+    def cancel_order(self, id, symbol: str | None = None, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        with self._lock:
+            order = self._find(id, params)
+            if order["status"] != "open":
+                raise ccxt.OrderNotFound(f"paper: ордер {order['id']} уже {order['status']}")
+            book = (self._bids if order["side"] == "buy" else self._asks)[order["symbol"]]
+            book.remove(order)
+            reserved = order.pop("reserved")
+            base, quote = order["symbol"].split("/")
+            self._move(quote if order["side"] == "buy" else base, free=reserved, used=-reserved)
+            order["status"] = "canceled"
+            return dict(order)
+
+    def fetch_open_orders(self, symbol: str | None = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            books = [self._bids, self._asks]
+            symbols = [self._symbol(symbol)] if symbol else set(self._bids) | set(self._asks)
+            return sorted((dict(o) for b in books for s in symbols for o in b.get(s, [])), key=lambda o: int(o["id"]))
+
+    # --- протокол exchange.base.Exchange (async, ответы как у Binance REST) ---
+    @staticmethod
+    def _binance_order(order: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "symbol": order["symbol"].replace("/", ""),
+            "orderId": int(order["id"]),
+            "clientOrderId": order["clientOrderId"],
+            "transactTime": order["timestamp"],
+            "price": f"{order['price'] or 0:.8f}",
+            "origQty": f"{order['amount']:.8f}",
+            "executedQty": f"{order['filled']:.8f}",
+            "cummulativeQuoteQty": f"{order['cost']:.8f}",
+            "status": _BINANCE_STATUS[order["status"]],
+            "type": order["type"].upper(),
+            "side": order["side"].upper(),
+        }
+
+    async def _call(self, endpoint: str, fn, *args):
+        try:
+            return await asyncio.to_thread(fn, *args)
+        except ccxt.OrderNotFound as e:
+            raise PermanentError(endpoint, str(e), 400, ORDER_NOT_FOUND_CODE) from e
+        except ccxt.BadSymbol as e:
+            raise PermanentError(endpoint, str(e), 400, BAD_SYMBOL_CODE) from e
+        except (ccxt.InsufficientFunds, ccxt.InvalidOrder) as e:
+            raise PermanentError(endpoint, str(e), 400, REJECTED_CODE) from e
+
+    async def get_price(self, symbol: str) -> float:
+        ticker = await self._call("GET /api/v3/ticker/price", self.fetch_ticker, self._symbol(symbol))
+        return float(ticker["last"])
+
+    async def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        prices = {}
+        for s in symbols:
+            try:
+                prices[s] = await self.get_price(s)
+            except PermanentError:
+                pass
+        return prices
+
+    async def get_exchange_info(self) -> Dict[str, Any]:
+        return {"symbols": [
+            {"symbol": s.replace("/", ""), "baseAsset": s.split("/")[0], "quoteAsset": s.split("/")[1], "status": "TRADING"}
+            for s in self.symbols if "/" in s
+        ]}
+
+    async def place_order(self, symbol: str, side: str, type_: str, quantity: float, price: float | None = None, client_id: str | None = None) -> Dict[str, Any]:
+        if client_id and client_id in self._by_client_id:
+            return self._binance_order(self._by_client_id[client_id])  # повтор того же ордера
+        params = {"newClientOrderId": client_id} if client_id else None
+        order = await self._call("POST /api/v3/order", self.create_order, self._symbol(symbol), type_, side, quantity, price, params)
+        return self._binance_order(self._by_id[order["id"]])
+
+    async def get_order(self, symbol: str, order_id: str | None = None, client_id: str | None = None) -> Dict[str, Any] | None:
+        try:
+            order = await self._call("GET /api/v3/order", self.fetch_order, order_id,
+                                     symbol, {"origClientOrderId": client_id} if client_id else None)
+        except PermanentError:
+            return None
+        return self._binance_order(order)
+
+    async def cancel(self, symbol: str, order_id: str | None = None, client_id: str | None = None) -> Dict[str, Any]:
+        order = await self._call("DELETE /api/v3/order", self.cancel_order, order_id,
+                                 symbol, {"origClientOrderId": client_id} if client_id else None)
+        return self._binance_order(order)
+
+    async def get_balance(self, asset: str) -> float:
+        with self._lock:
+            return self.free.get(asset.upper(), 0.0)
+
+    async def get_open_orders(self, symbol: str | None = None) -> List[Dict[str, Any]]:
+        return [self._binance_order(o) for o in self.fetch_open_orders(symbol)]
+
+    async def reconcile_orders(self) -> int:
+        return 0
+
+    async def close(self):
+        pass
@@ -0,0 +1,71 @@
+# executors.py
+"""
+Отдельные пулы потоков для блокирующих вызовов биржи (ccxt).
+
+asyncio.to_thread отправляет всё в один пул по умолчанию, и всплеск медленных
+запросов цены занимает потоки, которые нужны ордерам. Здесь у каждого вида работы
+своя полоса со своим числом потоков:
+
+- market_data — цены, тикеры, рынки, история свечей;
+- account     — баланс и проверки перед ордером;
+- orders      — создание ордеров, поиск по clientOrderId, сверка журнала.
+
+Вызов: await market_data.run(get_price, symbol) — как asyncio.to_thread (contextvars,
+в том числе дедлайн запуска, переносятся в поток). Для каждой полосы есть метрики
+ftb_executor_queue_depth (ждут свободного потока) и ftb_executor_wait_seconds
+(сколько ждали).
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict
+
+import metrics
+from constants import EXECUTOR_MARKET_DATA_WORKERS, EXECUTOR_ACCOUNT_WORKERS, EXECUTOR_ORDERS_WORKERS
+
+
+class Lane:
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.executor: Executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"ftb-{name}")
+        self._depth = metrics.labeled(metrics.EXECUTOR_QUEUE, name)
+        self._wait = metrics.labeled(metrics.EXECUTOR_WAIT, name)
+        self._lock = threading.Lock()
+
+    def _claim(self, ticket: list) -> bool:
+        """Снять вызов с учёта очереди ровно один раз: при старте в потоке или при отмене до старта."""
+        with self._lock:
+            if ticket[0]:
+                return False
+            ticket[0] = True
+            return True
+
+    async def run(self, fn, /, *args):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        queued = time.perf_counter()
+        ticket = [False]
+
+        def call():
+            if self._claim(ticket):
+                self._depth.dec()
+                self._wait.observe(time.perf_counter() - queued)
+            return context.run(fn, *args)
+
+        self._depth.inc()
+        try:
+            return await loop.run_in_executor(self.executor, call)
+        except BaseException:
+            if self._claim(ticket):
+                self._depth.dec()  # отменён, не дождавшись потока
+            raise
+
+
+market_data = Lane("market_data", EXECUTOR_MARKET_DATA_WORKERS)
+account = Lane("account", EXECUTOR_ACCOUNT_WORKERS)
+orders = Lane("orders", EXECUTOR_ORDERS_WORKERS)
+
+LANES: Dict[str, Lane] = {lane.name: lane for lane in (market_data, account, orders)}
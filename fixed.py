@@ -0,0 +1,213 @@
+# fixed.py
+"""
+Цены, объёмы и суммы ордеров целыми числами (fixed-point) вместо Decimal.
+
+Объём хранится в единицах 10^-qty_digits, цена — в единицах 10^-px_digits, сумма
+(объём × цена) — в единицах 10^-(qty_digits + px_digits). Умножение и сравнение целых
+точны и не создают объектов Decimal на каждом тике. Разрядность и шаги пары (lot —
+шаг объёма, tick — шаг цены, в тех же единицах) берутся из markets ccxt
+(Scale.from_market) или фильтров exchangeInfo Binance (Scale.from_filters).
+
+Из float: ближайшая единица, если float отличается от неё только ошибкой двоичного
+представления (0.29 * 100 = 28.999999999999996 → 29), иначе вниз. Объём затем
+округляется вниз до lot (не больше, чем просили), цена — до ближайшего tick.
+Объёмы и суммы повторяются (объём стратегии, минимальный ордер), поэтому Scale
+помнит их перевод в единицы и строки ордера — повторный qty / cost / format_qty /
+format_px стоит одного поиска в словаре.
+Обратно — строкой без float (format_qty / format_px / format_cost) или float
+(qty_float / px_float), когда его ждёт биржа. qty_array / px_array — то же для
+массивов NumPy (пакетные решения стратегий, strategies/kernels.py), с теми же
+результатами, что и поэлементный вызов.
+"""
+import math
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Tuple
+
+import numpy as np
+
+DEFAULT_DIGITS = 8   # Binance отдаёт объёмы и цены с 8 знаками после точки
+_EPS = 1e-9          # относительная ошибка float, которую считаем шумом представления
+_CACHE_SIZE = 1024   # значений в каждом кэше Scale; при переполнении кэш очищается
+
+
+def to_units(value: float, mult: int) -> int:
+    """value · mult как целое: ближайшее, если отличие — шум float, иначе вниз."""
+    x = value * mult
+    n = int(x + 0.5) if x >= 0 else -int(0.5 - x)   # быстрее round()
+    d = x - n
+    if d == 0.0:
+        return n
+    tol = _EPS * x if x > 1.0 else (-_EPS * x if x < -1.0 else _EPS)
+    return n if -tol <= d <= tol else math.floor(x)
+
+
+def to_units_array(values, mult: int) -> np.ndarray:
+    """to_units для массива (int64)."""
+    x = np.asarray(values, dtype=np.float64) * mult
+    n = np.where(x >= 0, np.floor(x + 0.5), -np.floor(0.5 - x))
+    tol = np.where(x > 1.0, _EPS * x, np.where(x < -1.0, -_EPS * x, _EPS))
+    return np.where(np.abs(x - n) <= tol, n, np.floor(x)).astype(np.int64)
+
+
+def step_units(step: Any) -> Tuple[int, int]:
+    """Шаг (0.001, "0.01000000", 10) → (знаков после точки, шаг в этих единицах)."""
+    sign, digits, exponent = Decimal(str(step)).normalize().as_tuple()
+    units = int("".join(map(str, digits)) or "0")
+    if exponent >= 0:
+        return 0, units * 10 ** exponent
+    return -exponent, units
+
+
+def _round_half_even(units: int, factor: int) -> int:
+    q, r = divmod(units, factor)
+    if 2 * r > factor or (2 * r == factor and q % 2):
+        q += 1
+    return q
+
+
+def format_units(units: int, digits: int, places: int | None = None) -> str:
+    """
+    units · 10^-digits строкой. Без places — без лишних нулей ("0.001"), как для
+    параметров ордера; с places — ровно places знаков, округление half-even (как
+    format(Decimal, ".2f")).
+    """
+    sign = "-" if units < 0 else ""
+    units = abs(units)
+    if places is not None:
+        if places < digits:
+            units = _round_half_even(units, 10 ** (digits - places))
+        else:
+            units *= 10 ** (places - digits)
+        digits = places
+    text = str(units)
+    if digits:
+        text = text.rjust(digits + 1, "0")
+        whole, frac = text[:-digits], text[-digits:]
+        if places is None:
+            frac = frac.rstrip("0")
+        text = f"{whole}.{frac}" if frac else whole
+    return sign + text
+
+
+def _remember(cache: Dict[Any, Any], key: Any, value: Any):
+    if len(cache) >= _CACHE_SIZE:
+        cache.clear()
+    cache[key] = value
+
+
+class Scale:
+    """Разрядность и шаги одной пары."""
+
+    __slots__ = ("qty_digits", "px_digits", "qty_mult", "px_mult", "cost_mult", "lot", "tick", "min_cost",
+                 "_qty", "_cost", "_qty_text", "_px_text")
+
+    def __init__(self, qty_digits: int = DEFAULT_DIGITS, px_digits: int = DEFAULT_DIGITS,
+                 lot: int = 1, tick: int = 1, min_cost: float = 0.0):
+        self.qty_digits = qty_digits
+        self.px_digits = px_digits
+        self.qty_mult = 10 ** qty_digits
+        self.px_mult = 10 ** px_digits
+        self.cost_mult = self.qty_mult * self.px_mult
+        self.lot = max(lot, 1)
+        self.tick = max(tick, 1)
+        self._qty: Dict[float, int] = {}    # value → qty(value)
+        self._cost: Dict[float, int] = {}   # value → cost(value)
+        self._qty_text: Dict[int, str] = {}
+        self._px_text: Dict[int, str] = {}
+        self.min_cost = self.cost(min_cost or 0.0)   # минимальная сумма ордера биржи
+
+    @classmethod
+    def from_steps(cls, qty_step: Any = None, px_step: Any = None, min_cost: float = 0.0) -> "Scale":
+        qty_digits, lot = step_units(qty_step) if qty_step else (DEFAULT_DIGITS, 1)
+        px_digits, tick = step_units(px_step) if px_step else (DEFAULT_DIGITS, 1)
+        return cls(qty_digits, px_digits, lot, tick, min_cost)
+
+    @classmethod
+    def from_market(cls, market: Dict[str, Any], tick_size: bool = False) -> "Scale":
+        """
+        Из рынка ccxt. tick_size — precisionMode биржи TICK_SIZE (precision — сам шаг,
+        например 0.001); иначе DECIMAL_PLACES (precision — число знаков, например 3).
+        """
+        precision = market.get("precision") or {}
+        min_cost = ((market.get("limits") or {}).get("cost") or {}).get("min") or 0.0
+
+        def step(value):
+            if value is None:
+                return None
+            return value if tick_size else Decimal(1).scaleb(-int(value))
+
+        return cls.from_steps(step(precision.get("amount")), step(precision.get("price")), min_cost)
+
+    @classmethod
+    def from_filters(cls, filters: Iterable[Dict[str, Any]]) -> "Scale":
+        """Из filters символа в /api/v3/exchangeInfo (LOT_SIZE, PRICE_FILTER, NOTIONAL / MIN_NOTIONAL)."""
+        by_type = {f.get("filterType"): f for f in filters}
+        notional = by_type.get("NOTIONAL") or by_type.get("MIN_NOTIONAL") or {}
+        return cls.from_steps(
+            (by_type.get("LOT_SIZE") or {}).get("stepSize"),
+            (by_type.get("PRICE_FILTER") or {}).get("tickSize"),
+            float(notional.get("minNotional") or 0.0),
+        )
+
+    # --- из float ---
+    def qty(self, value: float) -> int:
+        """Объём в единицах, вниз до шага lot."""
+        units = self._qty.get(value)
+        if units is None:
+            units = to_units(value, self.qty_mult)
+            units -= units % self.lot
+            _remember(self._qty, value, units)
+        return units
+
+    def px(self, value: float) -> int:
+        """Цена в единицах, до ближайшего tick."""
+        units = to_units(value, self.px_mult)
+        if self.tick > 1:
+            units = (units + self.tick // 2) // self.tick * self.tick
+        return units
+
+    def qty_array(self, values) -> np.ndarray:
+        units = to_units_array(values, self.qty_mult)
+        return units - units % self.lot
+
+    def px_array(self, values) -> np.ndarray:
+        units = to_units_array(values, self.px_mult)
+        if self.tick > 1:
+            units = (units + self.tick // 2) // self.tick * self.tick
+        return units
+
+    def cost(self, value: float) -> int:
+        """Сумма в quote в единицах объём × цена."""
+        units = self._cost.get(value)
+        if units is None:
+            units = to_units(float(value), self.cost_mult)
+            _remember(self._cost, value, units)
+        return units
+
+    # --- обратно ---
+    def qty_float(self, qty: int) -> float:
+        return qty / self.qty_mult
+
+    def px_float(self, px: int) -> float:
+        return px / self.px_mult
+
+    def format_qty(self, qty: int) -> str:
+        text = self._qty_text.get(qty)
+        if text is None:
+            text = format_units(qty, self.qty_digits)
+            _remember(self._qty_text, qty, text)
+        return text
+
+    def format_px(self, px: int) -> str:
+        text = self._px_text.get(px)
+        if text is None:
+            text = format_units(px, self.px_digits)
+            _remember(self._px_text, px, text)
+        return text
+
+    def format_cost(self, cost: int, places: int | None = None) -> str:
+        return format_units(cost, self.qty_digits + self.px_digits, places)
+
+    def __repr__(self):
+        return (f"Scale(lot={self.format_qty(self.lot)}, tick={self.format_px(self.tick)}, "
+                f"min_cost={self.format_cost(self.min_cost)})")
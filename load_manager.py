@@ -3,6 +3,9 @@ import asyncio
 import time
 import logging
 from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +14,7 @@ MAX_API_CALLS_PER_MIN = 1100           # лимит Binance API
 WARNING_THRESHOLD = 0.85               # при 85% начнём замедлять
 CRITICAL_THRESHOLD = 0.95              # при 95% — пауза
 ADAPTIVE_INTERVAL_STEP = 1.25          # множитель увеличения интервала
+CRITICAL_PAUSE = 30                    # секунд паузы при критической нагрузке
 
 _api_calls_log = deque(maxlen=MAX_API_CALLS_PER_MIN)
 
@@ -25,30 +29,47 @@ def get_api_load() -> float:
     calls = sum(1 for t in _api_calls_log if t >= one_min_ago)
     return calls / MAX_API_CALLS_PER_MIN
 
-async def adaptive_delay(base_interval: float) -> float:
-    """Корректирует интервал в зависимости от нагрузки"""
+
+metrics.API_LOAD.set_function(get_api_load)  # считается при каждом опросе /metrics
+
+def _adjust_interval(base_interval: float) -> tuple[float, bool]:
+    """Новый интервал по текущей нагрузке и нужна ли пауза (критическая нагрузка)."""
     load = get_api_load()
     if load >= CRITICAL_THRESHOLD:
-        logger.error(f"🔥 Критическая нагрузка ({load*100:.1f}%), пауза 30 сек.")
-        await asyncio.sleep(30)
-        return base_interval * ADAPTIVE_INTERVAL_STEP
+        logger.error(f"🔥 Критическая нагрузка ({load*100:.1f}%), пауза {CRITICAL_PAUSE} сек.")
+        return base_interval * ADAPTIVE_INTERVAL_STEP, True
     elif load >= WARNING_THRESHOLD:
         new_interval = base_interval * ADAPTIVE_INTERVAL_STEP
         logger.warning(f"⚠️ Высокая нагрузка ({load*100:.1f}%), увеличиваем интервал до {new_interval:.2f}")
-        return new_interval
-    return base_interval
+        return new_interval, False
+    return base_interval, False
 
 
-_active_strategies = {}
+async def adaptive_delay(base_interval: float) -> float:
+    """Корректирует интервал в зависимости от нагрузки"""
+    new_interval, pause = _adjust_interval(base_interval)
+    if pause:
+        await asyncio.sleep(CRITICAL_PAUSE)
+    return new_interval
 
-def register_strategy(user_id: int, job_key: str) -> bool:
-    user_jobs = _active_strategies.setdefault(user_id, set())
-    if len(user_jobs) >= 20:
-        logger.warning(f"⚠️ Превышен лимит стратегий (20) у пользователя {user_id}")
-        return False
-    user_jobs.add(job_key)
-    return True
 
-def unregister_strategy(user_id: int, job_key: str):
-    if user_id in _active_strategies:
-        _active_strategies[user_id].discard(job_key)
+async def adapt_job_interval(job):
+    """
+    Применяет adaptive_delay к задаче стратегии. У telegram.ext.Job нет изменяемого
+    interval — меняется триггер APScheduler (job.job); у простых задач (replay) — атрибут.
+    Пауза при критической нагрузке у задач APScheduler — сдвиг следующего запуска,
+    а не sleep внутри текущего: запуск ограничен дедлайном (decorators.tick_budget).
+    """
+    scheduled = getattr(job, "job", None)
+    if scheduled is None:
+        job.interval = await adaptive_delay(job.interval)
+        return
+    current = scheduled.trigger.interval.total_seconds()
+    new_interval, pause = _adjust_interval(current)
+    if new_interval == current:
+        return
+    if pause:
+        start = datetime.now(timezone.utc) + timedelta(seconds=CRITICAL_PAUSE + new_interval)
+        scheduled.reschedule(trigger="interval", seconds=new_interval, start_date=start)
+    else:
+        scheduled.reschedule(trigger="interval", seconds=new_interval)
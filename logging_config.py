@@ -1,8 +1,16 @@
+import atexit
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
 import sys
+import threading
+from datetime import datetime
 from pathlib import Path
+from typing import Dict, List, Tuple
+
+import orjson
 
 # ---------------------------
 # 🌈 Цвета для консоли (ANSI)
@@ -16,6 +24,15 @@ COLORS = {
     "RESET": "\033[0m"      # сброс цвета
 }
 
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+DATE_FORMAT = "%H:%M:%S"
+
+# extra= для сообщений, которые повторяются на каждом тике: только их прореживает SamplingFilter
+SAMPLE = {"sample": True}
+
+# поля LogRecord, которые не попадают в JSON как extra
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample"}
+
 
 class ColorFormatter(logging.Formatter):
     """Форматтер, который добавляет цвет в зависимости от уровня логов."""
@@ -25,13 +42,179 @@ class ColorFormatter(logging.Formatter):
         return f"{color}{message}{COLORS['RESET']}"
 
 
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON на запись: ts, level, logger, msg, exc и поля из extra=."""
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        return orjson.dumps(entry, default=str).decode()
+
+
+# ---------------------------
+# 🗂 Ротация по времени и по размеру
+# ---------------------------
+class SizeAndTimeRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """
+    Ротация в начале каждого интервала when (как TimedRotatingFileHandler) и, кроме того,
+    когда файл дорос до max_bytes. Несколько архивов за один интервал получают
+    суффиксы .001, .002 … (app.log.2025-01-01, app.log.2025-01-01.001).
+    """
+    def __init__(self, filename, when="midnight", max_bytes: int = 0, backup_count: int = 0, encoding="utf-8"):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def rotation_filename(self, default_name):
+        name, n = default_name, 0
+        while os.path.exists(name):
+            n += 1
+            name = f"{default_name}.{n:03d}"
+        return name
+
+
+# ---------------------------
+# 🔇 Прореживание однотипных сообщений
+# ---------------------------
+class SamplingFilter(logging.Filter):
+    """
+    Не больше burst записей уровня ниже WARNING с одного места вызова (файл + строка)
+    за window секунд. Остальные отбрасываются; когда окно заканчивается, первая запись
+    нового окна получает приписку, сколько похожих сообщений было пропущено.
+
+    Прореживаются только записи с extra=SAMPLE (сообщения каждого тика стратегии);
+    остальные — восстановление, ордера, запуск — проходят всегда.
+    """
+    def __init__(self, burst: int = 20, window: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._sites: Dict[Tuple[str, int], List[float]] = {}  # место → [начало окна, записано, пропущено]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.burst <= 0 or not getattr(record, "sample", False):
+            return True
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} (пропущено похожих: {suppressed})"
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+# ---------------------------
+# 📬 Очередь: запись логов в фоновом потоке
+# ---------------------------
+_plain = logging.Formatter()
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Кладёт запись в ограниченную очередь и сразу возвращается. Если очередь полна
+    (писатель не успевает) — запись отбрасывается и считается в dropped, поток не ждёт.
+    """
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Текст сообщения и трейсбек считаются здесь: аргументы могут измениться после вызова.
+        # Запись не копируется (копия — заметная доля цены вызова): после подстановки
+        # msg уже готов, а трейсбек есть в exc_text, так что другим обработчикам она годится.
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = _plain.formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """QueueHandler для логгера + QueueListener с настоящими обработчиками в своём потоке."""
+
+    def __init__(self, handlers: List[logging.Handler], queue_size: int = 10_000,
+                 sample_burst: int = 0, sample_window: float = 60.0):
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        if sample_burst > 0:
+            self.handler.addFilter(SamplingFilter(sample_burst, sample_window))
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.handlers = handlers
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        """Дописывает всё, что в очереди, и закрывает файлы."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+        for h in self.handlers:
+            h.close()
+
+
+_pipeline: LogPipeline | None = None
+
+
+def _file_handler(path: str, formatter: logging.Formatter, level) -> logging.Handler:
+    handler = SizeAndTimeRotatingFileHandler(
+        path,
+        when=os.getenv("LOG_ROTATE_WHEN", "midnight"),
+        max_bytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backup_count=int(os.getenv("LOG_BACKUP_COUNT", "7")),
+    )
+    handler.setFormatter(formatter)
+    handler.setLevel(level)
+    return handler
+
+
 def setup_logging():
     """
     Настраивает красивое логирование:
     - вывод в консоль с цветами
-    - запись в файл logs/app.log
+    - запись в файл logs/app.log (LOG_FORMAT=json — JSON Lines), ротация раз в сутки
+      (LOG_ROTATE_WHEN) и по размеру (LOG_MAX_BYTES), архивов LOG_BACKUP_COUNT
+    - логгер "restore" дополнительно пишется в logs/restore.log
     - уровень логов можно задать через .env (LOG_LEVEL=DEBUG)
+
+    Вызов logger.info только кладёт запись в очередь; форматирование, консоль и диск —
+    в фоновом потоке. Сообщения каждого тика (extra=SAMPLE) ниже WARNING прореживаются:
+    не больше LOG_SAMPLE_BURST с одного места вызова за LOG_SAMPLE_WINDOW секунд
+    (0 — без прореживания).
     """
+    global _pipeline
 
     # 1️⃣ создаём папку logs, если её нет
     log_dir = Path("logs")
@@ -41,26 +224,44 @@ def setup_logging():
     level = os.getenv("LOG_LEVEL", "INFO").upper()
 
     # 3️⃣ формат сообщений (время + уровень + имя + текст)
-    formatter = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-    datefmt = "%H:%M:%S"
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        file_formatter = JsonFormatter()
+    else:
+        file_formatter = logging.Formatter(TEXT_FORMAT, DATE_FORMAT)
 
-    # 4️⃣ создаём обработчики (куда выводить)
+    # 4️⃣ создаём обработчики (куда выводить) — они работают в потоке QueueListener
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(ColorFormatter(formatter, datefmt))
+    console_handler.setFormatter(ColorFormatter(TEXT_FORMAT, DATE_FORMAT))
     console_handler.setLevel(level)
 
-    file_handler = logging.FileHandler("logs/app.log", encoding="utf-8")
-    file_handler.setFormatter(logging.Formatter(formatter, datefmt))
-    file_handler.setLevel(level)
+    file_handler = _file_handler("logs/app.log", file_formatter, level)
 
-    # 5️⃣ подключаем обработчики к "root" логгеру
+    restore_handler = _file_handler("logs/restore.log", logging.Formatter("[%(asctime)s] %(message)s", "%Y-%m-%d %H:%M:%S"), level)
+    restore_handler.addFilter(logging.Filter("restore"))
+
+    # 5️⃣ перезапуск: старый писатель дописывает очередь и закрывает файлы
+    if _pipeline is not None:
+        _pipeline.stop()
+    _pipeline = LogPipeline(
+        [console_handler, file_handler, restore_handler],
+        queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        sample_burst=int(os.getenv("LOG_SAMPLE_BURST", "20")),
+        sample_window=float(os.getenv("LOG_SAMPLE_WINDOW", "60")),
+    )
+    _pipeline.start()
+
+    # 6️⃣ к "root" логгеру подключаем только очередь; старые обработчики убираем
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
-
-    # 6️⃣ чтобы избежать дублирования, очищаем старые обработчики
     root_logger.handlers.clear()
-
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+    root_logger.addHandler(_pipeline.handler)
 
     logging.info(f"✅ Логирование инициализировано (уровень = {level})")
+
+
+@atexit.register
+def _flush_on_exit():
+    if _pipeline is not None:
+        _pipeline.stop()
+        if _pipeline.handler.dropped:
+            sys.stderr.write(f"logging: очередь переполнялась, отброшено записей: {_pipeline.handler.dropped}\n")
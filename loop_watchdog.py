@@ -0,0 +1,147 @@
+# loop_watchdog.py
+"""
+Наблюдение за event loop.
+
+LoopWatchdog — задача в loop каждые interval секунд засыпает и меряет, насколько
+позже проснулась (гистограмма ftb_loop_lag_seconds). Отдельный поток следит за
+отметкой этой задачи: если loop не возвращался к ней дольше threshold, значит его
+держит какой-то колбэк — поток снимает стек потока loop (sys._current_frames) и пишет
+его в лог; зависание считается в ftb_loop_stalls_total.
+
+sample_profile — выборочный профайлер: каждые interval секунд берёт стек потока loop
+и считает, в каких функциях он находится (self — верхний кадр, total — где угодно в стеке).
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Dict, List
+
+import metrics
+from constants import LOOP_LAG_PROBE_INTERVAL, LOOP_STALL_THRESHOLD, PROFILE_SAMPLE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+STACK_LIMIT = 20  # кадров стека в отчёте о зависании
+
+
+def _frame_key(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack_text(frame) -> str:
+    return "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = LOOP_STALL_THRESHOLD, interval: float = LOOP_LAG_PROBE_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.lags: deque = deque(maxlen=600)    # последние замеры (сек)
+        self.stalls: deque = deque(maxlen=20)   # {"at", "seconds", "stack"}
+        self.loop_thread: int | None = None
+        self._beat = 0.0
+        self._reported_beat = 0.0
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Вызывать из работающего loop (например, в post_init приложения)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._stop.clear()
+        self.loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        logger.info(f"🩺 Watchdog event loop: порог {self.threshold * 1000:.0f} мс")
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _probe(self):
+        while True:
+            started = self._beat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.lags.append(lag)
+            metrics.LOOP_LAG.observe(lag)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            stalled = time.perf_counter() - beat - self.interval
+            if stalled < self.threshold or beat == self._reported_beat:
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            # одно зависание — один отчёт, пока loop не вернётся к задаче-зонду
+            self._reported_beat = beat
+            stack = _stack_text(frame)
+            self.stalls.append({"at": time.time(), "seconds": stalled, "stack": stack})
+            metrics.LOOP_STALLS.inc()
+            logger.warning(f"🐢 Event loop занят уже {stalled * 1000:.0f} мс, стек:\n{stack}")
+
+    def summary(self) -> Dict[str, Any]:
+        lags = sorted(self.lags)
+        if not lags:
+            return {"samples": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0, "stalls": len(self.stalls)}
+        return {
+            "samples": len(lags),
+            "p50_ms": round(lags[len(lags) // 2] * 1000, 1),
+            "p99_ms": round(lags[min(int(len(lags) * 0.99), len(lags) - 1)] * 1000, 1),
+            "max_ms": round(lags[-1] * 1000, 1),
+            "stalls": len(self.stalls),
+        }
+
+
+watchdog = LoopWatchdog()
+
+
+def sample_profile(thread_id: int, seconds: float, interval: float = PROFILE_SAMPLE_INTERVAL,
+                   top: int = 15) -> Dict[str, Any]:
+    """
+    Выборочный профиль потока thread_id за seconds секунд. Блокирующая:
+    из async-кода — через asyncio.to_thread (сам поток loop при этом и профилируется).
+    """
+    own: Counter = Counter()
+    total: Counter = Counter()
+    samples = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            samples += 1
+            own[_frame_key(frame.f_code)] += 1
+            seen = set()
+            while frame is not None:
+                seen.add(_frame_key(frame.f_code))
+                frame = frame.f_back
+            total.update(seen)
+        time.sleep(interval)
+    # кадры, которые есть в каждой выборке (run_forever, _run_once …), ничего не говорят
+    total = Counter({name: count for name, count in total.items() if count < samples})
+    return {
+        "samples": samples,
+        "seconds": seconds,
+        "own": own.most_common(top),
+        "total": total.most_common(top),
+    }
+
+
+def format_profile(profile: Dict[str, Any], top: int = 10) -> str:
+    """Текст для Telegram; select в self — loop простаивает в ожидании событий."""
+    n = profile["samples"] or 1
+    lines: List[str] = [f"🔬 Профиль event loop: {profile['samples']} выборок за {profile['seconds']:g} с", "",
+                        "Сами по себе (self):"]
+    lines += [f"{count / n * 100:5.1f}%  {name}" for name, count in profile["own"][:top]]
+    lines += ["", "Вместе с вызываемыми (total):"]
+    lines += [f"{count / n * 100:5.1f}%  {name}" for name, count in profile["total"][:top]]
+    return "\n".join(lines)
@@ -1,35 +1,44 @@
 # menus.py
+# Клавиатуры неизменяемы (объекты telegram замораживаются после создания), поэтому
+# создаются один раз и переиспользуются во всех ответах.
 from telegram import ReplyKeyboardMarkup
 
+_MAIN_MENU = ReplyKeyboardMarkup(
+    [
+        ["📊 Баланс"],
+        ["💵 Купить", "💰 Продать"],
+        ["⚡ Стратегии"],
+        ["🔍 Проверить цену", "📋 Все основные валюты"],
+        ["📋 Активные стратегии"],
+        ["🛑 Стоп все"],
+    ],
+    resize_keyboard=True
+)
+
+_STRATEGIES_MENU = ReplyKeyboardMarkup(
+    [
+        ["Percent", "Range", "DCA", "Grid"],
+        ["⬅️ Назад в главное меню"]
+    ],
+    resize_keyboard=True
+)
+
+_BACK_MENU = ReplyKeyboardMarkup(
+    [
+        ["⬅️ Назад в главное меню"]
+    ],
+    resize_keyboard=True
+)
+
+
 # Главное меню
 def get_main_menu():
-    return ReplyKeyboardMarkup(
-        [
-            ["📊 Баланс"],
-            ["💵 Купить", "💰 Продать"],
-            ["⚡ Стратегии"],
-            ["🔍 Проверить цену", "📋 Все основные валюты"],
-            ["📋 Активные стратегии"],
-            ["🛑 Стоп все"],
-        ],
-        resize_keyboard=True
-    )
+    return _MAIN_MENU
 
 # Меню стратегий
 def get_strategies_menu():
-    return ReplyKeyboardMarkup(
-        [
-            ["Percent", "Range", "DCA"],
-            ["⬅️ Назад в главное меню"]
-        ],
-        resize_keyboard=True
-    )
+    return _STRATEGIES_MENU
 
 # Универсальное меню "Назад"
 def get_back_menu():
-    return ReplyKeyboardMarkup(
-        [
-            ["⬅️ Назад в главное меню"]
-        ],
-        resize_keyboard=True
-    )
+    return _BACK_MENU
@@ -0,0 +1,196 @@
+# metrics.py
+"""
+Метрики Prometheus для горячих путей: REST биржи, задачи стратегий, ордера,
+отправка в Telegram, сохранение стратегий.
+
+Отдаются по HTTP на локальном /metrics (start_server, METRICS_HOST:METRICS_PORT).
+На горячем пути — только time.perf_counter() и observe() у заранее полученной
+дочерней метрики (labeled кэширует .labels(), где есть блокировка и поиск по словарю).
+"""
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, start_http_server
+from prometheus_client.core import CounterMetricFamily
+from telegram.request import BaseRequest
+
+import singleflight
+
+logger = logging.getLogger(__name__)
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_WRITE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# --- биржа ---
+REST_LATENCY = Histogram("ftb_rest_request_seconds", "Длительность запроса к бирже",
+                         ["client", "endpoint"], buckets=_LATENCY_BUCKETS)
+REST_ERRORS = Counter("ftb_rest_errors_total", "Ошибки запросов к бирже", ["client", "endpoint", "kind"])
+WEIGHT_USED = Gauge("ftb_rate_limit_weight_used", "Вес запросов за минуту по заголовку X-MBX-USED-WEIGHT-1M",
+                    ["client"])
+API_LOAD = Gauge("ftb_api_load_ratio", "Нагрузка на API по счётчику load_manager (0–1)")
+
+# --- стратегии и ордера ---
+JOB_DURATION = Histogram("ftb_job_run_seconds", "Длительность запуска задачи стратегии",
+                         ["strategy"], buckets=_LATENCY_BUCKETS)
+JOB_LAG = Histogram("ftb_job_lag_seconds", "Опоздание запуска задачи относительно расписания",
+                    ["strategy"], buckets=_LAG_BUCKETS)
+JOB_SKIPPED = Counter("ftb_job_skipped_total", "Пропущенные и прерванные запуски задач",
+                      ["strategy", "reason"])
+STRATEGY_PAUSES = Counter("ftb_strategy_pauses_total", "Паузы стратегий после ошибок подряд (supervisor)",
+                          ["strategy"])
+DECISION_BATCH = Histogram("ftb_decision_batch_size", "Запусков стратегий в одном пакетном решении пары",
+                           buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000))
+ORDERS = Counter("ftb_orders_total", "Ордера по исходу", ["side", "outcome"])
+ACTIVE_STRATEGIES = Gauge("ftb_active_strategies", "Активные стратегии пользователя", ["user"])
+
+# --- пулы потоков (executors) ---
+EXECUTOR_QUEUE = Gauge("ftb_executor_queue_depth", "Вызовы, ждущие свободного потока", ["lane"])
+EXECUTOR_WAIT = Histogram("ftb_executor_wait_seconds", "Ожидание свободного потока",
+                          ["lane"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+
+# --- Telegram ---
+TELEGRAM_LATENCY = Histogram("ftb_telegram_request_seconds", "Длительность запроса к Bot API",
+                             ["method"], buckets=_LATENCY_BUCKETS)
+TELEGRAM_ERRORS = Counter("ftb_telegram_errors_total", "Ошибки запросов к Bot API", ["method"])
+TELEGRAM_IN_FLIGHT = Gauge("ftb_telegram_requests_in_flight", "Запросы к Bot API, ожидающие ответа")
+UPDATE_QUEUE = Gauge("ftb_telegram_update_queue_depth", "Апдейты, ожидающие обработки")
+
+# --- event loop ---
+LOOP_LAG = Histogram("ftb_loop_lag_seconds", "Задержка event loop (опоздание контрольного sleep)",
+                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+LOOP_STALLS = Counter("ftb_loop_stalls_total", "Зависания event loop дольше порога")
+
+# --- сохранение ---
+PERSIST_WRITE = Histogram("ftb_persist_write_seconds", "Запись состояния на диск",
+                          ["store"], buckets=_WRITE_BUCKETS)
+
+# --- объединение одинаковых запросов (singleflight) ---
+class SingleFlightCollector:
+    """
+    ftb_singleflight_calls_total / ftb_singleflight_shared_total по группам из
+    singleflight.stats(): счётчики ведёт сам singleflight, здесь они только читаются
+    при запросе /metrics — на горячем пути ничего не добавляется.
+    """
+
+    def collect(self):
+        calls = CounterMetricFamily("ftb_singleflight_calls", "Запросы к бирже, ушедшие в сеть", labels=["group"])
+        shared = CounterMetricFamily("ftb_singleflight_shared", "Запросы, получившие результат уже летящего",
+                                     labels=["group"])
+        for group, counts in singleflight.stats().items():
+            calls.add_metric([group], counts["calls"])
+            shared.add_metric([group], counts["shared"])
+        yield calls
+        yield shared
+
+
+REGISTRY.register(SingleFlightCollector())
+
+# --- исходы ордеров (ORDERS.outcome) ---
+PLACED = "placed"            # ордер создан
+DUPLICATE = "duplicate"      # повтор с тем же clientOrderId, ордер уже был в журнале
+RECOVERED = "recovered"      # найден на бирже после неясного исхода
+REJECTED = "rejected"        # не прошёл проверки (минимум, баланс) — на биржу не ушёл
+FAILED = "failed"            # биржа отказала
+UNKNOWN = "unknown"          # исход неизвестен, ждёт сверки
+
+# --- причины пропуска запуска (JOB_SKIPPED.reason) ---
+LATE = "late"                # запуск опоздал больше, чем на бюджет
+TIMEOUT = "timeout"          # не уложился в бюджет и прерван
+OVERLAP = "overlap"          # предыдущий запуск ещё идёт (max_instances APScheduler)
+BACKOFF = "backoff"          # стратегия на паузе после ошибок (supervisor)
+
+_children: Dict[Tuple[int, Tuple[str, ...]], Any] = {}
+
+
+def labeled(metric, *values: str):
+    """metric.labels(*values) с кэшем."""
+    key = (id(metric), values)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*values)
+    return child
+
+
+def observe_rest(client: str, endpoint: str, started: float, error: BaseException | None = None):
+    """Длительность запроса с момента started (perf_counter) и ошибка, если была."""
+    labeled(REST_LATENCY, client, endpoint).observe(time.perf_counter() - started)
+    if error is not None:
+        labeled(REST_ERRORS, client, endpoint, type(error).__name__).inc()
+
+
+def observe_weight(client: str, headers) -> None:
+    """Использованный вес из заголовков ответа Binance (если есть)."""
+    if not headers:
+        return
+    value = headers.get("x-mbx-used-weight-1m") or headers.get("X-MBX-USED-WEIGHT-1M")
+    if value is not None:
+        try:
+            labeled(WEIGHT_USED, client).set(float(value))
+        except ValueError:
+            pass
+
+
+def count_order(side: str, outcome: str):
+    labeled(ORDERS, side.lower(), outcome).inc()
+
+
+def job_lag(job) -> float | None:
+    """
+    Опоздание текущего запуска задачи telegram.ext.Job. К началу запуска APScheduler
+    уже сдвинул next_run_time на следующий интервал — плановое время на интервал раньше.
+    """
+    scheduled = getattr(job, "job", None)
+    interval = getattr(getattr(scheduled, "trigger", None), "interval", None)
+    next_run = getattr(scheduled, "next_run_time", None)
+    if interval is None or next_run is None:
+        return None
+    return max((datetime.now(timezone.utc) - (next_run - interval)).total_seconds(), 0.0)
+
+
+class InstrumentedRequest(BaseRequest):
+    """Обёртка транспорта python-telegram-bot: время и ошибки по методам Bot API."""
+
+    def __init__(self, inner: BaseRequest):
+        self._inner = inner
+
+    @property
+    def read_timeout(self):
+        return self._inner.read_timeout
+
+    async def initialize(self):
+        await self._inner.initialize()
+
+    async def shutdown(self):
+        await self._inner.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit("/", 1)[-1]
+        TELEGRAM_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            status, payload = await self._inner.do_request(url, method, request_data, read_timeout,
+                                                           write_timeout, connect_timeout, pool_timeout)
+        except Exception:
+            labeled(TELEGRAM_ERRORS, api_method).inc()
+            raise
+        finally:
+            TELEGRAM_IN_FLIGHT.dec()
+            labeled(TELEGRAM_LATENCY, api_method).observe(time.perf_counter() - started)
+        if status >= 400:
+            labeled(TELEGRAM_ERRORS, api_method).inc()
+        return status, payload
+
+
+def start_server(host: str, port: int) -> bool:
+    """HTTP-сервер /metrics в фоновом потоке; False, если порт занят."""
+    try:
+        start_http_server(port, addr=host)
+    except OSError as e:
+        logger.warning(f"⚠️ Метрики не запущены на {host}:{port}: {e}")
+        return False
+    logger.info(f"📈 Метрики: http://{host}:{port}/metrics")
+    return True
@@ -0,0 +1,238 @@
+# order_journal.py
+"""
+Идемпотентные clientOrderId и журнал ордеров.
+
+clientOrderId имеет вид ftb-<узел>-<стратегия>-<номер>, например ftb-k3x9-per1x8z2q-lq2mv0a1:
+- узел      — settings.NODE_ID или 4 символа хэша имени хоста;
+- стратегия — первые 3 буквы типа + хэш ключа стратегии (man — ручной ордер);
+- номер     — возрастающий счётчик; при старте берётся не меньше текущего времени в мс,
+              поэтому номера не повторяются даже после потери журнала.
+
+Журнал — append-only JSON Lines (data/orders.jsonl). Намерение пишется ДО отправки,
+результат — ПОСЛЕ, каждая запись с fsync. Ордер, у которого есть намерение, но нет
+результата (таймаут, падение процесса), считается незавершённым: перед повтором или
+после рестарта его нужно проверить на бирже по origClientOrderId, а не отправлять заново.
+Запись блокирующая (fsync): из event loop — через executors.orders, с await до отправки.
+
+Журнал сжимается при загрузке и каждые ORDER_JOURNAL_COMPACT_EVERY завершённых ордеров:
+из памяти и файла уходят завершённые (отказ или исполненный / отменённый ордер), кроме
+последних ORDER_JOURNAL_KEEP_FINISHED — на случай повтора с тем же clientOrderId.
+Незавершённые и выставленные (открытые лимитные) ордера остаются всегда, как и покупки
+«под продажу» (hold, сетка): пока продажа купленного не выставлена (record_sold),
+по ним после рестарта восстанавливается непроданный объём.
+
+В памяти от ответа биржи остаются только поля ORDER_FIELDS (без сырого info):
+журнал растёт с каждым ордером и живёт всё время работы бота, полный ответ — в файле.
+Сжатие его не теряет: оставшиеся ордера переписываются из записей файла целиком
+(по строке на ордер — все его записи, слитые по порядку), а не из памяти.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from settings import settings
+from constants import ORDER_JOURNAL_COMPACT_EVERY, ORDER_JOURNAL_KEEP_FINISHED
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = Path("data/orders.jsonl")
+
+INTENT = "intent"      # отправляется / исход неизвестен
+PLACED = "placed"      # биржа приняла ордер
+FAILED = "failed"      # биржа точно не создала ордер
+
+# поля ордера ccxt, которые журнал держит в памяти (повторный вызов возвращает их)
+ORDER_FIELDS = ("id", "clientOrderId", "timestamp", "symbol", "type", "side", "price", "average",
+                "amount", "filled", "cost", "status")
+
+# статусы ордера ccxt / Binance, после которых он больше не изменится
+FINAL_ORDER_STATUSES = {"closed", "canceled", "cancelled", "expired", "rejected", "filled"}
+
+_B36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _base36(n: int) -> str:
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = _B36[r] + out
+        if not n:
+            return out
+
+
+def _hash36(text: str, width: int) -> str:
+    return _base36(zlib.crc32(text.encode()))[-width:].rjust(width, "0")
+
+
+def _compact(rec: Dict[str, Any]) -> Dict[str, Any]:
+    order = rec.get("order")
+    if not isinstance(order, dict):
+        return rec
+    return {**rec, "order": {k: order[k] for k in ORDER_FIELDS if k in order}}
+
+
+def _order(entry: Dict[str, Any]) -> Dict[str, Any]:
+    order = entry.get("order")
+    return order if isinstance(order, dict) else {}
+
+
+def filled_qty(entry: Dict[str, Any]) -> float:
+    """Исполненный объём ордера по последнему ответу биржи (0 — неизвестно или ничего)."""
+    try:
+        return float(_order(entry).get("filled") or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _node_id() -> str:
+    if settings.NODE_ID:
+        return "".join(c for c in settings.NODE_ID.lower() if c in _B36)[:4] or "node"
+    return _hash36(socket.gethostname(), 4)
+
+
+class OrderJournal:
+    def __init__(self, path: Path = JOURNAL_FILE):
+        self.path = path
+        self.node = _node_id()
+        self._lock = threading.Lock()
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._seq = int(time.time() * 1000)
+        self._finished = 0  # завершённых с последнего сжатия
+        self._load()
+
+    def _records(self):
+        """Записи файла по порядку (повреждённые строки пропускаются)."""
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"⚠️ Повреждённая запись в журнале ордеров пропущена: {line[:80]!r}")
+
+    def _load(self):
+        for rec in self._records():
+            entry = self._orders.setdefault(rec["client_id"], {})
+            entry.update(_compact(rec))
+            self._seq = max(self._seq, rec.get("seq", 0))
+        with self._lock:
+            self._compact()
+
+    def _append(self, rec: Dict[str, Any]):
+        rec["ts"] = datetime.now().isoformat()
+        line = json.dumps(rec, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            entry = self._orders.setdefault(rec["client_id"], {})
+            entry.update(_compact(rec))
+            if self.finished(entry):
+                self._finished += 1
+                if self._finished >= ORDER_JOURNAL_COMPACT_EVERY:
+                    self._compact()
+
+    def _compact(self):
+        """
+        Убирает завершённые ордера, кроме последних ORDER_JOURNAL_KEEP_FINISHED, и
+        переписывает файл: по строке на оставшийся ордер, слитой из всех его записей
+        в файле — с полным ответом биржи, а не урезанным до ORDER_FIELDS, как в памяти.
+        Вызывается под self._lock.
+        """
+        self._finished = 0
+        done = [cid for cid, entry in self._orders.items() if self.finished(entry)]
+        drop = done[:max(len(done) - ORDER_JOURNAL_KEEP_FINISHED, 0)]
+        if not drop:
+            return
+        for cid in drop:
+            del self._orders[cid]
+        full: Dict[str, Dict[str, Any]] = {}
+        for rec in self._records():
+            if rec["client_id"] in self._orders:
+                full.setdefault(rec["client_id"], {}).update(rec)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for entry in full.values():
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        logger.info(f"🧾 Журнал ордеров сжат: убрано завершённых {len(drop)}, осталось {len(self._orders)}")
+
+    def new_client_id(self, strategy: str | None = None) -> str:
+        """Уникальный clientOrderId (≤ 36 символов, допустимые для Binance символы)."""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        if strategy:
+            tag = strategy.split(":")[0][:3].lower() + _hash36(strategy, 6)
+        else:
+            tag = "man"
+        return f"ftb-{self.node}-{tag}-{_base36(seq)}"
+
+    def get(self, client_id: str) -> Dict[str, Any] | None:
+        return self._orders.get(client_id)
+
+    def record_intent(self, client_id: str, symbol: str, side: str, type_: str, quantity: float,
+                      price: float | None = None, strategy: str | None = None, hold: bool = False):
+        """hold — покупка под продажу: запись живёт, пока купленное не выставлено на продажу."""
+        rec = {
+            "client_id": client_id, "status": INTENT, "seq": self._seq,
+            "symbol": symbol, "side": side, "type": type_, "quantity": quantity,
+            "price": price, "strategy": strategy,
+        }
+        if hold:
+            rec["hold"] = True
+        self._append(rec)
+
+    def record_placed(self, client_id: str, order: Dict[str, Any]):
+        self._append({"client_id": client_id, "status": PLACED, "order": order})
+
+    def record_failed(self, client_id: str, error: Any):
+        self._append({"client_id": client_id, "status": FAILED, "error": str(error)})
+
+    def record_sold(self, client_id: str, sell_client_id: str):
+        """Купленное по ордеру client_id продаётся ордером sell_client_id (пишется до его отправки)."""
+        self._append({"client_id": client_id, "sold_by": sell_client_id})
+
+    def sold(self, entry: Dict[str, Any]) -> bool:
+        """Продажа купленного по ордеру выставлена: её ордер в журнале и не отклонён."""
+        sell = self._orders.get(entry.get("sold_by"))
+        return sell is not None and sell.get("status") != FAILED
+
+    def finished(self, entry: Dict[str, Any]) -> bool:
+        """
+        Исход ордера окончателен: биржа отказала или ордер исполнен / отменён (а если это
+        покупка под продажу с исполненным объёмом — продажа уже выставлена).
+        """
+        status = entry.get("status")
+        if status == FAILED:
+            return True
+        if status != PLACED:
+            return False
+        if str(_order(entry).get("status") or "").lower() not in FINAL_ORDER_STATUSES:
+            return False
+        if entry.get("hold") and filled_qty(entry) > 0:
+            return self.sold(entry)
+        return True
+
+    def by_strategy(self, strategy: str) -> List[Dict[str, Any]]:
+        """Ордера стратегии (ключ strategy из record_intent) в порядке создания."""
+        return [dict(e) for e in self._orders.values() if e.get("strategy") == strategy]
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Ордера с неизвестным исходом: намерение записано, результата нет."""
+        return [dict(e) for e in self._orders.values() if e.get("status") == INTENT]
+
+
+journal = OrderJournal()
@@ -0,0 +1,462 @@
+# scripts/bench.py
+"""
+Микробенчмарки горячих путей бота с сохранённым эталоном и порогами регрессии.
+
+Каждый замер — как timeit: число повторов в серии подбирается так, чтобы серия шла
+не меньше MIN_SERIES секунд, серий несколько, в зачёт идёт лучшая (меньше всего
+помех от планировщика ОС). Результат — наносекунды на одну операцию.
+
+Эталон — data/bench/baseline.json (пишется по --save). Сравнение: ratio = сейчас / эталон;
+ratio выше порога бенчмарка (THRESHOLDS, по умолчанию DEFAULT_THRESHOLD) — регрессия.
+"""
+import json
+import platform
+import random
+import re
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Tuple
+
+BASELINE_FILE = Path("data/bench/baseline.json")
+MIN_SERIES = 0.2         # секунд на серию
+REPEAT = 5               # серий на бенчмарк
+DEFAULT_THRESHOLD = 1.25  # на 25% медленнее эталона — регрессия
+# файловые замеры шумнее (диск, page cache) — порог выше
+THRESHOLDS = {f"persist.roundtrip[{n}]": 1.5 for n in ("1k", "10k", "100k")}
+# задержка event loop зависит от планировщика ОС — только грубые регрессии
+THRESHOLDS.update({name: 3.0 for name in ("loop_stall.p99[log direct]", "loop_stall.p99[log queue]",
+                                           "loop_stall.p99[log direct, slow sink]",
+                                           "loop_stall.p99[log queue, slow sink]")})
+THRESHOLDS["logging.drain[queue]"] = 1.5
+STRATEGY_COUNTS = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+
+def _measure(fn: Callable[[], Any], repeat: int = REPEAT, min_series: float = MIN_SERIES) -> Tuple[float, int]:
+    """(лучшее время одной операции в нс, операций в серии)."""
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_series or loops >= 1 << 24:
+            break
+        loops = loops * 10 if elapsed < min_series / 10 else max(int(loops * min_series / elapsed) + 1, loops + 1)
+    best = elapsed
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / loops * 1e9, loops
+
+
+# --- бенчмарки ---
+def _bench_normalize_symbol():
+    from utils import normalize_symbol
+    symbols = ["btcusdt", "ETH/USDT", "sol-usdc", "bnb btc", "XRPEUR", "unknownpair"]
+    return lambda: [normalize_symbol(s) for s in symbols]
+
+
+def _bench_make_job_key():
+    from state import make_job_key
+    return lambda: make_job_key("percent", "BTC/USDT", amount=0.001, step=0.5, interval=5)
+
+
+def _bench_get_api_load():
+    import load_manager
+    # полное окно: каждый вызов проходит все MAX_API_CALLS_PER_MIN отметок
+    now = time.time()
+    load_manager._api_calls_log.extend(now - i * 0.05 for i in range(load_manager.MAX_API_CALLS_PER_MIN))
+    return load_manager.get_api_load
+
+
+def _bench_decimal_order_math():
+    from constants import MIN_ORDER_USD
+    data = {"amount": 0.001, "base_price": 60000.0}
+    step = 0.5
+
+    def run(price=60321.17):
+        # так percent_job / range_job / dca_job считали до fixed.py — для сравнения
+        try:
+            amount = Decimal(str(data.get("amount", 0)))
+        except InvalidOperation:
+            amount = Decimal("0")
+        diff = (price - data["base_price"]) / data["base_price"] * 100
+        order_value = amount * Decimal(str(price))
+        return abs(diff) >= step and order_value >= MIN_ORDER_USD
+
+    return run
+
+
+def _bench_fixed_order_math():
+    from fixed import Scale
+    from constants import MIN_ORDER_USD
+    data = {"amount": 0.001, "base_price": 60000.0}
+    step = 0.5
+    scale = Scale.from_steps("0.00001", "0.01", 5.0)
+    min_order = float(MIN_ORDER_USD)
+
+    def run(price=60321.17):
+        # то же, что percent_job / range_job / dca_job делают на каждом запуске
+        try:
+            amount = float(data.get("amount", 0))
+        except (ValueError, TypeError):
+            amount = 0.0
+        diff = (price - data["base_price"]) / data["base_price"] * 100
+        order_value = scale.qty(amount) * scale.px(price)
+        return abs(diff) >= step and order_value >= scale.cost(min_order)
+
+    return run
+
+
+def _bench_decide(mode: str, n: int = 1000):
+    """
+    Решения n стратегий Percent одной пары при одной цене: evaluate пакета (ядро NumPy
+    от BATCH_KERNEL_MIN стратегий, меньше — kernels.percent_one), _evaluate_each (по одной
+    при любом размере, для сравнения с ядром) или по одной, как до пакетов.
+    """
+    from fixed import Scale
+    from strategies.batch import MIN_ORDER, evaluate, _evaluate_each
+    scale = Scale.from_steps("0.00001", "0.01", 5.0)
+    rnd = random.Random(0)
+    params = [{"amount": rnd.choice([0.0001, 0.001, 0.01]), "step": rnd.choice([0.5, 1.0, 2.0]),
+               "base_price": 60000.0 * rnd.uniform(0.97, 1.03)} for _ in range(n)]
+    if mode in ("batch", "each"):
+        fn = evaluate if mode == "batch" else _evaluate_each
+
+        def batch():
+            decisions = fn("percent", params, 60321.17, scale)
+            return [decisions[i] for i in range(len(decisions))]  # Decision каждому запуску
+        return batch
+
+    def run(price=60321.17):
+        # как percent_job решал до пакетов: каждая стратегия отдельно
+        min_cost = scale.cost(MIN_ORDER)
+        out = []
+        for p in params:
+            diff = (price - p["base_price"]) / p["base_price"] * 100
+            qty = scale.qty(float(p["amount"]))
+            out.append(abs(diff) >= float(p["step"]) and qty * scale.px(price) >= min_cost)
+        return out
+
+    return run
+
+
+def _bench_format_qty(kind: str):
+    from fixed import Scale
+    quantity = 0.00123
+    if kind == "float":
+        # как BinanceExchange.place_order форматировал объём до fixed.py
+        return lambda: f"{quantity:.8f}".rstrip("0").rstrip(".")
+    scale = Scale.from_steps("0.00001", "0.01")
+    return lambda: scale.format_qty(scale.qty(quantity))
+
+
+def _bench_sign():
+    from exchange.binance import BinanceExchange
+    holder = SimpleNamespace(secret=b"x" * 64)
+    params = {"symbol": "BTCUSDT", "side": "BUY", "type": "MARKET", "quantity": "0.001",
+              "newClientOrderId": "ftb-node-00000001", "timestamp": 1_700_000_000_000, "recvWindow": 5000}
+    return lambda: BinanceExchange._sign(holder, dict(params))
+
+
+def _bench_config(name: str):
+    from strategies.percent_config import PercentConfig
+    from strategies.range_config import RangeConfig
+    from strategies.dca_config import DCAConfig
+    model, kwargs = {
+        "percent": (PercentConfig, {"symbol": " btc/usdt", "amount": 0.001, "step": 0.5, "interval": 5}),
+        "range": (RangeConfig, {"symbol": "eth/usdt", "amount": 0.01, "low": 2800, "high": 3200, "interval": 5}),
+        "dca": (DCAConfig, {"symbol": "sol/usdt", "amount": 0.5, "interval": 60}),
+    }[name]
+    return lambda: model(**kwargs)
+
+
+def _strategies_payload(count: int) -> Dict[str, Any]:
+    """count стратегий в формате strategies.json, по 10 на пользователя."""
+    data: Dict[str, Any] = {}
+    for i in range(count):
+        user = data.setdefault(str(100000 + i // 10), {})
+        user[f"percent_BTC/USDT_20250101T000000{i:06d}"] = {
+            "type": "percent", "symbol": "BTC/USDT",
+            "parameters": {"amount": 0.001, "step": round(0.5 + (i % 10) * 0.1, 2), "interval": 5},
+            "created_at": "2025-01-01T00:00:00.000000",
+        }
+    return data
+
+
+class _Roundtrip:
+    """save_strategies + load_strategies на временном файле."""
+
+    def __init__(self, count: int):
+        import state_manager
+        from storage.state_storage import JsonStateStorage
+
+        self.state_manager = state_manager
+        self.tmp = Path(tempfile.mkdtemp(prefix="ftb-bench-"))
+        self.saved = state_manager._storage
+        state_manager._storage = JsonStateStorage(self.tmp / "strategies.json")
+        self.data = _strategies_payload(count)
+
+    def __call__(self):
+        self.state_manager.save_strategies(self.data)
+        return self.state_manager.load_strategies()
+
+    def close(self):
+        self.state_manager._storage = self.saved
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class _SlowStream:
+    """Поток вывода, каждая запись в который ждёт delay секунд — занятый терминал или pipe."""
+
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text: str):
+        time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class _LogBench:
+    """
+    Одна строка лога стратегии на приватном логгере, консоль — в /dev/null.
+    direct — обработчики прямо на логгере (как было до очереди), queue — через
+    logging_config.LogPipeline, sampled — то же с прореживанием (строка с одного места,
+    extra=SAMPLE, как у сообщений каждого тика).
+    """
+
+    def __init__(self, mode: str, sink_delay: float = 0.0, queue_size: int = 0):
+        import logging
+        import os
+        from logging_config import (ColorFormatter, LogPipeline, SizeAndTimeRotatingFileHandler,
+                                    SAMPLE, TEXT_FORMAT, DATE_FORMAT)
+
+        self.tmp = Path(tempfile.mkdtemp(prefix="ftb-bench-log-"))
+        self.devnull = open(os.devnull, "w")
+        console = logging.StreamHandler(_SlowStream(self.devnull, sink_delay) if sink_delay else self.devnull)
+        console.setFormatter(ColorFormatter(TEXT_FORMAT, DATE_FORMAT))
+        if mode == "direct":
+            file = logging.FileHandler(self.tmp / "app.log", encoding="utf-8")
+        else:
+            file = SizeAndTimeRotatingFileHandler(self.tmp / "app.log", max_bytes=64 * 1024 * 1024)
+        file.setFormatter(logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+
+        self.logger = logging.getLogger(f"ftb.bench.{mode}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.handlers.clear()
+        self.pipeline = None
+        if mode == "direct":
+            self.handlers = [console, file]
+            for h in self.handlers:
+                self.logger.addHandler(h)
+        else:
+            # по умолчанию очередь без предела: меряется цена вызова, а не отбрасывание
+            self.pipeline = LogPipeline([console, file], queue_size=queue_size,
+                                        sample_burst=20 if mode == "sampled" else 0)
+            self.pipeline.start()
+            self.logger.addHandler(self.pipeline.handler)
+        self.extra = SAMPLE if mode == "sampled" else None
+        self.price = 60000.0
+
+    def __call__(self):
+        self.price += 0.01
+        self.logger.info(f"📊 BTC/USDT: {self.price:.2f} (Δ=0.125% / цель 0.5%)", extra=self.extra)
+
+    def drain(self):
+        """Ждёт, пока фоновый писатель разберёт очередь."""
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
+
+    def close(self):
+        self.drain()
+        for h in self.logger.handlers[:]:
+            self.logger.removeHandler(h)
+            h.close()
+        self.devnull.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+def _probe_log_drain(records: int = 50_000) -> float:
+    """Сквозная пропускная способность очереди: записать и дописать на диск, нс на запись."""
+    bench = _LogBench("queue")
+    try:
+        t0 = time.perf_counter()
+        for _ in range(records):
+            bench()
+        bench.drain()
+        return (time.perf_counter() - t0) / records * 1e9
+    finally:
+        bench.close()
+
+
+def _probe_loop_stall(mode: str, sink_delay: float = 0.0, seconds: float = 1.0, burst: int = 50,
+                      probe: float = 0.005) -> float:
+    """
+    p99 задержки event loop (нс), пока задачи пишут в лог пачками по burst строк —
+    как тики стратегий, каждая со своей строкой лога. sink_delay — медленная консоль
+    (секунд на запись); очередь тогда обычного размера, лишнее отбрасывается.
+    """
+    import asyncio
+
+    bench = _LogBench(mode, sink_delay, queue_size=10_000 if sink_delay else 0)
+
+    async def main() -> List[float]:
+        lags: List[float] = []
+        deadline = time.perf_counter() + seconds
+
+        async def writer():
+            while time.perf_counter() < deadline:
+                for _ in range(burst):
+                    bench()
+                await asyncio.sleep(0)
+
+        async def watch():
+            while time.perf_counter() < deadline:
+                t = time.perf_counter()
+                await asyncio.sleep(probe)
+                lags.append(max(time.perf_counter() - t - probe, 0.0))
+
+        await asyncio.gather(writer(), watch())
+        return lags
+
+    try:
+        lags = sorted(asyncio.run(main()))
+        return lags[min(int(len(lags) * 0.99), len(lags) - 1)] * 1e9
+    finally:
+        bench.close()
+
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {
+    "utils.normalize_symbol[x6]": _bench_normalize_symbol,
+    "state.make_job_key": _bench_make_job_key,
+    "load_manager.get_api_load[full]": _bench_get_api_load,
+    "strategy.decimal_order_math": _bench_decimal_order_math,
+    "strategy.fixed_order_math": _bench_fixed_order_math,
+    "order.format_qty[float]": lambda: _bench_format_qty("float"),
+    "strategy.decide_percent[scalar x1000]": lambda: _bench_decide("scalar"),
+    "strategy.decide_percent[kernel x1000]": lambda: _bench_decide("batch"),
+    "strategy.decide_percent[each x1000]": lambda: _bench_decide("each"),
+    "strategy.decide_percent[batch x1]": lambda: _bench_decide("batch", 1),
+    "strategy.decide_percent[batch x64]": lambda: _bench_decide("batch", 64),
+    "order.format_qty[fixed]": lambda: _bench_format_qty("fixed"),
+    "binance._sign": _bench_sign,
+    "config.PercentConfig": lambda: _bench_config("percent"),
+    "config.RangeConfig": lambda: _bench_config("range"),
+    "config.DCAConfig": lambda: _bench_config("dca"),
+    **{f"persist.roundtrip[{label}]": (lambda n=n: _Roundtrip(n)) for label, n in STRATEGY_COUNTS.items()},
+    "logging.info[direct]": lambda: _LogBench("direct"),
+    "logging.info[queue]": lambda: _LogBench("queue"),
+    "logging.info[sampled]": lambda: _LogBench("sampled"),
+}
+
+# Замеры, которые сами возвращают число (нс), без серий _measure
+PROBES: Dict[str, Callable[[], float]] = {
+    "logging.drain[queue]": _probe_log_drain,
+    "loop_stall.p99[log direct]": lambda: _probe_loop_stall("direct"),
+    "loop_stall.p99[log queue]": lambda: _probe_loop_stall("queue"),
+    "loop_stall.p99[log direct, slow sink]": lambda: _probe_loop_stall("direct", sink_delay=0.0002),
+    "loop_stall.p99[log queue, slow sink]": lambda: _probe_loop_stall("queue", sink_delay=0.0002),
+}
+
+
+def run_benchmarks(pattern: str = "", repeat: int = REPEAT) -> Dict[str, Dict[str, float]]:
+    """Замеры всех бенчмарков, чьё имя подходит под регулярку pattern."""
+    import load_manager
+
+    results: Dict[str, Dict[str, float]] = {}
+    calls_log = list(load_manager._api_calls_log)
+    try:
+        for name, setup in BENCHMARKS.items():
+            if pattern and not re.search(pattern, name):
+                continue
+            fn = setup()
+            try:
+                fn()  # прогрев: импорты, кэши, первая запись файла
+                ns, loops = _measure(fn, repeat)
+            finally:
+                if hasattr(fn, "close"):
+                    fn.close()
+            results[name] = {"ns": round(ns, 1), "loops": loops}
+        for name, probe in PROBES.items():
+            if pattern and not re.search(pattern, name):
+                continue
+            results[name] = {"ns": round(probe(), 1), "loops": 1}
+    finally:
+        load_manager._api_calls_log.clear()
+        load_manager._api_calls_log.extend(calls_log)
+    return results
+
+
+def load_baseline(path: Path = BASELINE_FILE) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_baseline(results: Dict[str, Dict[str, float]], path: Path = BASELINE_FILE):
+    """Новый эталон; замеры бенчмарков, не вошедших в прогон, сохраняются из старого."""
+    baseline = load_baseline(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {**baseline.get("results", {}), **results},
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Строки сравнения; status: new | ok | faster | REGRESSION."""
+    rows = []
+    base = baseline.get("results", {})
+    for name, r in results.items():
+        row = {"name": name, "ns": r["ns"], "baseline": None, "ratio": None, "status": "new",
+               "threshold": THRESHOLDS.get(name, DEFAULT_THRESHOLD)}
+        if name in base and base[name].get("ns"):
+            row["baseline"] = base[name]["ns"]
+            row["ratio"] = r["ns"] / base[name]["ns"]
+            if row["ratio"] > row["threshold"]:
+                row["status"] = "REGRESSION"
+            elif row["ratio"] < 1 / row["threshold"]:
+                row["status"] = "faster"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def _fmt_ns(ns: float | None) -> str:
+    if ns is None:
+        return "—"
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("µs", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+
+def format_table(rows: List[Dict[str, Any]], baseline: Dict[str, Any]) -> str:
+    width = max([len(r["name"]) for r in rows] + [9])
+    lines = [f"Эталон: {baseline.get('created_at', 'нет')} (python {baseline.get('python', '—')})",
+             f"{'бенчмарк':<{width}}  {'сейчас':>10}  {'эталон':>10}  {'ratio':>6}  статус"]
+    for r in rows:
+        ratio = f"{r['ratio']:.2f}" if r["ratio"] is not None else "—"
+        lines.append(f"{r['name']:<{width}}  {_fmt_ns(r['ns']):>10}  {_fmt_ns(r['baseline']):>10}  "
+                     f"{ratio:>6}  {r['status']}")
+    return "\n".join(lines)
@@ -1,9 +1,10 @@
 import asyncio
 import json
 from pathlib import Path
+from typing import List
 import typer
 
-from exchange.binance import BinanceExchange
+from exchange import create_exchange
 
 app = typer.Typer(help="FriendlyTradeBot CLI")
 
@@ -11,7 +12,7 @@ app = typer.Typer(help="FriendlyTradeBot CLI")
 def check_connection():
     """Быстрая проверка соединения с биржей (цена BTCUSDT)."""
     async def _run():
-        ex = BinanceExchange()
+        ex = create_exchange()
         try:
             price = await ex.get_price("BTC/USDT")
             typer.echo(f"OK. BTC/USDT price: {price}")
@@ -19,6 +20,28 @@ def check_connection():
             await ex.close()
     asyncio.run(_run())
 
+@app.command()
+def mock_server(
+    host: str = typer.Option("127.0.0.1", help="Адрес"),
+    port: int = typer.Option(8765, help="Порт"),
+    latency: float = typer.Option(0.0, help="Задержка ответа (сек)"),
+    jitter: float = typer.Option(0.0, help="Случайная добавка к задержке (сек)"),
+    error_rate: float = typer.Option(0.0, help="Доля ответов 503"),
+    rate_limit_rate: float = typer.Option(0.0, help="Доля внеплановых 429"),
+    seed: int = typer.Option(None, help="Seed для цен и неисправностей"),
+):
+    """Локальный мок Binance REST/WebSocket (BINANCE_BASE_URL=http://host:port)."""
+    from settings import settings
+    from exchange.mock_server import serve, Faults
+
+    faults = Faults(latency=latency, jitter=jitter, error_rate=error_rate, rate_limit_rate=rate_limit_rate)
+    typer.echo(f"Мок Binance: http://{host}:{port} (Ctrl+C — остановить)")
+    try:
+        asyncio.run(serve(host, port, api_key=settings.api_key or None, secret=settings.api_secret or None,
+                          faults=faults, seed=seed))
+    except KeyboardInterrupt:
+        pass
+
 @app.command()
 def restore(from_path: Path):
     """Восстановить стратегии из бэкапа JSON."""
@@ -38,5 +61,174 @@ def export(to_path: Path = Path("data/export.json")):
     to_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
     typer.secho(f"Экспортировано в: {to_path}", fg=typer.colors.GREEN)
 
+def _load_history(symbol: str, timeframe: str, days: float, offline: bool):
+    """Свечи из локального хранилища; без offline — сначала докачивает недостающее."""
+    import time
+    from backtest.store import OHLCVStore
+
+    store = OHLCVStore()
+    if offline:
+        candles = store.open(symbol, timeframe)
+        if candles is not None:
+            candles = candles.slice(int((time.time() - days * 86400) * 1000))
+    else:
+        from connection_manager import connection
+        candles = store.sync(connection.get(), symbol, timeframe, days=days)
+    if candles is None or not len(candles):
+        raise typer.BadParameter(f"Нет истории для {symbol} {timeframe}")
+    return candles
+
+@app.command()
+def history(
+    symbol: str = typer.Argument(..., help="Пара, например BTC/USDT"),
+    days: float = typer.Option(30, help="Глубина истории (дней)"),
+    timeframe: str = typer.Option("1m", help="Таймфрейм свечей"),
+):
+    """Докачать свечи в локальное хранилище data/ohlcv."""
+    candles = _load_history(symbol, timeframe, days, offline=False)
+    typer.secho(f"{symbol} {timeframe}: {len(candles)} свечей в хранилище за период.", fg=typer.colors.GREEN)
+
+@app.command()
+def sweep(
+    strategy: str = typer.Argument(..., help="percent | range | dca"),
+    symbol: str = typer.Argument(..., help="Пара, например BTC/USDT"),
+    params: List[str] = typer.Argument(..., help="Пространство: step=0.2:2:0.2 interval=5,15,60 amount=0.001"),
+    days: float = typer.Option(30, help="Глубина истории (дней)"),
+    timeframe: str = typer.Option("1m", help="Таймфрейм свечей"),
+    samples: int = typer.Option(0, help="Случайный поиск: число комбинаций (0 — полная сетка)"),
+    workers: int = typer.Option(0, help="Процессов (0 — по числу ядер)"),
+    top: int = typer.Option(10, help="Сколько лучших показать"),
+    by: str = typer.Option("return_pct", help="return_pct | max_drawdown_pct | trades"),
+    quote: float = typer.Option(1000.0, help="Стартовый баланс в quote"),
+    base: float = typer.Option(0.0, help="Стартовый баланс в базовой валюте"),
+    offline: bool = typer.Option(False, help="Только локальная история, без сети"),
+):
+    """Подбор параметров стратегии на истории (сетка или случайный поиск)."""
+    import ccxt
+    from backtest.sweep import parse_space, grid, random_search, run_sweep, format_results
+
+    try:
+        space = parse_space(params)
+        candidates = random_search(strategy, space, samples) if samples else grid(strategy, space)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    if not candidates:
+        raise typer.BadParameter("Нет допустимых комбинаций параметров")
+
+    candles = _load_history(symbol, timeframe, days, offline)
+    typer.echo(f"{len(candidates)} комбинаций × {len(candles)} свечей...")
+
+    results = run_sweep(
+        strategy, candles.close, candidates, workers=workers, top=top, by=by,
+        bar_minutes=ccxt.Exchange.parse_timeframe(timeframe) / 60, quote=quote, base=base,
+    )
+    typer.echo(format_results(results))
+
+@app.command()
+def replay(
+    strategy: str = typer.Argument(..., help="percent | range | dca"),
+    symbol: str = typer.Argument(..., help="Пара, например BTC/USDT"),
+    params: List[str] = typer.Argument(..., help="Параметры: amount=0.001 step=0.5 interval=5"),
+    ticks: bool = typer.Option(False, help="Записанные тики (data/ticks) вместо свечей"),
+    days: float = typer.Option(7, help="Глубина истории свечей (дней)"),
+    timeframe: str = typer.Option("1m", help="Таймфрейм свечей"),
+    quote: float = typer.Option(1000.0, help="Стартовый баланс в quote"),
+    base: float = typer.Option(0.0, help="Стартовый баланс в базовой валюте"),
+    expect: str = typer.Option("", help="Ожидаемый digest: при расхождении — код выхода 1"),
+):
+    """Прогон записанных цен через код стратегии на виртуальном времени."""
+    from backtest.replay import Replay, PriceFeed
+    from tick_recorder import read_ticks
+
+    values = {}
+    for spec in params:
+        name, _, value = spec.partition("=")
+        values[name.strip()] = float(value)
+    interval = values.pop("interval", 5)
+
+    if ticks:
+        try:
+            feed = PriceFeed.from_ticks(read_ticks(symbol))
+        except FileNotFoundError:
+            raise typer.BadParameter(f"Нет записанных тиков для {symbol}")
+    else:
+        feed = PriceFeed.from_candles(_load_history(symbol, timeframe, days, offline=True))
+    if not len(feed.ts):
+        raise typer.BadParameter(f"Нет цен для {symbol}")
+
+    base_asset, quote_asset = symbol.split("/")
+    run = Replay({symbol: feed}, {quote_asset: quote, base_asset: base})
+    run.add(strategy, symbol, interval=interval, **values)
+    result = run.run()
+    typer.echo(json.dumps(result.summary(), ensure_ascii=False))
+    if expect and not result.digest().startswith(expect):
+        typer.secho(f"Поведение изменилось: digest {result.digest()[:16]} != {expect}", fg=typer.colors.RED)
+        raise typer.Exit(1)
+
+@app.command()
+def loadtest(
+    users: int = typer.Option(10, help="Пользователей"),
+    strategies: int = typer.Option(5, help="Стратегий Percent на пользователя (не больше лимита)"),
+    duration: float = typer.Option(30.0, help="Длительность нагрузки (сек)"),
+    tick: float = typer.Option(1.0, help="Интервал задач стратегий во время теста (сек)"),
+    move_every: float = typer.Option(5.0, help="Как часто двигается цена (сек)"),
+    move_pct: float = typer.Option(2.0, help="Размер движения цены (%)"),
+    chat_every: float = typer.Option(2.0, help="Как часто каждый пользователь шлёт /price (сек)"),
+    as_json: bool = typer.Option(False, "--json", help="Отчёт в JSON"),
+):
+    """Нагрузочный тест: фейковый Telegram + бумажная биржа, задержки p50/p95/p99."""
+    from scripts.loadtest import run_load_test, format_report
+
+    report = asyncio.run(run_load_test(users, strategies, duration, tick, move_every, move_pct, chat_every))
+    typer.echo(json.dumps(report, ensure_ascii=False) if as_json else format_report(report))
+
+@app.command()
+def bench(
+    only: str = typer.Option("", help="Регулярка по имени бенчмарка (например persist|config)"),
+    repeat: int = typer.Option(5, help="Серий на бенчмарк (в зачёт идёт лучшая)"),
+    save: bool = typer.Option(False, help="Сохранить результаты как новый эталон"),
+    baseline: Path = typer.Option(Path("data/bench/baseline.json"), help="Файл эталона"),
+):
+    """Микробенчмарки горячих путей и сравнение с эталоном (код 1 при регрессии)."""
+    from scripts.bench import run_benchmarks, load_baseline, save_baseline, compare, format_table
+
+    reference = load_baseline(baseline)
+    results = run_benchmarks(only, repeat)
+    rows = compare(results, reference)
+    typer.echo(format_table(rows, reference))
+    if save:
+        save_baseline(results, baseline)
+        typer.echo(f"Эталон сохранён: {baseline}")
+    elif any(r["status"] == "REGRESSION" for r in rows):
+        raise typer.Exit(1)
+
+@app.command()
+def membench(
+    counts: str = typer.Option("1k,10k,100k", help="Размеры через запятую: 1k, 10k, 100k"),
+    breakdown: bool = typer.Option(True, help="Разбивка tracemalloc по модулям (второй проход)"),
+    save: bool = typer.Option(False, help="Сохранить результаты как новый эталон"),
+    baseline: Path = typer.Option(Path("data/bench/memory.json"), help="Файл эталона"),
+    as_json: bool = typer.Option(False, "--json", help="Отчёт в JSON"),
+):
+    """Память на стратегию при 1k/10k/100k запущенных (код 1 при превышении бюджета или эталона)."""
+    from scripts.membench import COUNTS, run_memory_benchmark, load_baseline, save_baseline, check, format_report
+
+    labels = [c.strip() for c in counts.split(",") if c.strip()]
+    unknown = [c for c in labels if c not in COUNTS]
+    if unknown:
+        raise typer.BadParameter(f"Неизвестные размеры: {', '.join(unknown)} (есть {', '.join(COUNTS)})")
+    reference = load_baseline(baseline)
+    results = run_memory_benchmark(labels, traced=breakdown)
+    typer.echo(json.dumps(results, ensure_ascii=False) if as_json else format_report(results, reference))
+    if save:
+        save_baseline(results, baseline)
+        typer.echo(f"Эталон сохранён: {baseline}")
+        return
+    problems = check(results, reference)
+    for problem in problems:
+        typer.secho(f"❌ {problem}", fg=typer.colors.RED)
+    if problems:
+        raise typer.Exit(1)
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,363 @@
+# scripts/loadtest.py
+"""
+Нагрузочный тест всего бота: N пользователей × M стратегий Percent.
+
+Работает настоящее приложение из bot.build_application (обработчики, ConversationHandler,
+job_queue на каждую стратегию, utils, журнал ордеров, сохранение стратегий). Подменяются:
+
+- Telegram Bot API — FakeTelegram внутри процесса (getUpdates / sendMessage / ...);
+  апдейты идут через обычный polling;
+- биржа — PaperExchange над ценами, которые двигает тест (скачок ±move_pct
+  каждые move_every секунд, больше шага стратегий — каждая реагирует ордером);
+- файлы (strategies.json, журнал ордеров, тики) — во временной папке.
+
+Фазы: пользователи создают стратегии через диалог «Percent» (как в Telegram), интервалы
+задач сжимаются до tick секунд, дальше duration секунд идут движения цены и /price
+от пользователей.
+
+Отчёт:
+- reply      — апдейт выдан боту (getUpdates) → ответ отправлен (sendMessage);
+- decision   — движение цены → первое сообщение стратегии после него;
+- order      — движение цены → ордер стратегии на бирже;
+- loop lag   — задержка event loop (опоздание sleep(0.05));
+- память на стратегию (tracemalloc на фазе создания), пропускная способность.
+"""
+import asyncio
+import json
+import logging
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from telegram.request import BaseRequest
+
+logger = logging.getLogger(__name__)
+
+SYMBOL = "BTC/USDT"
+START_PRICE = 60000.0
+LAG_PROBE = 0.05  # секунд между замерами задержки event loop
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q / 100 * len(values)), len(values) - 1)]
+
+
+def _dist(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max в миллисекундах."""
+    return {
+        "n": len(values),
+        "p50": round(_pct(values, 50) * 1000, 2),
+        "p95": round(_pct(values, 95) * 1000, 2),
+        "p99": round(_pct(values, 99) * 1000, 2),
+        "max": round(max(values) * 1000, 2) if values else 0.0,
+    }
+
+
+# --- фейковый Telegram Bot API ---
+class FakeTelegram:
+    def __init__(self):
+        self.pending: deque = deque()
+        self._arrived = asyncio.Event()
+        self._update_id = 0
+        self._message_id = 0
+        self.delivered: Dict[int, float] = {}   # chat_id → когда боту выдан последний апдейт
+        self.waiters: Dict[int, Tuple[asyncio.Future, Callable[[str], bool]]] = {}
+        self.reply_latency: List[float] = []
+        self.strategy_messages: List[Tuple[float, str]] = []  # (время, имя задачи)
+        self.sent = 0
+
+    # апдейты от пользователей
+    def push(self, chat_id: int, text: str, until: Callable[[str], bool] = lambda _: True) -> asyncio.Future:
+        """Сообщение пользователя; future завершится ответом бота, для которого until(text)."""
+        self._update_id += 1
+        self._message_id += 1
+        message: Dict[str, Any] = {
+            "message_id": self._message_id, "date": int(time.time()), "text": text,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        self.pending.append({"update_id": self._update_id, "message": message})
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[chat_id] = (future, until)
+        self._arrived.set()
+        return future
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = params.get("offset") or 0
+        while self.pending and self.pending[0]["update_id"] < offset:
+            self.pending.popleft()
+        if not self.pending:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout=float(params.get("timeout") or 0) or 0.1)
+            except asyncio.TimeoutError:
+                return []
+        batch = [u for u in self.pending if u["update_id"] >= offset][: int(params.get("limit") or 100)]
+        now = time.perf_counter()
+        for u in batch:
+            self.delivered.setdefault(u["message"]["chat"]["id"], now)
+        return batch
+
+    def _send_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.perf_counter()
+        chat_id = int(params["chat_id"])
+        text = params.get("text", "")
+        self.sent += 1
+        markup = json.dumps(params.get("reply_markup") or "", default=str)
+        if "STOP:" in markup:
+            name = markup.split("STOP:", 1)[1].split('"', 1)[0]
+            self.strategy_messages.append((now, name))
+        else:
+            waiter = self.waiters.get(chat_id)
+            if chat_id in self.delivered:
+                self.reply_latency.append(now - self.delivered.pop(chat_id))
+            if waiter and waiter[1](text) and not waiter[0].done():
+                waiter[0].set_result(text)
+        self._message_id += 1
+        return {"message_id": self._message_id, "date": int(time.time()), "text": text,
+                "chat": {"id": chat_id, "type": "private"}}
+
+    async def call(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method == "sendMessage":
+            return self._send_message(params)
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "FriendlyTradeBot", "username": "ftb_load_bot",
+                    "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+        if method in ("deleteWebhook", "answerCallbackQuery", "setMyCommands", "close", "logOut"):
+            return True
+        if method == "getWebhookInfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        return True
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Транспорт python-telegram-bot, отвечающий из FakeTelegram без сети."""
+
+    def __init__(self, api: FakeTelegram):
+        self.api = api
+
+    @property
+    def read_timeout(self) -> float:
+        return 5.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        params = request_data.parameters if request_data is not None else {}
+        result = await self.api.call(url.rsplit("/", 1)[-1], params)
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+# --- биржа ---
+class _MovingPrice:
+    """Источник цен для PaperExchange; цену двигает тест."""
+
+    def __init__(self, price: float):
+        self.price = price
+        self.markets = {SYMBOL: {"symbol": SYMBOL, "limits": {"cost": {"min": 5.0}}}}
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        p = self.price
+        return {"symbol": symbol, "timestamp": int(time.time() * 1000), "bid": p, "ask": p, "last": p}
+
+
+def _timed_exchange(source, orders: List[Tuple[float, str | None]]):
+    from exchange.paper import PaperExchange
+
+    class TimedPaperExchange(PaperExchange):
+        def create_order(self, symbol, type, side, amount, price=None, params=None):
+            order = super().create_order(symbol, type, side, amount, price, params)
+            orders.append((time.perf_counter(), (params or {}).get("newClientOrderId")))
+            return order
+
+    return TimedPaperExchange(source, {"USDT": 1e12, "BTC": 1e6}, fee_rate=0.001)
+
+
+# --- сценарий ---
+async def _create_strategies(api: FakeTelegram, chat_id: int, count: int, rejected: List[int]):
+    done = ("✅", "⚠️", "❌")
+    # объём уникален для пользователя, шаг — для стратегии: имена задач не совпадают
+    amount = f"{0.001 + (chat_id % 1000) * 1e-6:.6f}"
+    for m in range(count):
+        for text in ("Percent", SYMBOL, amount, f"{0.5 + m * 0.01:.2f}"):
+            await api.push(chat_id, text)
+        reply = await api.push(chat_id, "1", until=lambda t: t.startswith(done))
+        if not reply.startswith("✅"):
+            rejected.append(chat_id)
+
+
+async def _chat(api: FakeTelegram, chat_id: int, every: float, stop: asyncio.Event):
+    rnd = random.Random(chat_id)
+    await asyncio.sleep(rnd.uniform(0, every))
+    while not stop.is_set():
+        await api.push(chat_id, f"/price {SYMBOL}")
+        await asyncio.sleep(every)
+
+
+async def _move_prices(source: _MovingPrice, pct: float, every: float, moves: List[float], stop: asyncio.Event):
+    sign = 1
+    while not stop.is_set():
+        await asyncio.sleep(every)
+        source.price *= 1 + sign * pct / 100
+        sign = -sign
+        moves.append(time.perf_counter())
+
+
+async def _watch_loop(lags: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(LAG_PROBE)
+        lags.append(max(time.perf_counter() - t - LAG_PROBE, 0.0))
+
+
+def _after_moves(moves: List[float], events: List[Tuple[float, str]]) -> List[float]:
+    """Для каждого движения цены и каждой задачи — задержка до её первого события после движения."""
+    out = []
+    events = sorted(events)
+    for i, t0 in enumerate(moves):
+        t1 = moves[i + 1] if i + 1 < len(moves) else float("inf")
+        seen = set()
+        for t, name in events:
+            if t0 <= t < t1 and name not in seen:
+                seen.add(name)
+                out.append(t - t0)
+    return out
+
+
+async def run_load_test(users: int = 10, strategies: int = 5, duration: float = 30.0, tick: float = 1.0,
+                        move_every: float = 5.0, move_pct: float = 2.0, chat_every: float = 2.0) -> Dict[str, Any]:
+    import bot
+    import state_manager
+    import utils
+    from connection_manager import connection
+    from order_journal import OrderJournal
+    from storage.state_storage import JsonStateStorage
+    from strategy_registry import StrategyRegistry, registry
+    from strategies.batch import decisions
+    from tick_recorder import TickRecorder
+
+    logging.getLogger().setLevel(logging.WARNING)  # bot при импорте настраивает логи на INFO
+    logging.getLogger("apscheduler").setLevel(logging.WARNING)
+    tmp = Path(tempfile.mkdtemp(prefix="ftb-load-"))
+    source = _MovingPrice(START_PRICE)
+    orders: List[Tuple[float, str | None]] = []
+    saved = (connection.exchange, utils.journal, utils.ticks, state_manager._storage)
+    connection.exchange = _timed_exchange(source, orders)
+    utils.journal = OrderJournal(tmp / "orders.jsonl")
+    utils.ticks = TickRecorder(tmp / "ticks")
+    state_manager._storage = JsonStateStorage(tmp / "strategies.json")
+
+    api = FakeTelegram()
+    stop = asyncio.Event()
+    lags: List[float] = []
+    moves: List[float] = []
+    report: Dict[str, Any] = {"users": users, "strategies_per_user": strategies}
+    try:
+        with registry.substituted(StrategyRegistry()):
+            app = bot.build_application("0:load-test", request=FakeTelegramRequest(api),
+                                        get_updates_request=FakeTelegramRequest(api))
+            async with app:
+                await app.start()
+                await app.updater.start_polling(poll_interval=0.0, timeout=1)
+                lag_task = asyncio.create_task(_watch_loop(lags, stop))
+
+                # 1) создание стратегий через диалоги
+                rejected: List[int] = []
+                tracemalloc.start()
+                mem0 = tracemalloc.get_traced_memory()[0]
+                t0 = time.perf_counter()
+                await asyncio.gather(*(_create_strategies(api, 1000 + u, strategies, rejected) for u in range(users)))
+                setup = time.perf_counter() - t0
+                mem1 = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                jobs = app.job_queue.jobs()
+                report["setup"] = {
+                    "seconds": round(setup, 2), "started": len(jobs), "rejected": len(rejected),
+                    "reply": _dist(api.reply_latency),
+                    "memory_per_strategy_kb": round((mem1 - mem0) / max(len(jobs), 1) / 1024, 1),
+                }
+
+                # 2) интервалы задач сжимаются до tick, запуски разносятся по времени
+                rnd = random.Random(0)
+                for job in jobs:
+                    job.job.reschedule(trigger="interval", seconds=tick)
+                    job.job.modify(next_run_time=datetime.now(timezone.utc) + timedelta(seconds=rnd.uniform(0, tick)))
+
+                # 3) нагрузка: движения цены + /price от пользователей
+                api.reply_latency.clear()
+                api.strategy_messages.clear()
+                orders.clear()
+                lags.clear()
+                sent0 = api.sent
+                batches0, decided0 = decisions.batches, decisions.decided
+                t0 = time.perf_counter()
+                tasks = [asyncio.create_task(_move_prices(source, move_pct, move_every, moves, stop))]
+                tasks += [asyncio.create_task(_chat(api, 1000 + u, chat_every, stop)) for u in range(users)]
+                await asyncio.sleep(duration)
+                stop.set()
+                elapsed = time.perf_counter() - t0
+                await asyncio.gather(*tasks, lag_task, return_exceptions=True)
+
+                runs = len(api.strategy_messages)
+                strategy_of = {}
+                for _, cid in orders:
+                    entry = utils.journal.get(cid) if cid else None
+                    strategy_of[cid] = (entry or {}).get("strategy") or cid
+                report["run"] = {
+                    "seconds": round(elapsed, 1),
+                    "price_moves": len(moves),
+                    "job_runs_per_sec": round(runs / elapsed, 1),
+                    "orders_per_sec": round(len(orders) / elapsed, 1),
+                    "messages_per_sec": round((api.sent - sent0) / elapsed, 1),
+                    "expected_runs_per_sec": round(len(jobs) / tick, 1),
+                    "reply": _dist(api.reply_latency),
+                    "decision": _dist(_after_moves(moves, api.strategy_messages)),
+                    "order": _dist(_after_moves(moves, [(t, strategy_of[cid]) for t, cid in orders])),
+                    "loop_lag": _dist(lags),
+                    "runs_per_batch": round((decisions.decided - decided0) / max(decisions.batches - batches0, 1), 2),
+                    "jobs_alive": len(app.job_queue.jobs()),
+                }
+                await app.updater.stop()
+                await app.stop()
+            await state_manager.flush()  # post_shutdown вызывается только из run_polling
+    finally:
+        connection.exchange, utils.journal, utils.ticks, state_manager._storage = saved
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    def dist(d):
+        return f"p50 {d['p50']} / p95 {d['p95']} / p99 {d['p99']} / max {d['max']} мс (n={d['n']})"
+
+    s, r = report["setup"], report["run"]
+    return "\n".join([
+        f"Пользователей: {report['users']} × стратегий: {report['strategies_per_user']}",
+        f"Создание: {s['started']} стратегий за {s['seconds']} с, отказов {s['rejected']}, "
+        f"память ~{s['memory_per_strategy_kb']} КБ на стратегию",
+        f"  ответ на апдейт: {dist(s['reply'])}",
+        f"Нагрузка {r['seconds']} с, движений цены {r['price_moves']}, задач живо {r['jobs_alive']}:",
+        f"  запусков задач/с: {r['job_runs_per_sec']} (ожидалось {r['expected_runs_per_sec']}), "
+        f"ордеров/с: {r['orders_per_sec']}, сообщений/с: {r['messages_per_sec']}",
+        f"  запусков на пакетное решение пары: {r['runs_per_batch']}",
+        f"  ответ на апдейт:   {dist(r['reply'])}",
+        f"  цена → решение:    {dist(r['decision'])}",
+        f"  цена → ордер:      {dist(r['order'])}",
+        f"  задержка loop:     {dist(r['loop_lag'])}",
+    ])
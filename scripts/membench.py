@@ -0,0 +1,269 @@
+# scripts/membench.py
+"""
+Память на одну запущенную стратегию: 1k / 10k / 100k стратегий в одном процессе.
+
+Работает настоящее приложение из bot.build_application (job_queue, реестр стратегий,
+сохранение в файл); стратегии запускаются через start_*_strategy, как при восстановлении
+после рестарта: Percent, Range и DCA по очереди, по MAX_STRATEGIES_PER_USER на
+пользователя. Подменяются Telegram (scripts.loadtest.FakeTelegram), биржа (PaperExchange)
+и файлы (временная папка). Интервалы задач — сутки, сами они за время замера не
+запускаются; отдельная фаза прогоняет по одному тику у TICK_SAMPLE стратегий и меряет,
+что осталось в памяти после тика (кнопки, сообщения, base_price в job.data).
+
+Каждый размер считается в отдельном процессе (spawn), чтобы RSS не смешивался:
+- rss       — прирост VmRSS процесса на фазе запуска (без tracemalloc);
+- traced    — прирост памяти Python по tracemalloc (отдельный проход) и разбивка
+              по модулям, где она выделена (telegram, apscheduler, strategy_registry, ...);
+- retained  — что остаётся после одного тика, на стратегию (без истории ордеров
+              самой бумажной биржи).
+
+Пороги: BUDGET_BYTES — абсолютный бюджет RSS на стратегию (100k стратегий с запасом
+в 1 ГБ вместе с самим процессом); эталон data/bench/memory.json (пишется по --save) —
+рост traced больше THRESHOLD раз относительно эталона считается регрессией.
+"""
+import asyncio
+import gc
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+BASELINE_FILE = Path("data/bench/memory.json")
+COUNTS = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+NODE_BUDGET = 1 << 30          # 100k стратегий на одном узле — меньше 1 ГБ RSS
+BUDGET_BYTES = 8 * 1024        # на стратегию (RSS), остальное — сам процесс
+THRESHOLD = 1.15               # на 15% больше эталона — регрессия
+TICK_SAMPLE = 1_000
+TOP_MODULES = 8
+SYMBOLS = ["BTC/USDT", "ETH/USDT", "SOL/USDT", "BNB/USDT", "XRP/USDT"]
+
+
+def _rss() -> int:
+    """Текущий RSS процесса (байт); без /proc — пиковый из getrusage."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _module(filename: str) -> str:
+    """Куда отнести выделение: пакет из site-packages, модуль бота или '<stdlib>'."""
+    path = Path(filename)
+    parts = path.parts
+    if "site-packages" in parts:
+        return parts[parts.index("site-packages") + 1].split(".")[0]
+    root = Path(__file__).resolve().parent.parent
+    try:
+        rel = path.resolve().relative_to(root)
+    except ValueError:
+        return "<stdlib>" if "python3" in filename else filename
+    return ".".join(rel.with_suffix("").parts)
+
+
+def _breakdown(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, count: int) -> Dict[str, float]:
+    """Прирост по модулям, байт на стратегию, по убыванию."""
+    totals: Dict[str, int] = {}
+    for stat in after.compare_to(before, "filename"):
+        name = _module(stat.traceback[0].filename)
+        totals[name] = totals.get(name, 0) + stat.size_diff
+    ranked = sorted(totals.items(), key=lambda kv: -kv[1])
+    return {name: round(size / count, 1) for name, size in ranked[:TOP_MODULES] if size > 0}
+
+
+# --- стенд ---
+class _Price:
+    """Источник цен PaperExchange: постоянная цена по каждому символу."""
+
+    def __init__(self):
+        self.markets = {s: {"symbol": s, "limits": {"cost": {"min": 5.0}}} for s in SYMBOLS}
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        return {"symbol": symbol, "timestamp": int(time.time() * 1000), "bid": 100.0, "ask": 100.0, "last": 100.0}
+
+
+async def _noop(*args, **kwargs):
+    pass
+
+
+async def _start(app, i: int, limit: int) -> bool:
+    """i-я стратегия: тип и пара по кругу, параметры уникальны в пределах пользователя."""
+    from strategies.dca import start_dca_strategy
+    from strategies.percent import start_percent_strategy
+    from strategies.range import start_range_strategy
+
+    chat_id = 100_000 + i // limit
+    update = SimpleNamespace(message=SimpleNamespace(reply_text=_noop), effective_chat=SimpleNamespace(id=chat_id))
+    context = SimpleNamespace(bot=app.bot, application=app, job_queue=app.job_queue, user_data={})
+    symbol = SYMBOLS[i % len(SYMBOLS)]
+    amount = round(0.1 + (i % limit) * 0.01, 2)
+    kind = i % 3
+    if kind == 0:
+        return await start_percent_strategy(update, context, symbol, amount, 0.5, 1440)
+    if kind == 1:
+        return await start_range_strategy(update, context, symbol, amount, 90.0, 110.0, 1440)
+    return await start_dca_strategy(update, context, symbol, amount, 1440)
+
+
+async def _measure(count: int, traced: bool) -> Dict[str, Any]:
+    import bot
+    import state_manager
+    import utils
+    from connection_manager import connection
+    from exchange.paper import PaperExchange
+    from order_journal import OrderJournal
+    from scripts.loadtest import FakeTelegram, FakeTelegramRequest
+    from storage.state_storage import JsonStateStorage
+    from strategy_registry import StrategyRegistry, registry
+    from tick_recorder import TickRecorder
+
+    logging.disable(logging.CRITICAL)  # строка лога на каждый запуск — не то, что меряем
+    tmp = Path(tempfile.mkdtemp(prefix="ftb-mem-"))
+    connection.exchange = PaperExchange(_Price(), {"USDT": 1e15, **{s.split("/")[0]: 1e12 for s in SYMBOLS}})
+    utils.journal = OrderJournal(tmp / "orders.jsonl")
+    utils.ticks = TickRecorder(tmp / "ticks")
+    utils.ticks.enabled = False
+    state_manager._storage = JsonStateStorage(tmp / "strategies.json")
+    # файл стратегий пишется один раз в конце: меряется память, а не перезапись
+    # всего файла раз в секунду на фазе запуска (при 100k она и занимает почти всё время)
+    state_manager.STRATEGIES_SAVE_DELAY = 3600
+
+    api = FakeTelegram()
+    report: Dict[str, Any] = {"count": count}
+    try:
+        with registry.substituted(StrategyRegistry()):
+            app = bot.build_application("0:membench", request=FakeTelegramRequest(api),
+                                        get_updates_request=FakeTelegramRequest(api))
+            async with app:
+                await app.start()
+                await _start(app, 0, registry.limit)  # прогрев: импорты, кэши pydantic, первая запись файла
+                registry.remove_user(100_000)
+                await state_manager.flush()
+
+                gc.collect()
+                if traced:
+                    tracemalloc.start()
+                    snap0 = tracemalloc.take_snapshot()
+                    traced0 = tracemalloc.get_traced_memory()[0]
+                rss0 = _rss()
+                t0 = time.perf_counter()
+                for i in range(count):
+                    if not await _start(app, i, registry.limit):
+                        raise RuntimeError(f"стратегия {i} не запустилась")
+                await state_manager.flush()
+                report["seconds"] = round(time.perf_counter() - t0, 1)
+                gc.collect()
+                report["rss"] = round((_rss() - rss0) / count)
+                report["rss_total_mb"] = round(_rss() / 2 ** 20, 1)
+                if traced:
+                    snap1 = tracemalloc.take_snapshot()
+                    report["traced"] = round((tracemalloc.get_traced_memory()[0] - traced0) / count)
+                    report["modules"] = _breakdown(snap0, snap1, count)
+
+                    # один тик у части стратегий: что из него остаётся жить
+                    sample = [r.job for r in list(registry)[:TICK_SAMPLE]]
+                    for job in sample:
+                        await job.run(app)
+                    api.strategy_messages.clear()
+                    gc.collect()
+                    # история ордеров бумажной биржи — состояние стенда, а не бота
+                    stand = [tracemalloc.Filter(False, sys.modules[PaperExchange.__module__].__file__)]
+                    snap2 = tracemalloc.take_snapshot().filter_traces(stand)
+                    report["retained_after_tick"] = round(
+                        sum(s.size_diff for s in snap2.compare_to(snap1.filter_traces(stand), "filename"))
+                        / len(sample))
+                    tracemalloc.stop()
+                report["jobs"] = len(app.job_queue.jobs())
+                await app.stop()
+    finally:
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(tmp, ignore_errors=True)
+    return report
+
+
+def _child(count: int, traced: bool) -> Dict[str, Any]:
+    return asyncio.run(_measure(count, traced))
+
+
+def measure(count: int, traced: bool = True) -> Dict[str, Any]:
+    """Замер в отдельном процессе: сначала RSS без tracemalloc, затем (traced) разбивка."""
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        report = pool.apply(_child, (count, False))
+    if traced:
+        with ctx.Pool(1) as pool:
+            detail = pool.apply(_child, (count, True))
+        report.update({k: detail[k] for k in ("traced", "modules", "retained_after_tick")})
+    return report
+
+
+def run_memory_benchmark(labels: List[str], traced: bool = True) -> Dict[str, Dict[str, Any]]:
+    return {label: measure(COUNTS[label], traced) for label in labels}
+
+
+# --- эталон и пороги ---
+def load_baseline(path: Path = BASELINE_FILE) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_baseline(results: Dict[str, Dict[str, Any]], path: Path = BASELINE_FILE):
+    baseline = load_baseline(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {**baseline.get("results", {}), **results},
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def check(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any]) -> List[str]:
+    """Нарушения порогов (пустой список — всё в порядке)."""
+    problems = []
+    base = baseline.get("results", {})
+    for label, r in results.items():
+        if r["rss"] > BUDGET_BYTES:
+            problems.append(f"{label}: {r['rss']} Б на стратегию > бюджета {BUDGET_BYTES} Б")
+        if r["count"] == COUNTS["100k"] and r["rss_total_mb"] * 2 ** 20 > NODE_BUDGET:
+            problems.append(f"{label}: процесс {r['rss_total_mb']} МБ > {NODE_BUDGET // 2 ** 20} МБ")
+        # RSS зависит от фрагментации кучи и шумит на ±20% — с эталоном сравнивается tracemalloc
+        old = base.get(label, {}).get("traced")
+        if old and r.get("traced") and r["traced"] > old * THRESHOLD:
+            problems.append(f"{label}: tracemalloc {r['traced']} Б > эталона {old} Б × {THRESHOLD}")
+    return problems
+
+
+def format_report(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any]) -> str:
+    base = baseline.get("results", {})
+    lines = [f"Эталон: {baseline.get('created_at', 'нет')}; бюджет {BUDGET_BYTES} Б на стратегию, "
+             f"100k — до {NODE_BUDGET // 2 ** 20} МБ на процесс"]
+    for label, r in results.items():
+        old = base.get(label, {})
+        lines.append(f"{label}: запуск {r['seconds']} с, RSS +{r['rss']} Б/стратегию "
+                     f"(эталон {old.get('rss', '—')}), процесс {r['rss_total_mb']} МБ")
+        if "traced" in r:
+            lines.append(f"  tracemalloc: {r['traced']} Б/стратегию (эталон {old.get('traced', '—')}), "
+                         f"после тика остаётся {r['retained_after_tick']} Б")
+            for name, size in r["modules"].items():
+                lines.append(f"    {name:<28} {size:>8.1f} Б")
+    return "\n".join(lines)
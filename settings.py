@@ -15,7 +15,28 @@ class Settings(BaseSettings):
     # Альтернативные (Binance-специфичные)
     BINANCE_API_KEY: str | None = None
     BINANCE_API_SECRET: str | None = None
-    MODE: str | None = None  # "testnet" | "mainnet"
+    MODE: str | None = None  # "testnet" | "mainnet" | "paper"
+
+    # Свой адрес REST API вместо Binance (например, локальный мок: http://127.0.0.1:8765)
+    BINANCE_BASE_URL: str | None = None
+
+    # Бумажная торговля (MODE=paper): цены с mainnet, ордера исполняются локально
+    PAPER_BALANCE: str = "USDT=10000"
+    PAPER_FEE_RATE: float = 0.001
+    PAPER_SLIPPAGE: float = 0.0005
+
+    # Идентификатор узла в clientOrderId (если не задан — из имени хоста)
+    NODE_ID: str | None = None
+
+    # Запись всех полученных цен в data/ticks (tick_recorder)
+    RECORD_TICKS: bool = True
+
+    # Telegram id администраторов через запятую (/profile и другие служебные команды)
+    ADMIN_IDS: str = ""
+
+    # Метрики Prometheus: http://METRICS_HOST:METRICS_PORT/metrics (0 — не поднимать)
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9108
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -27,6 +48,14 @@ class Settings(BaseSettings):
     def api_secret(self) -> str:
         return self.EXCHANGE_API_SECRET or self.BINANCE_API_SECRET or ""
 
+    @property
+    def admin_ids(self) -> set[int]:
+        return {int(x) for x in self.ADMIN_IDS.replace(" ", "").split(",") if x}
+
+    @property
+    def is_paper(self) -> bool:
+        return (self.MODE or "").lower() == "paper"
+
     @property
     def is_testnet(self) -> bool:
         if self.MODE:
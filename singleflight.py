@@ -0,0 +1,96 @@
+# singleflight.py
+"""
+Объединение одинаковых одновременных запросов к бирже (single-flight).
+
+Если запрос с тем же ключом уже выполняется, новые вызывающие не идут на биржу,
+а ждут результат (или исключение) уже летящего запроса.
+Слой ничего не кэширует: как только запрос завершён, следующий вызов снова
+пойдёт на биржу. Поэтому он ставится ПОД любым TTL-кэшем и закрывает его промахи.
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, List
+
+_registry: List["ThreadSingleFlight | AsyncSingleFlight"] = []
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Счётчики всех групп: calls — реальных запросов, shared — сэкономленных."""
+    return {f.name: {"calls": f.calls, "shared": f.shared} for f in _registry}
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class ThreadSingleFlight:
+    """Для синхронных вызовов (ccxt), которые выполняются в потоках через asyncio.to_thread."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+        _registry.append(self)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """Для корутин (httpx-клиент). Отмена одного ожидающего не отменяет общий запрос."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        _registry.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # помечаем исключение как полученное, даже если все ожидающие были отменены
+        if not task.cancelled():
+            task.exception()
@@ -1,5 +1,12 @@
-from typing import Dict, Any
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
 from storage.state_storage import JsonStateStorage
+from constants import STRATEGIES_SAVE_DELAY
+
+logger = logging.getLogger(__name__)
 
 _storage = JsonStateStorage()
 
@@ -10,3 +17,116 @@ def load_strategies() -> Dict[str, Any]:
 def save_strategies(all_data: Dict[str, Any]) -> None:
     """Сохраняет все стратегии в файл (атомично)."""
     _storage.save(all_data)
+
+
+# --- Синхронизация файла с реестром стратегий (strategy_registry) ---
+# Изменения копятся и пишутся пачкой раз в STRATEGIES_SAVE_DELAY секунд в потоке:
+# файл читается, к нему применяются только изменённые записи — чужие записи
+# (например, не восстановившиеся после рестарта) не затираются.
+_pending: Dict[Tuple[str, str], Dict[str, Any] | None] = {}
+_flush_handle: asyncio.TimerHandle | None = None
+_flushing: asyncio.Future | None = None
+
+
+def persist_added(record) -> None:
+    """Обработчик registry.on_added."""
+    _queue(str(record.user_id), record.id, {
+        "type": record.type,
+        "symbol": record.symbol,
+        "parameters": record.params,
+        "created_at": datetime.fromtimestamp(record.created_at).isoformat(),
+    })
+
+
+def persist_removed(record) -> None:
+    """Обработчик registry.on_removed."""
+    _queue(str(record.user_id), record.id, None)
+
+
+def forget_stored(user_id, stored_id: str) -> None:
+    """Убрать запись из файла (например, под старым id после восстановления под новым)."""
+    _queue(str(user_id), stored_id, None)
+
+
+def legacy_entries(strategies: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Старый формат (список записей без id) → {id: запись}; id по позиции в списке."""
+    return {f"legacy-{i}": entry for i, entry in enumerate(strategies)}
+
+
+def _queue(user: str, strategy_id: str, entry: Dict[str, Any] | None):
+    _pending[(user, strategy_id)] = entry
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        flush_pending()  # вне event loop (CLI) — сразу
+        return
+    _schedule(loop)
+
+
+def _schedule(loop: asyncio.AbstractEventLoop):
+    global _flush_handle
+    if _flush_handle is None:
+        _flush_handle = loop.call_later(STRATEGIES_SAVE_DELAY, _start_flush)
+
+
+def _take_pending() -> Dict[Tuple[str, str], Any]:
+    global _flush_handle
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    ops = dict(_pending)
+    _pending.clear()
+    return ops
+
+
+def _start_flush():
+    global _flush_handle, _flushing
+    _flush_handle = None
+    loop = asyncio.get_running_loop()
+    if _flushing is not None and not _flushing.done():
+        _schedule(loop)  # предыдущая пачка ещё пишется — порядок записей важен, ждём её
+        return
+    ops = _take_pending()
+    _flushing = asyncio.ensure_future(asyncio.to_thread(_apply, ops))
+    _flushing.add_done_callback(lambda f: _flush_done(f, ops))
+
+
+def _flush_done(future: asyncio.Future, ops: Dict[Tuple[str, str], Any]):
+    if future.cancelled() or future.exception() is None:
+        return
+    logger.error(f"❌ Не удалось сохранить стратегии: {future.exception()}")
+    for key, entry in ops.items():
+        _pending.setdefault(key, entry)  # более новые изменения важнее
+    _schedule(asyncio.get_running_loop())
+
+
+def _apply(ops: Dict[Tuple[str, str], Any]):
+    if ops:
+        _storage.update(lambda data: _merge(data, ops))  # чтение и запись под одной файловой блокировкой
+
+
+def _merge(data: Dict[str, Any], ops: Dict[Tuple[str, str], Any]):
+    for (user, strategy_id), entry in ops.items():
+        if isinstance(data.get(user), list):
+            data[user] = legacy_entries(data[user])  # старые записи сохраняются под своими id
+        if entry is not None:
+            user_map = data.get(user)
+            if not isinstance(user_map, dict):
+                user_map = data[user] = {}
+            user_map[strategy_id] = entry
+        elif isinstance(data.get(user), dict):
+            data[user].pop(strategy_id, None)
+            if not data[user]:
+                del data[user]
+
+
+async def flush() -> None:
+    """Дождаться текущей записи и записать накопленное (при остановке бота)."""
+    if _flushing is not None and not _flushing.done():
+        await asyncio.wait([_flushing])
+    await asyncio.to_thread(_apply, _take_pending())
+
+
+def flush_pending() -> None:
+    """Записать накопленное сейчас (блокирующая; вне event loop)."""
+    _apply(_take_pending())
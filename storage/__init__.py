@@ -0,0 +1,2 @@
+# storage/__init__.py
+from storage.state_storage import JsonStateStorage, StateCorruptError
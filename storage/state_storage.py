@@ -0,0 +1,85 @@
+# storage/state_storage.py
+"""
+Хранилище сохранённых стратегий: JSON-файл (по умолчанию strategies.json).
+
+Запись атомарная (временный файл + os.replace), чтение и запись сериализуются
+файловой блокировкой (portalocker), поэтому несколько процессов (бот, ftb_cli)
+могут работать с одним файлом; update держит блокировку на всё чтение-изменение-запись.
+
+Повреждённый файл не читается как пустой: load и update бросают StateCorruptError,
+и файл остаётся как есть, пока его не починят вручную или не перезапишут бэкапом
+(ftb_cli restore) — иначе следующее сохранение стёрло бы стратегии всех пользователей.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import orjson
+import portalocker
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = Path("strategies.json")
+
+
+class StateCorruptError(Exception):
+    pass
+
+
+class JsonStateStorage:
+    def __init__(self, path: Path | str = STATE_FILE):
+        self.path = Path(path)
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+
+    def _lock(self):
+        return portalocker.Lock(self._lock_path, mode="a", timeout=10)
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            raw = self.path.read_bytes()
+        except FileNotFoundError:
+            return {}
+        if not raw.strip():
+            return {}
+        try:
+            data = orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            data = e
+        if not isinstance(data, dict):
+            logger.error(f"❌ Повреждён файл стратегий {self.path}: {data!r:.200}. Запись остановлена "
+                         f"до ручного исправления файла или ftb_cli restore из бэкапа.")
+            raise StateCorruptError(f"повреждён файл стратегий {self.path}")
+        return data
+
+    def _write(self, payload: bytes) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def load(self) -> Dict[str, Any]:
+        with self._lock():
+            return self._read()
+
+    def save(self, data: Dict[str, Any]) -> None:
+        """Перезаписать файл целиком (в том числе повреждённый — так его чинит ftb_cli restore)."""
+        started = time.perf_counter()
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        with self._lock():
+            self._write(payload)
+        metrics.labeled(metrics.PERSIST_WRITE, "strategies").observe(time.perf_counter() - started)
+
+    def update(self, change: Callable[[Dict[str, Any]], None]) -> None:
+        """Прочитать, изменить change(data) на месте и записать — под одной блокировкой."""
+        started = time.perf_counter()
+        with self._lock():
+            data = self._read()
+            change(data)
+            self._write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        metrics.labeled(metrics.PERSIST_WRITE, "strategies").observe(time.perf_counter() - started)
@@ -2,3 +2,4 @@
 from strategies.percent import start_percent_strategy, percent_job
 from strategies.range import start_range_strategy, range_job
 from strategies.dca import start_dca_strategy, dca_job
+from strategies.grid import start_grid_strategy, grid_job
@@ -0,0 +1,211 @@
+# strategies/batch.py
+"""
+Пакетные решения стратегий одной пары.
+
+Запуск percent_job / range_job / dca_job не считает решение сам, а встаёт в пакет
+своей пары (decisions.decide). Пакет открыт, пока запрашивается цена: все запуски
+этой пары, пришедшие за это время, получают одну цену, одно Scale и решаются одним
+вызовом ядра (strategies/kernels.py) на тип стратегии; пакеты меньше
+BATCH_KERNEL_MIN — по одной стратегии (kernels.*_one), без сборки массивов.
+После этого каждый запуск делает ввод-вывод (баланс, ордер, сообщение) только
+для своего решения.
+
+Общий запрос цены идёт без дедлайна отдельного запуска (deadline.detached): отмена
+или таймаут одного ожидающего не обрывает его для остальных — каждый запуск
+ограничен своим дедлайном, пока ждёт.
+"""
+import asyncio
+import logging
+from itertools import repeat
+from typing import Any, Dict, List, Set, Tuple
+
+import numpy as np
+
+import deadline
+import metrics
+from constants import MIN_ORDER_USD, BATCH_KERNEL_MIN
+from executors import market_data
+from fixed import Scale
+from strategies import kernels
+from utils import get_price, scale_for
+
+logger = logging.getLogger(__name__)
+
+MIN_ORDER = float(MIN_ORDER_USD)
+
+
+class Decision:
+    """Решение одной стратегии: код kernels.*, цена, объём и цена в единицах Scale."""
+
+    __slots__ = ("code", "price", "scale", "qty", "px", "diff")
+
+    def __init__(self, code: int, price: float, scale: Scale, qty: int, px: int, diff: float | None = None):
+        self.code = code
+        self.price = price
+        self.scale = scale
+        self.qty = qty
+        self.px = px
+        self.diff = diff
+
+    @property
+    def side(self) -> str | None:
+        return {kernels.BUY: "buy", kernels.SELL: "sell"}.get(self.code)
+
+    @property
+    def order_value(self) -> int:
+        return self.qty * self.px
+
+
+class Decisions:
+    """Решения пакета (списки по стратегиям); Decision одной стратегии — decisions[i]."""
+
+    __slots__ = ("price", "scale", "px", "codes", "qty", "diff")
+
+    def __init__(self, price: float, scale: Scale, px: int, codes: List[int], qty: List[int],
+                 diff: List[float] | None = None):
+        self.price = price
+        self.scale = scale
+        self.px = px
+        self.codes = codes
+        self.qty = qty
+        self.diff = diff
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int) -> Decision:
+        return Decision(self.codes[i], self.price, self.scale, self.qty[i], self.px,
+                        None if self.diff is None else self.diff[i])
+
+
+def _number(data: Dict[str, Any], key: str, default: float = 0.0) -> float:
+    try:
+        return float(data.get(key, default))
+    except (ValueError, TypeError):
+        return default
+
+
+def _column(params: List[Dict[str, Any]], key: str) -> List[float]:
+    try:
+        return [float(p.get(key, 0.0)) for p in params]
+    except (ValueError, TypeError):
+        return [_number(p, key) for p in params]  # редкий случай — испорченные параметры
+
+
+Entry = Tuple[str, Dict[str, Any], asyncio.Future]
+
+
+def _base_price(data: Dict[str, Any]) -> float:
+    return np.nan if data.get("base_price") is None else _number(data, "base_price")
+
+
+def _evaluate_each(kind: str, params: List[Dict[str, Any]], price: float, scale: Scale) -> Decisions:
+    px = scale.px(price)
+    floor = kernels.min_qty(px, scale.cost(MIN_ORDER))
+    qty = [scale.qty(amount) for amount in _column(params, "amount")]
+    diff = None
+    if kind == "percent":
+        results = [kernels.percent_one(price, _base_price(p), step, q, floor)
+                   for p, step, q in zip(params, _column(params, "step"), qty)]
+        codes = [code for code, _ in results]
+        diff = [d for _, d in results]
+    elif kind == "range":
+        codes = [kernels.band_one(px, scale.px(low), scale.px(high), q, floor)
+                 for low, high, q in zip(_column(params, "low"), _column(params, "high"), qty)]
+    elif kind == "dca":
+        codes = [kernels.dca_one(q, floor) for q in qty]
+    else:
+        raise ValueError(f"Неизвестный тип стратегии: {kind}")
+    return Decisions(price, scale, px, codes, qty, diff)
+
+
+def evaluate(kind: str, params: List[Dict[str, Any]], price: float, scale: Scale) -> Decisions:
+    """Решения для стратегий одного типа одной пары при цене price (без ввода-вывода)."""
+    if len(params) < BATCH_KERNEL_MIN:
+        return _evaluate_each(kind, params, price, scale)
+    px = scale.px(price)
+    floor = kernels.min_qty(px, scale.cost(MIN_ORDER))
+    qty = scale.qty_array(_column(params, "amount"))
+    diff = None
+    if kind == "percent":
+        base = np.array([_base_price(p) for p in params])
+        codes, diff = kernels.percent(price, base, np.array(_column(params, "step")), qty, floor)
+        diff = diff.tolist()
+    elif kind == "range":
+        low = scale.px_array(_column(params, "low"))
+        high = scale.px_array(_column(params, "high"))
+        codes = kernels.band(px, low, high, qty, floor)
+    elif kind == "dca":
+        codes = kernels.dca(qty, floor)
+    else:
+        raise ValueError(f"Неизвестный тип стратегии: {kind}")
+    return Decisions(price, scale, px, codes.tolist(), qty.tolist(), diff)
+
+
+class DecisionBatcher:
+    def __init__(self):
+        self._open: Dict[str, List[Entry]] = {}
+        self._tasks: Set[asyncio.Task] = set()  # ссылки, чтобы задачи пакетов не собрал GC
+        self.batches = 0   # пакетов (запросов цены)
+        self.decided = 0   # запусков в них
+
+    async def decide(self, kind: str, symbol: str, data: Dict[str, Any]) -> Decision | None:
+        """Решение для одной стратегии в пакете пары symbol; None — цены нет."""
+        future = asyncio.get_running_loop().create_future()
+        entries = self._open.get(symbol)
+        if entries is None:
+            entries = self._open[symbol] = []
+            task = asyncio.get_running_loop().create_task(self._run(symbol, entries), context=deadline.detached())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        entries.append((kind, data, future))
+        result = await future
+        if result is None:
+            return None
+        batch, i = result
+        return batch[i]
+
+    async def _run(self, symbol: str, entries: List[Entry]):
+        try:
+            price = await market_data.run(get_price, symbol)
+            scale = await scale_for(symbol)
+        except BaseException as e:
+            self._open.pop(symbol, None)
+            for _, _, future in entries:
+                if future.done():
+                    continue
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                else:
+                    future.cancel()
+            if not isinstance(e, Exception):
+                raise
+            return
+        # дальше без await — пакет закрывается с окончательным списком
+        del self._open[symbol]
+        self.batches += 1
+        self.decided += len(entries)
+        metrics.DECISION_BATCH.observe(len(entries))
+
+        by_kind: Dict[str, List[Entry]] = {}
+        for entry in entries:
+            if not entry[2].done():  # ожидающий уже отменён (таймаут запуска)
+                by_kind.setdefault(entry[0], []).append(entry)
+        for kind, group in by_kind.items():
+            if price is None:
+                results = [None] * len(group)
+            else:
+                try:
+                    batch = evaluate(kind, [data for _, data, _ in group], price, scale)
+                    results = zip(repeat(batch), range(len(batch)))
+                except Exception as e:
+                    logger.exception(f"Ошибка пакетного решения {kind} {symbol}")
+                    results = [e] * len(group)
+            for (_, _, future), result in zip(group, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+decisions = DecisionBatcher()
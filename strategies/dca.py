@@ -1,14 +1,17 @@
 # strategies/dca.py
-import asyncio
 from strategies.dca_config import DCAConfig
-from decimal import Decimal, InvalidOperation
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from utils import get_price, place_market_order_safe, has_enough_balance, safe_add_strategy
-from state import make_job_key, add_job, get_jobs, remove_job
+from utils import get_price, place_market_order_safe, has_enough_balance
+from state import make_job_key
+from strategy_registry import registry, StrategyRecord
 from menus import get_main_menu
 from decorators import resilient_strategy
+from executors import market_data, account
+from strategies import kernels
+from strategies.batch import decisions
 from constants import MIN_ORDER_USD
 import logging
+from logging_config import SAMPLE
 
 logger = logging.getLogger(__name__)
 
@@ -18,37 +21,28 @@ async def dca_job(context):
     job = context.job
     data = job.data or {}
     symbol = data.get("symbol")
-
-    try:
-        amount = Decimal(str(data.get("amount", 0)))
-    except (InvalidOperation, TypeError):
-        amount = Decimal("0")
-
     chat_id = job.chat_id
-    price = await asyncio.to_thread(get_price, symbol)
 
-    try:
-        order_value = amount * Decimal(str(price)) if price is not None else Decimal("0")
-    except Exception:
-        order_value = Decimal("0")
-
-    if order_value < MIN_ORDER_USD:
-        msg = f"⚠️ DCA: пропуск ордера {symbol}: {order_value:.2f} USDT < минимум {MIN_ORDER_USD} USDT"
-        logger.info(msg)
+    # решение — в пакете пары вместе с остальными стратегиями (strategies/batch.py)
+    decision = await decisions.decide("dca", symbol, data)
+    if decision is None:
+        msg = f"❌ Нет цены для {symbol}"
+    elif decision.code == kernels.SMALL:
+        msg = (f"⚠️ DCA: пропуск ордера {symbol}: {decision.scale.format_cost(decision.order_value, 2)} USDT "
+               f"< минимум {MIN_ORDER_USD} USDT")
+        logger.info(msg, extra=SAMPLE)
     else:
+        scale, qty = decision.scale, decision.qty
         side = "buy"
-        ok, reason = await asyncio.to_thread(has_enough_balance, symbol, side, float(amount))
+        ok, reason = await account.run(has_enough_balance, symbol, side, scale.qty_float(qty))
         if not ok:
             msg = f"❌ DCA остановлен: {reason}"
-            try:
+            if registry.remove(chat_id, job.name) is None:
                 job.schedule_removal()
-                remove_job(context.application.user_data.get(chat_id, {}), job.name)
-            except Exception:
-                logger.warning(f"Ошибка при остановке job {job.name} в dca_job.")
         else:
-            await place_market_order_safe(symbol, side, float(amount))
-            price_now = await asyncio.to_thread(get_price, symbol)
-            msg = f"💰 DCA BUY {amount} {symbol} @ {price_now:.2f}"
+            await place_market_order_safe(symbol, side, scale.qty_float(qty), strategy=job.name)
+            price_now = await market_data.run(get_price, symbol)
+            msg = f"💰 DCA BUY {scale.format_qty(qty)} {symbol} @ {price_now:.2f}"
 
     keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("🛑 Стоп", callback_data=f"STOP:{job.name}")]])
     try:
@@ -57,14 +51,13 @@ async def dca_job(context):
         logger.warning(f"Не удалось отправить сообщение в dca_job: {e}")
 
     # === Адаптивная корректировка интервала ===
-    from load_manager import adaptive_delay
-    job.interval = await adaptive_delay(job.interval)
+    from load_manager import adapt_job_interval
+    await adapt_job_interval(job)
 
 
 async def start_dca_strategy(update, context, symbol, amount, interval):
     """Запуск DCA стратегии с заданным интервалом (в минутах)."""
 
-    from load_manager import register_strategy
     chat_id = update.effective_chat.id
 
     # === 1️⃣ Проверка параметров ===
@@ -78,17 +71,17 @@ async def start_dca_strategy(update, context, symbol, amount, interval):
     job_key = make_job_key("dca", symbol, amount=amount, interval=interval)
 
     # === 3️⃣ Проверка дубликатов ===
-    if job_key in get_jobs(context.user_data):
+    if registry.get(chat_id, job_key) is not None:
         await update.message.reply_text(f"⚠️ Уже запущено: {job_key}", reply_markup=get_main_menu())
         return False
 
     # === 4️⃣ Проверка лимита стратегий ===
-    if not register_strategy(chat_id, job_key):
+    if not registry.has_room(chat_id):
         await update.message.reply_text("⚠️ Лимит активных стратегий достигнут.", reply_markup=get_main_menu())
         return False
 
     # === 5️⃣ Проверка баланса ===
-    ok, reason = await asyncio.to_thread(has_enough_balance, symbol, "buy", amount)
+    ok, reason = await account.run(has_enough_balance, symbol, "buy", amount)
     if not ok:
         await update.message.reply_text(f"❌ Запуск невозможен: {reason}", reply_markup=get_main_menu())
         return False
@@ -101,10 +94,13 @@ async def start_dca_strategy(update, context, symbol, amount, interval):
         name=job_key,
         data={"symbol": symbol, "amount": amount}
     )
-    add_job(context.user_data, job_key, job)
 
-    # === 7️⃣ Сохранение в state ===
-    safe_add_strategy(update, "dca", symbol, {"amount": amount, "interval": interval})
+    # === 7️⃣ Регистрация (реестр сам сохраняет стратегию в файл) ===
+    record = StrategyRecord(chat_id, job_key, "dca", symbol, {"amount": amount, "interval": interval}, job)
+    if not registry.add(record):
+        job.schedule_removal()  # параллельный запуск успел раньше
+        await update.message.reply_text(f"⚠️ Уже запущено: {job_key}", reply_markup=get_main_menu())
+        return False
 
     # === 8️⃣ Подтверждение ===
     await update.message.reply_text(
@@ -0,0 +1,400 @@
+# strategies/grid.py
+"""
+Сеточная стратегия (Grid): уровни цены между low и high и лимитные ордера на них.
+
+Уровни — арифметическая (равный шаг в цене) или геометрическая (равный шаг в
+процентах) сетка, округлённая до tick пары. Сетка строится один раз на первом
+запуске и хранится компактно (Grid): цены уровней — массив int64 в единицах Scale
+(fixed.py), состояние уровня — int8 (пусто / стоит покупка / стоит продажа),
+clientOrderId — список по уровням.
+
+Правила (сетка «от покупки»):
+- лимитные покупки ставятся на GRID_ACTIVE_BUYS ближайших уровнях ниже цены; окно
+  сдвигается за ценой, покупки, отставшие от него ещё на столько же уровней, снимаются;
+- исполнилась покупка на уровне i → лимитная продажа купленного объёма на уровне i+1,
+  уровень i пуст, пока она не исполнится; покупка, снятая при сдвиге окна после
+  частичного исполнения, продаётся так же — в объёме исполненного;
+- исполнилась продажа на уровне i → уровень i-1 снова в окне покупок.
+
+На каждом запуске бинарным поиском (np.searchsorted) находятся уровни между прошлой
+и текущей ценой — на бирже проверяются только их ордера (по ходу цены: при падении
+сверху вниз). Остальная работа — окно покупок и его сдвиг, поэтому запуск стоит
+O(log n) от числа уровней, а не O(n). Исполнение, которое цена «проскочила» между
+запусками туда и обратно, заметится при следующем пересечении уровня.
+
+Сообщение пользователю — только когда что-то исполнилось, выставлено или отклонено.
+После рестарта сетка подхватывает из журнала (order_journal) свои открытые ордера и
+купленное, продажа которого ещё не выставлена: покупки идут с hold, а clientOrderId
+продажи пишется в запись покупки до отправки (record_sold). При остановке стратегии
+ордера снимаются (cancel_grid_orders — подписка на реестр).
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+import ccxt
+import numpy as np
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+import utils
+from strategies.grid_config import GridConfig, GEOMETRIC
+from utils import get_price, scale_for, lookup_order, cancel_order, place_limit_order_safe, has_enough_balance
+from state import make_job_key
+from strategy_registry import registry, StrategyRecord
+from menus import get_main_menu
+from decorators import resilient_strategy
+from executors import market_data, account, orders
+from fixed import Scale
+from order_journal import PLACED, filled_qty
+from supervisor import supervisor
+from constants import MIN_ORDER_USD, GRID_ACTIVE_BUYS
+
+logger = logging.getLogger(__name__)
+
+EMPTY = 0
+BUY = 1
+SELL = -1
+
+_SIDES = {BUY: "buy", SELL: "sell"}
+
+
+class Held:
+    """Купленное, продажа которого на уровне ещё не выставлена."""
+
+    __slots__ = ("qty", "buys", "client_id")
+
+    def __init__(self):
+        self.qty = 0                        # объём к продаже (единицы Scale)
+        self.buys: List[str] = []           # clientOrderId покупок, из которых он набран
+        self.client_id: str | None = None   # clientOrderId продажи (тот же при повторах)
+
+
+class Grid:
+    """Уровни сетки и их состояние (по элементу массива на уровень)."""
+
+    __slots__ = ("levels", "state", "orders", "qty", "last_px", "window", "unsold")
+
+    def __init__(self, levels: np.ndarray, qty: int):
+        self.levels = levels                                  # цены уровней в единицах Scale, по возрастанию
+        self.state = np.zeros(len(levels), dtype=np.int8)     # какой ордер стоит: EMPTY / BUY / SELL
+        self.orders: List[str | None] = [None] * len(levels)  # clientOrderId ордера на уровне
+        self.qty = qty                                        # объём ордера на уровне (единицы Scale)
+        self.last_px: int | None = None                       # цена прошлого запуска
+        self.window = 0                                       # ниже этого уровня покупок нет
+        self.unsold: Dict[int, Held] = {}                     # уровень → купленное, продажа которого не выставлена
+
+    @classmethod
+    def build(cls, scale: Scale, low: float, high: float, count: int, spacing: str, amount: float) -> "Grid":
+        prices = np.geomspace(low, high, count) if spacing == GEOMETRIC else np.linspace(low, high, count)
+        levels = np.unique(scale.px_array(prices))  # уровни, совпавшие после округления до tick, — один
+        return cls(levels[levels > 0], scale.qty(amount))
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def below(self, px: int) -> int:
+        """Сколько уровней строго ниже px (он же номер первого уровня >= px). O(log n)."""
+        return int(np.searchsorted(self.levels, px, "left"))
+
+    def crossed(self, a: int, b: int) -> range:
+        """Уровни в [min(a, b), max(a, b)] — цена прошла их между запусками. O(log n)."""
+        lo, hi = (a, b) if a <= b else (b, a)
+        return range(self.below(lo), int(np.searchsorted(self.levels, hi, "right")))
+
+    def level_of(self, px: int) -> int | None:
+        """Номер уровня с ценой ровно px."""
+        i = self.below(px)
+        return i if i < len(self.levels) and self.levels[i] == px else None
+
+    def resting(self) -> np.ndarray:
+        """Номера уровней, на которых стоит ордер."""
+        return np.flatnonzero(self.state)
+
+
+class _GridRun:
+    """Один запуск grid_job: ордера сетки и события для сообщения пользователю."""
+
+    def __init__(self, grid: Grid, symbol: str, name: str, scale: Scale):
+        self.grid = grid
+        self.symbol = symbol
+        self.name = name
+        self.scale = scale
+        self.events: List[str] = []
+
+    def _price(self, i: int) -> str:
+        return self.scale.format_px(int(self.grid.levels[i]))
+
+    async def place(self, i: int, side: int, qty: int | None = None, client_id: str | None = None) -> bool:
+        grid = self.grid
+        qty = grid.qty if qty is None else qty
+        # clientOrderId задаётся здесь: по нему уровень найдёт ордер, что бы ни вернул адаптер биржи
+        client_id = client_id or utils.journal.new_client_id(self.name)
+        try:
+            await place_limit_order_safe(self.symbol, _SIDES[side], self.scale.qty_float(qty),
+                                         self.scale.px_float(int(grid.levels[i])), strategy=self.name,
+                                         client_id=client_id, hold=side == BUY)
+        except (ccxt.BaseError, TimeoutError):
+            raise  # биржа / дедлайн — пауза и повтор через resilient_strategy
+        except Exception as e:  # не прошёл проверки (минимум, баланс) — уровень пропускается
+            self.events.append(f"⚠️ {_SIDES[side].upper()} @ {self._price(i)} не выставлен: {e}")
+            return False
+        grid.state[i] = side
+        grid.orders[i] = client_id
+        return True
+
+    def hold(self, i: int, buy_id: str, qty: int) -> Held:
+        """Купленное по ордеру buy_id — к продаже на уровне i."""
+        held = self.grid.unsold.get(i)
+        if held is None:
+            held = self.grid.unsold[i] = Held()
+        held.qty += qty
+        held.buys.append(buy_id)
+        return held
+
+    async def sell_held(self, i: int):
+        """Продажа купленного на уровне i-1 — на уровне i."""
+        grid = self.grid
+        held = grid.unsold[i]
+        if grid.state[i] != EMPTY:
+            return  # на уровне ещё стоит ордер — продажа после его исполнения
+        if held.client_id is None:
+            held.client_id = utils.journal.new_client_id(self.name)
+        for buy_id in held.buys:  # до отправки: после рестарта продажа найдётся по покупке
+            entry = utils.journal.get(buy_id)
+            if entry is not None and entry.get("sold_by") != held.client_id:
+                await orders.run(utils.journal.record_sold, buy_id, held.client_id)
+        if await self.place(i, SELL, held.qty, held.client_id):
+            del grid.unsold[i]
+
+    def _filled(self, order: Dict[str, Any]) -> int:
+        filled = order.get("filled")
+        return self.grid.qty if filled is None else self.scale.qty(float(filled))
+
+    async def filled(self, i: int, side: int, order: Dict[str, Any], client_id: str):
+        """Ордер уровня i исполнен (или снят после частичного исполнения)."""
+        grid = self.grid
+        grid.state[i] = EMPTY
+        grid.orders[i] = None
+        qty = self._filled(order)
+        text = f"{self.scale.format_qty(qty)} @ {self._price(i)}"
+        if order.get("status") != "closed":
+            text += " (частично, остаток снят)"
+        if side == BUY:
+            self.events.append(f"🟢 BUY {text}")
+            if i + 1 < len(grid) and qty > 0:
+                self.hold(i + 1, client_id, qty)  # до постановки: ошибка биржи не потеряет купленное
+                await self.sell_held(i + 1)
+        else:
+            self.events.append(f"🔴 SELL {text}")
+
+    async def _settled(self, i: int, order: Dict[str, Any] | None):
+        """Ордер уровня i больше не стоит на бирже: исполнен, снят или биржа его не знает."""
+        grid = self.grid
+        side, client_id = int(grid.state[i]), grid.orders[i]
+        if order is not None and utils.journal.get(client_id) is not None:
+            await orders.run(utils.journal.record_placed, client_id, order)
+        if order is not None and (order.get("status") == "closed" or (side == BUY and self._filled(order) > 0)):
+            await self.filled(i, side, order, client_id)
+        else:  # снят без исполнения (вручную или сеткой) или биржа его не знает
+            grid.state[i] = EMPTY
+            grid.orders[i] = None
+
+    async def settle(self, i: int):
+        """Проверяет ордер уровня i на бирже."""
+        order = await orders.run(lookup_order, self.symbol, self.grid.orders[i])
+        if (order or {}).get("status") == "open":
+            return
+        await self._settled(i, order)
+
+    async def cancel(self, i: int):
+        order = await orders.run(cancel_order, self.symbol, self.grid.orders[i])
+        if order is None:
+            await self.settle(i)  # не отменился — возможно, уже исполнен
+            return
+        await self._settled(i, order)  # частично исполненная покупка — продажа исполненного
+
+    async def adopt(self):
+        """
+        После рестарта: открытые ордера этой сетки из журнала — обратно на свои уровни,
+        купленное без выставленной продажи — в unsold.
+        """
+        grid, journal = self.grid, utils.journal
+        adopted = []
+        held = 0
+        for entry in journal.by_strategy(self.name):
+            if entry.get("type") != "limit" or entry.get("status") != PLACED or entry.get("price") is None:
+                continue
+            i = grid.level_of(self.scale.px(entry["price"]))
+            if i is None:
+                continue
+            order = entry.get("order") or {}
+            if order.get("status") == "open":
+                grid.state[i] = BUY if entry["side"] == "buy" else SELL
+                grid.orders[i] = entry["client_id"]
+                adopted.append(i)
+            elif entry.get("hold") and filled_qty(entry) > 0 and not journal.sold(entry) and i + 1 < len(grid):
+                h = self.hold(i + 1, entry["client_id"], self.scale.qty(filled_qty(entry)))
+                h.client_id = h.client_id or entry.get("sold_by")  # та же продажа, если она не дошла до журнала
+                held += 1
+        for i in adopted:
+            await self.settle(i)
+        if adopted or held:
+            logger.info(f"🔁 Grid {self.name}: подхвачено из журнала ордеров {len(adopted)}, "
+                        f"покупок без продажи {held}")
+
+    async def step(self, px: int):
+        grid = self.grid
+        for i in sorted(grid.unsold):
+            await self.sell_held(i)
+
+        # ордера на уровнях, которые прошла цена — по ходу цены: при падении покупка
+        # уровнем выше проверяется раньше, чем на её место встанет продажа купленного ниже
+        last = grid.last_px if grid.last_px is not None else px
+        crossed = grid.crossed(last, px)
+        for i in (reversed(crossed) if px < last else crossed):
+            if grid.state[i] != EMPTY:
+                await self.settle(i)
+        grid.last_px = px
+
+        # окно покупок: GRID_ACTIVE_BUYS уровней ниже цены (на верхнем уровне не покупаем — продать выше негде)
+        top = min(grid.below(px), len(grid) - 1)
+        bottom = max(top - GRID_ACTIVE_BUYS, 0)
+        keep = max(top - 2 * GRID_ACTIVE_BUYS, 0)  # снимаются только покупки ниже — запас от дребезга цены
+        for i in range(grid.window, keep):
+            if grid.state[i] == BUY:
+                await self.cancel(i)
+        grid.window = keep
+        for i in range(top - 1, bottom - 1, -1):  # от ближайшего к цене
+            if grid.state[i] == EMPTY and grid.state[i + 1] != SELL and i + 1 not in grid.unsold:
+                if not await self.place(i, BUY):
+                    break  # отказ (баланс, минимум) повторится и на следующих уровнях
+
+
+@resilient_strategy
+async def grid_job(context):
+    job = context.job
+    data = job.data or {}
+    symbol = data.get("symbol")
+    chat_id = job.chat_id
+
+    price = await market_data.run(get_price, symbol)
+    scale = await scale_for(symbol)
+    grid = data.get("grid")
+    run = _GridRun(grid, symbol, job.name, scale)
+    if price is None:
+        run.events.append(f"❌ Нет цены для {symbol}")
+    else:
+        if grid is None:
+            run.grid = grid = data["grid"] = Grid.build(
+                scale, float(data["low"]), float(data["high"]), int(data["levels"]),
+                data.get("spacing"), float(data["amount"]),
+            )
+            await run.adopt()
+        await run.step(scale.px(price))
+
+    if run.events:
+        msg = f"🕸 Grid {symbol} @ {price}:\n" + "\n".join(run.events)
+        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("🛑 Стоп", callback_data=f"STOP:{job.name}")]])
+        try:
+            await context.bot.send_message(chat_id, msg, reply_markup=keyboard)
+        except Exception as e:
+            logger.warning(f"Не удалось отправить сообщение в grid_job: {e}")
+
+    # === Адаптивная корректировка интервала ===
+    from load_manager import adapt_job_interval
+    await adapt_job_interval(job)
+
+
+# --- Снятие ордеров при остановке ---
+async def _cancel_all(symbol: str, grid: Grid):
+    for i in grid.resting():
+        try:
+            await orders.run(cancel_order, symbol, grid.orders[i])
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось снять ордер сетки {grid.orders[i]}: {e}")
+        grid.state[i] = EMPTY
+        grid.orders[i] = None
+
+
+def cancel_grid_orders(record):
+    """Обработчик registry.on_removed: снимает лимитные ордера остановленной сетки."""
+    if record.type != "grid" or record.job is None:
+        return
+    grid = (record.job.data or {}).get("grid")
+    if grid is None or not grid.resting().size:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        logger.warning(f"⚠️ Ордера сетки {record.id} не сняты: нет event loop")
+        return
+    supervisor.spawn(_cancel_all(record.symbol, grid))
+
+
+async def start_grid_strategy(update, context, symbol, amount, low, high, levels, spacing, interval):
+    """Запуск сеточной стратегии. Возвращает True при успешном старте."""
+    chat_id = update.effective_chat.id
+
+    # === 1️⃣ Проверка параметров ===
+    try:
+        cfg = GridConfig(symbol=symbol, amount=amount, low=low, high=high, levels=levels,
+                         spacing=spacing, interval=interval)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Неверные параметры: {e}", reply_markup=get_main_menu())
+        return False
+    if float(amount) * float(low) < float(MIN_ORDER_USD):
+        await update.message.reply_text(
+            f"❌ Ордер на нижнем уровне {amount} × {low} меньше минимума {MIN_ORDER_USD} USDT",
+            reply_markup=get_main_menu(),
+        )
+        return False
+
+    # === 2️⃣ Создание ключа стратегии ===
+    job_key = make_job_key("grid", symbol, amount=amount, low=low, high=high, levels=levels,
+                           spacing=cfg.spacing, interval=interval)
+
+    # === 3️⃣ Проверка дубликатов ===
+    if registry.get(chat_id, job_key) is not None:
+        await update.message.reply_text(f"⚠️ Уже запущено: {job_key}", reply_markup=get_main_menu())
+        return False
+
+    # === 4️⃣ Проверка лимита стратегий ===
+    if not registry.has_room(chat_id):
+        await update.message.reply_text("⚠️ Лимит активных стратегий достигнут.", reply_markup=get_main_menu())
+        return False
+
+    # === 5️⃣ Проверка баланса: покупки всего окна по текущей цене (уровни окна ниже неё) ===
+    ok, reason = await account.run(has_enough_balance, symbol, "buy",
+                                   float(amount) * min(GRID_ACTIVE_BUYS, levels - 1))
+    if not ok:
+        await update.message.reply_text(f"❌ Запуск невозможен: {reason}", reply_markup=get_main_menu())
+        return False
+
+    # === 6️⃣ Добавление задачи (первый запуск — сразу: выставить сетку) ===
+    job = context.job_queue.run_repeating(
+        grid_job,
+        interval * 60,
+        first=0,
+        chat_id=chat_id,
+        name=job_key,
+        data={"symbol": symbol, "amount": amount, "low": low, "high": high, "levels": levels, "spacing": cfg.spacing}
+    )
+
+    # === 7️⃣ Регистрация (реестр сам сохраняет стратегию в файл) ===
+    record = StrategyRecord(chat_id, job_key, "grid", symbol,
+                            {"amount": amount, "low": low, "high": high, "levels": levels,
+                             "spacing": cfg.spacing, "interval": interval}, job)
+    if not registry.add(record):
+        job.schedule_removal()  # параллельный запуск успел раньше
+        await update.message.reply_text(f"⚠️ Уже запущено: {job_key}", reply_markup=get_main_menu())
+        return False
+
+    # === 8️⃣ Подтверждение ===
+    await update.message.reply_text(
+        f"🕸 Grid-бот запущен для {symbol}\n"
+        f"Уровней {levels} ({cfg.spacing}) в {low}-{high} / Объём на уровень {amount}\n"
+        f"Покупок в окне: {GRID_ACTIVE_BUYS} / Интервал: {interval} мин.",
+        reply_markup=get_main_menu()
+    )
+    logger.info(f"✅ Grid-стратегия {job_key} запущена для {chat_id}")
+    return True
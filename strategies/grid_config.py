@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
+from decimal import Decimal
+from typing import Literal
+
+from constants import GRID_MAX_LEVELS
+
+ARITHMETIC = "arithmetic"   # равный шаг в цене
+GEOMETRIC = "geometric"     # равный шаг в процентах
+
+
+class GridConfig(BaseModel):
+    symbol: str = Field(..., description="Пара, например BTC/USDT")
+    amount: Decimal = Field(..., gt=Decimal("0"), description="Объём ордера на одном уровне")
+    low: float = Field(..., gt=0, description="Нижний уровень сетки")
+    high: float = Field(..., gt=0, description="Верхний уровень сетки")
+    levels: int = Field(..., ge=2, le=GRID_MAX_LEVELS, description="Число уровней")
+    spacing: Literal["arithmetic", "geometric"] = Field(ARITHMETIC, description="Шаг сетки")
+    interval: int = Field(..., gt=0, le=1440, description="Интервал проверки в минутах")
+
+    @field_validator("symbol")
+    @classmethod
+    def normalize_symbol(cls, v: str) -> str:
+        return v.strip().upper().replace(" ", "")
+
+    @field_validator("high")
+    @classmethod
+    def check_range(cls, v, info: ValidationInfo):
+        low = info.data.get("low")
+        if low and v <= low:
+            raise ValueError("high должен быть больше low")
+        return v
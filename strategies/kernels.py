@@ -0,0 +1,88 @@
+# strategies/kernels.py
+"""
+Решения стратегий Percent, Range и DCA — чистые функции над массивами NumPy.
+
+На вход — одна цена пары и параметры всех стратегий этой пары (по элементу на
+стратегию), на выход — код решения для каждой: HOLD, BUY, SELL или SMALL (ордер
+меньше минимума). Функции ничего не читают и не меняют вне аргументов: цену, баланс,
+ордера и сообщения берёт на себя вызывающий (strategies/batch.py), и только для тех
+немногих стратегий, которым есть что делать.
+
+Объёмы и цены — целые в единицах шагов пары (fixed.Scale.qty_array / px_array),
+поэтому решения совпадают с поэлементной проверкой qty · px < минимум без Decimal.
+
+percent_one / band_one / dca_one — те же правила для одной стратегии без массивов:
+на пакетах из нескольких стратегий накладные расходы NumPy больше самой работы.
+Решения у обеих форм одинаковые.
+"""
+import math
+
+import numpy as np
+
+HOLD = 0
+BUY = 1
+SELL = -1
+SMALL = 2   # объём × цена меньше минимальной суммы ордера
+
+_NEVER = np.iinfo(np.int64).max
+
+
+def min_qty(px: int, min_cost: int) -> int:
+    """Наименьший объём (в единицах), при котором qty · px >= min_cost: ceil(min_cost / px)."""
+    if min_cost <= 0:
+        return 0
+    if px <= 0:
+        return _NEVER
+    return -(-min_cost // px)
+
+
+def percent(price: float, base_price: np.ndarray, step: np.ndarray, qty: np.ndarray,
+            floor: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Percent: сделка при |Δ| >= step процентов от base_price (ниже — покупка, выше —
+    продажа). Возвращает (решения, Δ в процентах). NaN в base_price — первый запуск:
+    базой становится текущая цена.
+    """
+    base = np.where(np.isnan(base_price), price, base_price)
+    with np.errstate(divide="ignore", invalid="ignore"):  # база 0 — ±inf / NaN, как в percent_one
+        diff = (price - base) / base * 100
+    side = np.where(diff < 0, BUY, SELL)
+    decision = np.where(np.abs(diff) >= step, np.where(qty < floor, SMALL, side), HOLD)
+    return decision.astype(np.int8), diff
+
+
+def band(px: int, low: np.ndarray, high: np.ndarray, qty: np.ndarray, floor: int) -> np.ndarray:
+    """Range: покупка при px <= low, продажа при px >= high (всё в единицах tick)."""
+    side = np.where(px <= low, BUY, np.where(px >= high, SELL, HOLD))
+    return np.where(qty < floor, SMALL, side).astype(np.int8)
+
+
+def dca(qty: np.ndarray, floor: int) -> np.ndarray:
+    """DCA: покупка на каждом запуске."""
+    return np.where(qty < floor, SMALL, BUY).astype(np.int8)
+
+
+def percent_one(price: float, base_price: float, step: float, qty: int, floor: int) -> tuple[int, float]:
+    """percent для одной стратегии; NaN в base_price — первый запуск."""
+    base = price if base_price != base_price else base_price
+    try:
+        diff = (price - base) / base * 100
+    except ZeroDivisionError:  # как деление в NumPy: ±inf, 0/0 — NaN
+        diff = math.copysign(math.inf, price) if price else math.nan
+    if not abs(diff) >= step:
+        return HOLD, diff
+    if qty < floor:
+        return SMALL, diff
+    return (BUY if diff < 0 else SELL), diff
+
+
+def band_one(px: int, low: int, high: int, qty: int, floor: int) -> int:
+    """band для одной стратегии."""
+    if qty < floor:
+        return SMALL
+    return BUY if px <= low else (SELL if px >= high else HOLD)
+
+
+def dca_one(qty: int, floor: int) -> int:
+    """dca для одной стратегии."""
+    return SMALL if qty < floor else BUY
@@ -1,14 +1,17 @@
 # strategies/range.py
-import asyncio
 from strategies.range_config import RangeConfig
-from decimal import Decimal, InvalidOperation
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from utils import get_price, place_market_order_safe, has_enough_balance, safe_add_strategy
-from state import make_job_key, add_job, get_jobs, remove_job
+from utils import place_market_order_safe, has_enough_balance
+from state import make_job_key
+from strategy_registry import registry, StrategyRecord
 from menus import get_main_menu
 from decorators import resilient_strategy
+from executors import account
+from strategies import kernels
+from strategies.batch import decisions
 from constants import MIN_ORDER_USD
 import logging
+from logging_config import SAMPLE
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +21,6 @@ async def range_job(context):
     job = context.job
     data = job.data or {}
     symbol = data.get("symbol")
-    try:
-        amount = Decimal(str(data.get("amount", 0)))
-    except (InvalidOperation, TypeError):
-        amount = Decimal("0")
-
     try:
         low = float(data.get("low", 0))
         high = float(data.get("high", 0))
@@ -30,44 +28,37 @@ async def range_job(context):
         low, high = 0.0, 0.0
 
     chat_id = job.chat_id
-    price = await asyncio.to_thread(get_price, symbol)
 
-    if price is None:
+    # решение — в пакете пары вместе с остальными стратегиями (strategies/batch.py)
+    decision = await decisions.decide("range", symbol, data)
+    if decision is None:
         msg = f"❌ Нет цены для {symbol}"
     else:
-        try:
-            order_value = amount * Decimal(str(price))
-        except Exception:
-            order_value = Decimal("0")
-
-        if order_value < MIN_ORDER_USD:
-            msg = f"⚠️ Range: пропуск ордера {symbol}: {order_value:.2f} USDT < минимум {MIN_ORDER_USD} USDT"
-            logger.info(msg)
-        elif price <= low:
+        price, scale, qty = decision.price, decision.scale, decision.qty
+
+        if decision.code == kernels.SMALL:
+            msg = (f"⚠️ Range: пропуск ордера {symbol}: {scale.format_cost(decision.order_value, 2)} USDT "
+                   f"< минимум {MIN_ORDER_USD} USDT")
+            logger.info(msg, extra=SAMPLE)
+        elif decision.code == kernels.BUY:
             side = "buy"
-            ok, reason = await asyncio.to_thread(has_enough_balance, symbol, side, float(amount))
+            ok, reason = await account.run(has_enough_balance, symbol, side, scale.qty_float(qty))
             if not ok:
                 msg = f"❌ Range остановлен: {reason}"
-                try:
+                if registry.remove(chat_id, job.name) is None:
                     job.schedule_removal()
-                    remove_job(context.application.user_data.get(chat_id, {}), job.name)
-                except Exception:
-                    logger.warning("Ошибка при остановке range_job.")
             else:
-                await place_market_order_safe(symbol, side, float(amount))
+                await place_market_order_safe(symbol, side, scale.qty_float(qty), strategy=job.name)
                 msg = f"🟢 BUY {symbol} @ {price:.2f} (<= {low})"
-        elif price >= high:
+        elif decision.code == kernels.SELL:
             side = "sell"
-            ok, reason = await asyncio.to_thread(has_enough_balance, symbol, side, float(amount))
+            ok, reason = await account.run(has_enough_balance, symbol, side, scale.qty_float(qty))
             if not ok:
                 msg = f"❌ Range остановлен: {reason}"
-                try:
+                if registry.remove(chat_id, job.name) is None:
                     job.schedule_removal()
-                    remove_job(context.application.user_data.get(chat_id, {}), job.name)
-                except Exception:
-                    logger.warning("Ошибка при остановке range_job.")
             else:
-                await place_market_order_safe(symbol, side, float(amount))
+                await place_market_order_safe(symbol, side, scale.qty_float(qty), strategy=job.name)
                 msg = f"🔴 SELL {symbol} @ {price:.2f} (>= {high})"
         else:
             msg = f"📊 {symbol}: {price:.2f} (диапазон {low}-{high})"
@@ -79,14 +70,13 @@ async def range_job(context):
         logger.warning(f"Не удалось отправить сообщение в range_job: {e}")
 
     # === Адаптивная корректировка интервала ===
-    from load_manager import adaptive_delay
-    job.interval = await adaptive_delay(job.interval)
+    from load_manager import adapt_job_interval
+    await adapt_job_interval(job)
 
 
 async def start_range_strategy(update, context, symbol, amount, low, high, interval):
     """Запуск Range с пользовательским интервалом (в минутах)."""
 
-    from load_manager import register_strategy
     chat_id = update.effective_chat.id
 
     # === 1️⃣ Проверка параметров ===
@@ -100,17 +90,17 @@ async def start_range_strategy(update, context, symbol, amount, low, high, inter
     job_key = make_job_key("range", symbol, amount=amount, low=low, high=high, interval=interval)
 
     # === 3️⃣ Проверка дубликатов ===
-    if job_key in get_jobs(context.user_data):
+    if registry.get(chat_id, job_key) is not None:
         await update.message.reply_text(f"⚠️ Уже запущено: {job_key}", reply_markup=get_main_menu())
         return False
 
     # === 4️⃣ Проверка лимита стратегий ===
-    if not register_strategy(chat_id, job_key):
+    if not registry.has_room(chat_id):
         await update.message.reply_text("⚠️ Лимит активных стратегий достигнут.", reply_markup=get_main_menu())
         return False
 
     # === 5️⃣ Проверка баланса ===
-    ok, reason = await asyncio.to_thread(has_enough_balance, symbol, "buy", amount)
+    ok, reason = await account.run(has_enough_balance, symbol, "buy", amount)
     if not ok:
         await update.message.reply_text(f"❌ Запуск невозможен: {reason}", reply_markup=get_main_menu())
         return False
@@ -123,15 +113,14 @@ async def start_range_strategy(update, context, symbol, amount, low, high, inter
         name=job_key,
         data={"symbol": symbol, "amount": amount, "low": low, "high": high}
     )
-    add_job(context.user_data, job_key, job)
-
-    # === 7️⃣ Сохранение в state ===
-    safe_add_strategy(update, "range", symbol, {
-        "amount": amount,
-        "low": low,
-        "high": high,
-        "interval": interval,
-    })
+
+    # === 7️⃣ Регистрация (реестр сам сохраняет стратегию в файл) ===
+    record = StrategyRecord(chat_id, job_key, "range", symbol,
+                            {"amount": amount, "low": low, "high": high, "interval": interval}, job)
+    if not registry.add(record):
+        job.schedule_removal()  # параллельный запуск успел раньше
+        await update.message.reply_text(f"⚠️ Уже запущено: {job_key}", reply_markup=get_main_menu())
+        return False
 
     # === 8️⃣ Подтверждение ===
     await update.message.reply_text(
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 from decimal import Decimal
 
 class RangeConfig(BaseModel):
@@ -15,8 +15,8 @@ class RangeConfig(BaseModel):
 
     @field_validator("high")
     @classmethod
-    def check_range(cls, v, values):
-        low = values.get("low")
+    def check_range(cls, v, info: ValidationInfo):
+        low = info.data.get("low")
         if low and v <= low:
             raise ValueError("high должен быть больше low")
         return v
@@ -0,0 +1,159 @@
+# strategy_registry.py
+"""
+Реестр запущенных стратегий — единственное место, где бот хранит их в памяти.
+
+Запись (StrategyRecord) — компактный объект со __slots__: пользователь, ключ задачи
+(state.make_job_key, он же job.name), тип, пара, параметры и сама задача. Индексы —
+по ключу (пользователь, ключ), по пользователю, паре и типу, поэтому поиск, список
+стратегий пользователя, остановка и проверка лимита — O(1) (список — O(k) от числа
+его стратегий).
+
+Всё, что должно меняться вместе с реестром (файл стратегий, метрики, состояние
+supervisor), подписывается на события add/remove (on_added / on_removed), а не
+обновляется вручную в каждом обработчике.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from constants import MAX_STRATEGIES_PER_USER
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[int, str]
+
+
+class StrategyRecord:
+    __slots__ = ("user_id", "id", "type", "symbol", "params", "job", "created_at")
+
+    def __init__(self, user_id: int, id: str, type: str, symbol: str, params: Dict[str, Any],
+                 job: Any = None, created_at: float | None = None):
+        self.user_id = user_id
+        self.id = id                  # ключ задачи (make_job_key), уникален в пределах пользователя
+        self.type = type
+        self.symbol = symbol
+        self.params = params
+        self.job = job
+        self.created_at = created_at if created_at is not None else time.time()
+
+    @property
+    def key(self) -> Key:
+        return self.user_id, self.id
+
+    def __repr__(self):
+        return f"StrategyRecord({self.user_id}, {self.id!r})"
+
+
+def _discard(index: Dict[Any, Dict], name, key):
+    bucket = index[name]
+    del bucket[key]
+    if not bucket:
+        del index[name]
+
+
+class StrategyRegistry:
+    def __init__(self, limit: int = MAX_STRATEGIES_PER_USER):
+        self.limit = limit
+        self._by_key: Dict[Key, StrategyRecord] = {}
+        self._by_user: Dict[int, Dict[str, StrategyRecord]] = {}
+        self._by_symbol: Dict[str, Dict[Key, StrategyRecord]] = {}
+        self._by_type: Dict[str, Dict[Key, StrategyRecord]] = {}
+        self._added: List[Callable[[StrategyRecord], None]] = []
+        self._removed: List[Callable[[StrategyRecord], None]] = []
+
+    # --- подписки ---
+    def on_added(self, callback: Callable[[StrategyRecord], None]):
+        if callback not in self._added:
+            self._added.append(callback)
+
+    def on_removed(self, callback: Callable[[StrategyRecord], None]):
+        if callback not in self._removed:
+            self._removed.append(callback)
+
+    def _notify(self, callbacks, record: StrategyRecord):
+        for callback in callbacks:
+            try:
+                callback(record)
+            except Exception:
+                logger.exception(f"Ошибка обработчика реестра для {record}")
+
+    # --- изменения ---
+    def add(self, record: StrategyRecord) -> bool:
+        """False — такая стратегия уже есть или у пользователя нет места."""
+        key = record.key
+        if key in self._by_key or not self.has_room(record.user_id):
+            return False
+        self._by_key[key] = record
+        self._by_user.setdefault(record.user_id, {})[record.id] = record
+        self._by_symbol.setdefault(record.symbol, {})[key] = record
+        self._by_type.setdefault(record.type, {})[key] = record
+        logger.info(f"Добавлена стратегия: {record.id}")
+        self._notify(self._added, record)
+        return True
+
+    def remove(self, user_id: int, id: str) -> StrategyRecord | None:
+        """Убирает стратегию из реестра и снимает её задачу с расписания."""
+        record = self._by_key.pop((user_id, id), None)
+        if record is None:
+            return None
+        _discard(self._by_user, user_id, id)
+        _discard(self._by_symbol, record.symbol, record.key)
+        _discard(self._by_type, record.type, record.key)
+        if record.job is not None:
+            try:
+                record.job.schedule_removal()
+            except Exception as e:
+                logger.warning(f"Ошибка при удалении job {id}: {e}")
+        logger.info(f"Остановлена стратегия: {id}")
+        self._notify(self._removed, record)
+        return record
+
+    def remove_user(self, user_id: int) -> List[StrategyRecord]:
+        return [self.remove(user_id, id) for id in list(self._by_user.get(user_id, ()))]
+
+    # --- чтение ---
+    def get(self, user_id: int, id: str) -> StrategyRecord | None:
+        return self._by_key.get((user_id, id))
+
+    def count(self, user_id: int) -> int:
+        return len(self._by_user.get(user_id, ()))
+
+    def has_room(self, user_id: int) -> bool:
+        return self.count(user_id) < self.limit
+
+    def user(self, user_id: int) -> List[StrategyRecord]:
+        return list(self._by_user.get(user_id, {}).values())
+
+    def symbol(self, symbol: str) -> List[StrategyRecord]:
+        return list(self._by_symbol.get(symbol, {}).values())
+
+    def type(self, type: str) -> List[StrategyRecord]:
+        return list(self._by_type.get(type, {}).values())
+
+    def users(self) -> List[int]:
+        return list(self._by_user)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def __iter__(self) -> Iterator[StrategyRecord]:
+        return iter(list(self._by_key.values()))
+
+    @contextmanager
+    def substituted(self, other: "StrategyRegistry"):
+        """
+        На время блока этот объект работает с содержимым и подписками other
+        (прогоны backtest/replay, нагрузочный тест): импортированный по имени
+        registry остаётся тем же объектом, а реальные стратегии и файл не трогаются.
+        """
+        mine, theirs = dict(vars(self)), dict(vars(other))
+        vars(self).update(theirs)
+        try:
+            yield self
+        finally:
+            vars(other).update({name: getattr(self, name) for name in theirs})
+            vars(self).update(mine)
+
+
+registry = StrategyRegistry()
@@ -0,0 +1,104 @@
+# supervisor.py
+"""
+Здоровье стратегий вне тела задачи.
+
+Запуск стратегии — одна попытка. Ошибки биржи (сеть, API, таймаут запуска) считаются
+в предохранителе стратегии (circuit_breaker.CircuitBreaker): после
+SUPERVISOR_FAILURE_THRESHOLD ошибок подряд он открывается, следующий запуск задачи
+переносится на время паузы, а запуски до него пропускаются. Пауза растёт
+экспоненциально от SUPERVISOR_BACKOFF_BASE до SUPERVISOR_BACKOFF_MAX, со случайным
+разбросом, чтобы стратегии, упавшие из-за одного сбоя, не возвращались все разом.
+Первый запуск после паузы — пробный: успех закрывает предохранитель (стратегия
+возобновлена), ошибка открывает снова с удвоенной паузой.
+
+Состояние есть только у стратегий, которые сейчас сбоят: успешный запуск его удаляет.
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Hashable, Set
+
+from circuit_breaker import CircuitBreaker, OPEN
+from constants import SUPERVISOR_FAILURE_THRESHOLD, SUPERVISOR_BACKOFF_BASE, SUPERVISOR_BACKOFF_MAX
+
+logger = logging.getLogger(__name__)
+
+
+def backoff(trips: int, base: float = SUPERVISOR_BACKOFF_BASE, cap: float = SUPERVISOR_BACKOFF_MAX) -> float:
+    """Пауза после trips-го открытия подряд: base·2^(trips-1), не больше cap, случайно от половины до полной."""
+    ceiling = min(cap, base * 2 ** (trips - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class StrategyHealth:
+    __slots__ = ("breaker", "trips")
+
+    def __init__(self, name: str):
+        self.breaker = CircuitBreaker(name, failure_threshold=SUPERVISOR_FAILURE_THRESHOLD)
+        self.trips = 0          # открытий подряд (растит паузу)
+
+
+class StrategySupervisor:
+    def __init__(self):
+        self._health: Dict[Hashable, StrategyHealth] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def allow(self, key: Hashable) -> bool:
+        """Можно ли запускать стратегию сейчас (после паузы — один пробный запуск)."""
+        health = self._health.get(key)
+        return health is None or health.breaker.allow()
+
+    def retry_in(self, key: Hashable) -> float:
+        health = self._health.get(key)
+        return 0.0 if health is None else health.breaker.retry_in()
+
+    def record_success(self, key: Hashable) -> bool:
+        """Запуск прошёл. True, если стратегия возобновилась после паузы."""
+        health = self._health.pop(key, None)
+        return health is not None and health.trips > 0
+
+    def record_failure(self, key: Hashable) -> float | None:
+        """Ошибка запуска. Возвращает паузу (сек), если предохранитель открылся."""
+        health = self._health.get(key)
+        if health is None:
+            health = self._health[key] = StrategyHealth(str(key))
+        health.breaker.record_failure()
+        if health.breaker.state != OPEN:
+            return None
+        health.trips += 1
+        health.breaker.reset_timeout = backoff(health.trips)
+        return health.breaker.reset_timeout
+
+    def release(self, key: Hashable):
+        """Запуск завершился без вердикта (пропущен, отменён) — пробный запуск не израсходован."""
+        health = self._health.get(key)
+        if health is not None:
+            health.breaker.release()
+
+    def forget(self, key: Hashable):
+        self._health.pop(key, None)
+
+    def spawn(self, coro) -> asyncio.Task:
+        """Фоновая задача, которую не нужно ждать (например, переподключение); её ошибка — в лог."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(_log_failure)
+        return task
+
+
+def _log_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"⚠️ Фоновая задача завершилась ошибкой: {task.exception()}")
+
+
+def postpone(job, seconds: float):
+    """Переносит следующий запуск задачи telegram.ext.Job на seconds секунд вперёд; дальше — по интервалу."""
+    scheduled = getattr(job, "job", None)
+    if scheduled is None:
+        return
+    scheduled.modify(next_run_time=datetime.now(timezone.utc) + timedelta(seconds=seconds))
+
+
+supervisor = StrategySupervisor()
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+import strategies.batch as batch
+from fixed import Scale
+from strategies import kernels
+
+SCALE = Scale.from_steps("0.00001", "0.01", 5.0)
+
+
+def _params(n: int):
+    rnd = random.Random(n)
+    out = [{"amount": rnd.choice([0.00001, 0.0001, 0.001, 0.01]), "step": rnd.choice([0.5, 1.0, 2.0]),
+            "base_price": rnd.choice([None, 60000.0 * rnd.uniform(0.97, 1.03)]),
+            "low": 60000.0 * rnd.uniform(0.97, 1.01), "high": 60000.0 * rnd.uniform(0.99, 1.03)}
+           for _ in range(n)]
+    # испорченные и крайние значения
+    out += [{"amount": "x", "step": 1.0, "base_price": 0.0, "low": 1, "high": 2},
+            {"amount": 0.01, "step": 0.0, "base_price": "bad", "low": 70000.0, "high": 50000.0},
+            {"amount": 0.01, "step": 1.0, "base_price": float("nan"), "low": 60321.17, "high": 60321.17}]
+    return out
+
+
+@pytest.mark.parametrize("kind", ["percent", "range", "dca"])
+@pytest.mark.parametrize("price", [60321.17, 58000.0, 0.0])
+def test_scalar_path_matches_kernels(kind, price):
+    params = _params(200)
+    kernel = batch.evaluate(kind, params, price, SCALE)
+    each = batch._evaluate_each(kind, params, price, SCALE)
+    assert each.codes == kernel.codes
+    assert each.qty == kernel.qty and each.px == kernel.px
+    if kind == "percent":
+        assert [str(d) for d in each.diff] == [str(d) for d in kernel.diff]
+
+
+def test_small_batch_uses_scalar_path(monkeypatch):
+    monkeypatch.setattr(kernels, "percent", None)  # ядро не вызывается
+    decisions = batch.evaluate("percent", [{"amount": 0.001, "step": 0.5, "base_price": 60000.0}], 60321.17, SCALE)
+    assert decisions[0].side == "sell"
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+import exchange.binance as binance
+from exchange.binance import BinanceExchange
+from fixed import Scale
+from exchange.errors import NotExecutedError, RetryableError
+from order_journal import OrderJournal, INTENT, PLACED
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    journal = OrderJournal(tmp_path / "orders.jsonl")
+    monkeypatch.setattr(binance, "journal", journal)
+    return journal
+
+
+def test_timeout_mid_submit_still_records_order(journal):
+    async def main():
+        ex = BinanceExchange()
+        ex._scales["BTCUSDT"] = Scale.from_steps("0.00001", "0.01")
+        sent = []
+
+        async def slow_post(path, params=None, signed=False, retry=False):
+            sent.append(params["newClientOrderId"])
+            await asyncio.sleep(0.2)  # ордер уже на бирже, ответ ещё не пришёл
+            return {"orderId": 1, "clientOrderId": params["newClientOrderId"], "status": "FILLED"}
+
+        ex._post = slow_post
+        with pytest.raises(TimeoutError):
+            async with asyncio.timeout(0.05):  # как в resilient_strategy
+                await ex.place_order("BTC/USDT", "buy", "market", 0.001, client_id="ftb-test-man-1")
+
+        # отмена дождалась ответа биржи: ордер в журнале, а не в INTENT
+        assert sent == ["ftb-test-man-1"]
+        entry = journal.get("ftb-test-man-1")
+        assert entry["status"] == PLACED
+        assert entry["order"]["clientOrderId"] == "ftb-test-man-1"
+        await ex._client.aclose()
+
+    asyncio.run(main())
+
+
+def test_place_order_records_placed(journal):
+    async def main():
+        ex = BinanceExchange()
+        ex._scales["BTCUSDT"] = Scale.from_steps("0.00001", "0.01")
+
+        async def post(path, params=None, signed=False, retry=False):
+            return {"orderId": 2, "clientOrderId": params["newClientOrderId"], "status": "NEW"}
+
+        ex._post = post
+        order = await ex.place_order("BTC/USDT", "buy", "limit", 0.001, 30000.0)
+        assert journal.get(order["clientOrderId"])["status"] == PLACED
+        await ex._client.aclose()
+
+    asyncio.run(main())
+
+
+def test_unknown_outcome_is_not_resent(journal):
+    async def main():
+        ex = BinanceExchange()
+        ex._scales["BTCUSDT"] = Scale.from_steps("0.00001", "0.01")
+        sent = []
+
+        async def post(path, params=None, signed=False, retry=False):
+            sent.append(params["newClientOrderId"])
+            raise RetryableError("POST /api/v3/order", "ReadTimeout")
+
+        async def get_order(symbol, order_id=None, client_id=None):
+            return None  # биржа могла принять ордер, но он ещё не виден
+
+        ex._post, ex.get_order = post, get_order
+        with pytest.raises(RetryableError):
+            await ex.place_order("BTC/USDT", "buy", "market", 0.001, client_id="ftb-test-man-2")
+
+        assert sent == ["ftb-test-man-2"]  # второй POST мог бы создать дубль
+        assert journal.get("ftb-test-man-2")["status"] == INTENT  # решит сверка
+        await ex._client.aclose()
+
+    asyncio.run(main())
+
+
+def test_not_executed_is_resent(journal, monkeypatch):
+    async def main():
+        ex = BinanceExchange()
+        ex._scales["BTCUSDT"] = Scale.from_steps("0.00001", "0.01")
+        sent = []
+
+        async def post(path, params=None, signed=False, retry=False):
+            sent.append(params["newClientOrderId"])
+            if len(sent) == 1:
+                raise NotExecutedError("POST /api/v3/order", "ConnectError")
+            return {"orderId": 3, "clientOrderId": params["newClientOrderId"], "status": "NEW"}
+
+        async def no_sleep(delay):
+            pass
+
+        monkeypatch.setattr(binance.asyncio, "sleep", no_sleep)
+        ex._post = post
+        await ex.place_order("BTC/USDT", "buy", "limit", 0.001, 30000.0, client_id="ftb-test-man-3")
+        assert sent == ["ftb-test-man-3", "ftb-test-man-3"]
+        assert journal.get("ftb-test-man-3")["status"] == PLACED
+        await ex._client.aclose()
+
+    asyncio.run(main())
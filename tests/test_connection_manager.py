@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+
+import ccxt
+
+from connection_manager import ConnectionManager, FAILURE_THRESHOLD
+
+
+class _Manager(ConnectionManager):
+    """Вместо ccxt — счётчик подключений; fail — следующее подключение падает."""
+
+    def __init__(self, fail: bool = False):
+        super().__init__()
+        self.fail = fail
+        self.connects = 0
+
+    def _connect(self):
+        self.connects += 1
+        if self.fail:
+            raise ccxt.NetworkError("down")
+        self.exchange = object()
+        self.connected_at = time.time()
+        self.report_success()
+
+
+def test_reconnect_during_cooldown_when_unhealthy():
+    async def main():
+        manager = _Manager()
+        manager.get()
+        fresh = manager.exchange
+        assert await manager.reconnect() is fresh  # здорово и только что подключено
+        manager.failures = FAILURE_THRESHOLD
+        assert await manager.reconnect() is not fresh
+        assert manager.connects == 2
+
+    asyncio.run(main())
+
+
+def test_failed_reconnect_raises_to_all_waiters():
+    async def main():
+        manager = _Manager()
+        manager.get()
+        manager.failures = FAILURE_THRESHOLD
+        manager.fail = True
+        results = await asyncio.gather(manager.reconnect(), manager.reconnect(), return_exceptions=True)
+        assert all(isinstance(r, ccxt.NetworkError) for r in results)
+        assert manager.connects == 2  # одно общее переподключение
+
+    asyncio.run(main())
+
+
+def test_failure_threshold_from_thread_starts_reconnect():
+    async def main():
+        manager = _Manager()
+        manager.get()
+        manager.attach(asyncio.get_running_loop())
+
+        def worker():
+            for _ in range(FAILURE_THRESHOLD):
+                manager.report_failure(ccxt.NetworkError("timeout"))
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0)
+        assert manager._task is not None
+        await manager._task
+        assert manager.connects == 2
+        assert manager.healthy
+
+    asyncio.run(main())
+
+
+def test_non_network_errors_do_not_count():
+    manager = _Manager()
+    manager.report_failure(ccxt.InsufficientFunds("no money"))
+    assert manager.failures == 0
+
+
+
+def test_concurrent_failures_are_counted_and_reconnect_once():
+    async def main():
+        manager = _Manager()
+        manager.get()
+        manager.attach(asyncio.get_running_loop())
+        started = []
+        real_start = manager._start_reconnect
+
+        def start():
+            started.append(1)
+            return real_start()
+
+        manager._start_reconnect = start
+
+        def worker():
+            for _ in range(500):
+                manager.report_failure(ccxt.NetworkError("timeout"))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert manager.failures == 8 * 500  # ни одна ошибка не потеряна
+        await asyncio.sleep(0)
+        assert len(started) == 1  # одно переподключение на всю серию
+        await manager._task
+        await asyncio.sleep(0)
+        assert manager.healthy and not manager._reconnecting
+
+    asyncio.run(main())
+
+
+def test_failure_past_threshold_still_reconnects():
+    async def main():
+        manager = _Manager()
+        manager.get()
+        manager.attach(asyncio.get_running_loop())
+        manager.failures = FAILURE_THRESHOLD + 2  # порог «проскочили»
+        manager.report_failure(ccxt.NetworkError("timeout"))
+        await asyncio.sleep(0)
+        await manager._task
+        assert manager.connects == 2
+
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+import fixed
+from fixed import Scale, format_units, to_units
+
+
+def test_cached_conversions_match_direct():
+    scale = Scale.from_steps("0.00001", "0.01", 5.0)
+    for _ in range(2):  # второй проход — из кэша
+        assert scale.qty(0.29) == 29000
+        assert scale.qty(0.000017) == 1  # вниз до lot
+        assert scale.cost(5.0) == to_units(5.0, scale.cost_mult)
+        assert scale.format_qty(scale.qty(0.00123)) == "0.00123"
+        assert scale.format_px(scale.px(60321.17)) == "60321.17"
+    assert scale.format_qty(-1500) == format_units(-1500, 5) == "-0.015"
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(fixed, "_CACHE_SIZE", 4)
+    scale = Scale.from_steps("0.001", "0.01")
+    for i in range(10):
+        assert scale.qty(i / 1000) == i
+    assert len(scale._qty) <= 4
@@ -0,0 +1,160 @@
+import asyncio
+import itertools
+
+import pytest
+
+import strategies.grid as grid_module
+import utils
+from fixed import Scale
+from order_journal import OrderJournal
+from strategies.grid import Grid, _GridRun, BUY, SELL, EMPTY
+
+SYMBOL = "BTC/USDT"
+NAME = "grid:1:BTC/USDT"
+SCALE = Scale.from_steps("0.00001", "0.01")
+
+
+class FakeBook:
+    """Лимитные ордера вместо биржи; ответ без clientOrderId, как у некоторых адаптеров."""
+
+    def __init__(self, journal: OrderJournal):
+        self.journal = journal
+        self.orders = {}
+        self._ids = itertools.count(1)
+
+    async def place_limit_order_safe(self, symbol, side, amount, price, strategy=None, client_id=None, hold=False):
+        self.journal.record_intent(client_id, symbol, side, "limit", amount, price, strategy, hold)
+        order = {"id": str(next(self._ids)), "side": side, "price": price, "amount": amount,
+                 "filled": 0.0, "status": "open"}
+        self.orders[client_id] = order
+        self.journal.record_placed(client_id, dict(order))
+        return dict(order)
+
+    def lookup_order(self, symbol, client_id):
+        order = self.orders.get(client_id)
+        return dict(order) if order else None
+
+    def cancel_order(self, symbol, client_id):
+        order = self.orders.get(client_id)
+        if order is None or order["status"] != "open":
+            return None
+        order["status"] = "canceled"
+        return dict(order)
+
+    def fill(self, client_id, qty=None):
+        order = self.orders[client_id]
+        order["filled"] = order["amount"] if qty is None else qty
+        if qty is None:
+            order["status"] = "closed"
+
+    def open(self, side):
+        return sorted((o["price"], o["amount"]) for o in self.orders.values()
+                      if o["status"] == "open" and o["side"] == side)
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch):
+    journal = OrderJournal(tmp_path / "orders.jsonl")
+    book = FakeBook(journal)
+    monkeypatch.setattr(utils, "journal", journal)
+    monkeypatch.setattr(grid_module, "place_limit_order_safe", book.place_limit_order_safe)
+    monkeypatch.setattr(grid_module, "lookup_order", book.lookup_order)
+    monkeypatch.setattr(grid_module, "cancel_order", book.cancel_order)
+    monkeypatch.setattr(grid_module, "GRID_ACTIVE_BUYS", 2)
+    return book
+
+
+def _run(grid=None) -> _GridRun:
+    # уровни 100, 110, …, 200; объём 0.01
+    grid = grid or Grid.build(SCALE, 100.0, 200.0, 11, "arithmetic", 0.01)
+    return _GridRun(grid, SYMBOL, NAME, SCALE)
+
+
+def test_level_lookup():
+    grid = Grid.build(SCALE, 100.0, 200.0, 11, "arithmetic", 0.01)
+    assert grid.below(SCALE.px(155.0)) == 6
+    assert grid.level_of(SCALE.px(150.0)) == 5
+    assert grid.level_of(SCALE.px(151.0)) is None
+    assert list(grid.crossed(SCALE.px(155.0), SCALE.px(135.0))) == [4, 5]
+
+
+def test_orders_tracked_by_own_client_id(book):
+    async def main():
+        run = _run()
+        await run.step(SCALE.px(155.0))
+        assert book.open("buy") == [(140.0, 0.01), (150.0, 0.01)]
+        assert run.grid.state[4] == BUY and run.grid.state[5] == BUY
+        assert {run.grid.orders[4], run.grid.orders[5]} == set(book.orders)
+
+    asyncio.run(main())
+
+
+def test_falling_price_fills_every_crossed_buy(book):
+    async def main():
+        run = _run()
+        await run.step(SCALE.px(155.0))
+        for client_id in list(book.orders):
+            book.fill(client_id)
+        await run.step(SCALE.px(135.0))
+        # обе покупки исполнены — обе продажи на уровень выше, ни одна не потеряна
+        assert book.open("sell") == [(150.0, 0.01), (160.0, 0.01)]
+        assert run.grid.state[5] == SELL and run.grid.state[6] == SELL
+        assert not run.grid.unsold
+
+    asyncio.run(main())
+
+
+def test_partially_filled_buy_cancelled_by_window_is_sold(book):
+    async def main():
+        run = _run()
+        await run.step(SCALE.px(155.0))
+        buy_140 = run.grid.orders[4]
+        book.fill(buy_140, 0.004)
+
+        await run.step(SCALE.px(195.0))  # окно ушло вверх: покупки 140 и 150 сняты
+        assert run.grid.state[4] == EMPTY
+        await run.step(SCALE.px(195.0))
+        assert book.open("sell") == [(150.0, 0.004)]
+        assert utils.journal.get(buy_140)["sold_by"] == run.grid.orders[5]
+
+    asyncio.run(main())
+
+
+def test_restart_restores_unsold_and_resting_orders(book):
+    async def main():
+        run = _run()
+        await run.step(SCALE.px(155.0))
+        buy_150 = run.grid.orders[5]
+        book.fill(buy_150)
+        # продажа не прошла проверки (например, баланс) — купленное ждёт в unsold
+        real_place = book.place_limit_order_safe
+
+        async def reject_sells(symbol, side, *args, **kwargs):
+            if side == "sell":
+                raise Exception("недостаточно средств")
+            return await real_place(symbol, side, *args, **kwargs)
+
+        grid_module.place_limit_order_safe = reject_sells
+        await run.step(SCALE.px(145.0))
+        assert run.grid.unsold[6].qty == SCALE.qty(0.01)
+        grid_module.place_limit_order_safe = real_place
+
+        # рестарт: сетка из журнала
+        restarted = _run()
+        await restarted.adopt()
+        assert restarted.grid.state[4] == BUY and restarted.grid.orders[4] == run.grid.orders[4]
+        held = restarted.grid.unsold[6]
+        assert held.qty == SCALE.qty(0.01) and held.buys == [buy_150]
+        assert held.client_id == run.grid.unsold[6].client_id  # та же продажа, без дубля
+
+        await restarted.step(SCALE.px(145.0))
+        assert book.open("sell") == [(160.0, 0.01)]
+        assert not restarted.grid.unsold
+
+        # после выставленной продажи покупка больше не считается непроданной
+        again = _run()
+        await again.adopt()
+        assert not again.grid.unsold
+        assert again.grid.state[6] == SELL
+
+    asyncio.run(main())
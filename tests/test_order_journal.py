@@ -0,0 +1,68 @@
+import json
+
+import order_journal
+from order_journal import OrderJournal, FAILED, INTENT, PLACED
+
+
+def _fill(journal: OrderJournal, n: int, status: str = "closed"):
+    ids = []
+    for i in range(n):
+        cid = journal.new_client_id("dca:1:BTC/USDT")
+        journal.record_intent(cid, "BTC/USDT", "buy", "market", 0.001)
+        journal.record_placed(cid, {"id": str(i), "clientOrderId": cid, "status": status})
+        ids.append(cid)
+    return ids
+
+
+def test_compaction_on_load_keeps_live_and_recent(tmp_path, monkeypatch):
+    monkeypatch.setattr(order_journal, "ORDER_JOURNAL_KEEP_FINISHED", 2)
+    path = tmp_path / "orders.jsonl"
+    journal = OrderJournal(path)
+    done = _fill(journal, 5)
+    open_ids = _fill(journal, 2, status="open")
+    journal.record_intent("ftb-x-man-pending", "BTC/USDT", "buy", "market", 0.001)
+    journal.record_intent("ftb-x-man-failed", "BTC/USDT", "buy", "market", 0.001)
+    journal.record_failed("ftb-x-man-failed", "rejected")
+
+    reloaded = OrderJournal(path)
+    kept = set(reloaded._orders)
+    assert kept == {done[-1], "ftb-x-man-failed", *open_ids, "ftb-x-man-pending"}
+    assert reloaded.get("ftb-x-man-pending")["status"] == INTENT
+    assert reloaded.get(open_ids[0])["status"] == PLACED
+    assert reloaded.get("ftb-x-man-failed")["status"] == FAILED
+    assert [e["client_id"] for e in reloaded.pending()] == ["ftb-x-man-pending"]
+
+    # переписанный файл — по строке на ордер, и читается так же
+    assert len(path.read_text(encoding="utf-8").splitlines()) == len(kept)
+    assert set(OrderJournal(path)._orders) == kept
+
+
+def test_compaction_while_running(tmp_path, monkeypatch):
+    monkeypatch.setattr(order_journal, "ORDER_JOURNAL_KEEP_FINISHED", 3)
+    monkeypatch.setattr(order_journal, "ORDER_JOURNAL_COMPACT_EVERY", 10)
+    journal = OrderJournal(tmp_path / "orders.jsonl")
+    ids = _fill(journal, 25)
+    assert len(journal._orders) < 10
+    assert ids[-1] in journal._orders
+
+
+def test_compaction_keeps_full_order_of_live_orders(tmp_path, monkeypatch):
+    monkeypatch.setattr(order_journal, "ORDER_JOURNAL_KEEP_FINISHED", 0)
+    path = tmp_path / "orders.jsonl"
+    journal = OrderJournal(path)
+    _fill(journal, 3)
+    cid = journal.new_client_id("grid:1:BTC/USDT")
+    journal.record_intent(cid, "BTC/USDT", "buy", "limit", 0.01, 30000.0, "grid:1:BTC/USDT", hold=True)
+    order = {"id": "77", "clientOrderId": cid, "status": "open", "price": 30000.0, "amount": 0.01,
+             "filled": 0.004, "info": {"orderListId": -1, "fills": [{"qty": "0.004"}]}}
+    journal.record_placed(cid, order)
+
+    for _ in range(2):  # сжатие при загрузке, затем повторная загрузка сжатого файла
+        reloaded = OrderJournal(path)
+        assert set(reloaded._orders) == {cid}
+        entry = reloaded.get(cid)
+        assert entry["hold"] and entry["strategy"] == "grid:1:BTC/USDT" and entry["price"] == 30000.0
+        assert {k: entry["order"][k] for k in ("id", "status", "price", "amount", "filled")} == \
+            {"id": "77", "status": "open", "price": 30000.0, "amount": 0.01, "filled": 0.004}
+        saved = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert saved == [{**saved[0], "order": order}]  # полный ответ биржи остался в файле
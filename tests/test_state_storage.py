@@ -0,0 +1,38 @@
+import multiprocessing
+
+import pytest
+
+from storage.state_storage import JsonStateStorage, StateCorruptError
+
+
+def _add_keys(path, prefix: str, count: int, barrier):
+    storage = JsonStateStorage(path)
+    barrier.wait()  # все процессы пишут одновременно
+    for i in range(count):
+        storage.update(lambda data: data.setdefault("1", {}).__setitem__(f"{prefix}{i}", {"type": "dca"}))
+
+
+def test_corrupt_file_is_not_overwritten(tmp_path):
+    path = tmp_path / "strategies.json"
+    path.write_bytes(b'{"1": {"a": {"type": "percent"}}')  # обрезанная запись
+    storage = JsonStateStorage(path)
+
+    with pytest.raises(StateCorruptError):
+        storage.load()
+    with pytest.raises(StateCorruptError):
+        storage.update(lambda data: data.setdefault("2", {}))
+    assert path.read_bytes() == b'{"1": {"a": {"type": "percent"}}'
+
+    storage.save({"1": {}})  # ручное восстановление (ftb_cli restore)
+    assert storage.load() == {"1": {}}
+
+
+def test_updates_from_processes_are_not_lost(tmp_path):
+    path = tmp_path / "strategies.json"
+    barrier = multiprocessing.Barrier(4)
+    workers = [multiprocessing.Process(target=_add_keys, args=(path, p, 100, barrier)) for p in "abcd"]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert len(JsonStateStorage(path).load()["1"]) == 400
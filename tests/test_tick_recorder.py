@@ -0,0 +1,49 @@
+import numpy as np
+
+from tick_recorder import TickReader, TickRecorder, _path, _map, _COUNT
+
+
+def _write(recorder: TickRecorder, symbol: str, start: int, n: int):
+    for ts in range(start, start + n):
+        recorder.record(symbol, ts, ts + 0.1, ts + 0.2, float(ts))
+
+
+def test_read_before_wraparound(tmp_path):
+    recorder = TickRecorder(root=tmp_path, capacity=8)
+    _write(recorder, "BTC/USDT", 0, 5)
+
+    data, end = TickReader("BTC/USDT", tmp_path).read()
+    assert end == 5
+    assert data["ts"].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_read_after_wraparound_skips_slot_being_written(tmp_path):
+    recorder = TickRecorder(root=tmp_path, capacity=8)
+    _write(recorder, "BTC/USDT", 0, 20)
+
+    reader = TickReader("BTC/USDT", tmp_path)
+    data, end = reader.read()
+    # полное кольцо: самый старый слот (20 % 8) — следующий на запись, он не читается
+    assert end == 20
+    assert data["ts"].tolist() == list(range(13, 20))
+
+    # продолжение чтения с end после новых записей
+    _write(recorder, "BTC/USDT", 20, 3)
+    data, end = reader.read(end)
+    assert end == 23
+    assert data["ts"].tolist() == [20, 21, 22]
+
+
+def test_read_ignores_torn_record(tmp_path):
+    recorder = TickRecorder(root=tmp_path, capacity=4)
+    _write(recorder, "ETH/USDT", 0, 4)
+
+    # писатель затёр слот count % capacity, но счётчик ещё не увеличил
+    raw, header, records = _map(_path("ETH/USDT", tmp_path), "r+")
+    n = int(header[_COUNT])
+    records[n % len(records)] = (-1, np.nan, np.nan, np.nan)
+    raw.flush()
+
+    data, end = TickReader("ETH/USDT", tmp_path).read()
+    assert end == 4
+    assert data["ts"].tolist() == [1, 2, 3]
@@ -0,0 +1,142 @@
+# tick_recorder.py
+"""
+Запись всех увиденных цен в кольцевые файлы (np.memmap), по файлу на символ.
+
+data/ticks/<BASE_QUOTE>.ring:
+    заголовок 64 байта: magic, ёмкость (записей), счётчик записанных (растёт всегда);
+    дальше ёмкость × 32 байта: ts (мс), bid, ask, last.
+
+Запись — одно присваивание в memmap и инкремент счётчика (порядка микросекунды),
+без системных вызовов: страницы сбрасывает на диск ОС. Новая запись затирает самую
+старую. Счётчик обновляется после записи, поэтому читатель в другом процессе видит
+только готовые записи, а затёртые во время чтения — отбрасывает (TickReader.read).
+Слот count % capacity в любой момент может переписываться, поэтому из полного кольца
+читается не больше capacity - 1 записей.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from constants import TICK_RING_CAPACITY
+
+logger = logging.getLogger(__name__)
+
+TICKS_DIR = Path("data/ticks")
+MAGIC = 0x314B434954425446  # b"FTBTICK1" little-endian
+HEADER_BYTES = 64
+TICK_DTYPE = np.dtype([("ts", "<i8"), ("bid", "<f8"), ("ask", "<f8"), ("last", "<f8")])
+
+# индексы в заголовке (uint64)
+_MAGIC, _CAPACITY, _COUNT = 0, 1, 2
+
+
+def _path(symbol: str, root: Path) -> Path:
+    return root / f"{symbol.replace('/', '_').upper()}.ring"
+
+
+def _map(path: Path, mode: str) -> Tuple[np.memmap, np.ndarray, np.ndarray]:
+    raw = np.memmap(path, dtype=np.uint8, mode=mode)
+    header = raw[:HEADER_BYTES].view(np.uint64)
+    if int(header[_MAGIC]) != MAGIC:
+        raise ValueError(f"{path}: не файл тиков")
+    records = raw[HEADER_BYTES:HEADER_BYTES + int(header[_CAPACITY]) * TICK_DTYPE.itemsize].view(TICK_DTYPE)
+    return raw, header, records
+
+
+class _Ring:
+    __slots__ = ("raw", "header", "records", "capacity", "lock")
+
+    def __init__(self, path: Path, capacity: int):
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as f:
+                head = np.zeros(HEADER_BYTES // 8, dtype=np.uint64)
+                head[_MAGIC], head[_CAPACITY] = MAGIC, capacity
+                f.write(head.tobytes())
+                f.truncate(HEADER_BYTES + capacity * TICK_DTYPE.itemsize)
+        self.raw, self.header, self.records = _map(path, "r+")
+        self.capacity = len(self.records)
+        self.lock = threading.Lock()
+
+    def append(self, ts: int, bid: float, ask: float, last: float):
+        with self.lock:
+            n = int(self.header[_COUNT])
+            self.records[n % self.capacity] = (ts, bid, ask, last)
+            self.header[_COUNT] = n + 1
+
+
+class TickRecorder:
+    def __init__(self, root: Path = TICKS_DIR, capacity: int = TICK_RING_CAPACITY, enabled: bool = True):
+        self.root = root
+        self.capacity = capacity
+        self.enabled = enabled
+        self._rings: Dict[str, _Ring] = {}
+        self._lock = threading.Lock()
+
+    def _ring(self, symbol: str) -> _Ring:
+        ring = self._rings.get(symbol)
+        if ring is None:
+            with self._lock:
+                ring = self._rings.get(symbol)
+                if ring is None:
+                    ring = self._rings[symbol] = _Ring(_path(symbol, self.root), self.capacity)
+        return ring
+
+    def record(self, symbol: str, ts: int, bid: float | None, ask: float | None, last: float | None):
+        if not self.enabled:
+            return
+        try:
+            self._ring(symbol).append(
+                ts,
+                np.nan if bid is None else bid,
+                np.nan if ask is None else ask,
+                np.nan if last is None else last,
+            )
+        except Exception as e:
+            # запись тиков не должна ломать получение цены — отключаемся до рестарта
+            self.enabled = False
+            logger.error(f"❌ Запись тиков отключена: {e}")
+
+    def record_ticker(self, symbol: str, ticker: Dict[str, Any]):
+        """Тикер в формате ccxt (timestamp, bid, ask, last)."""
+        self.record(symbol, ticker.get("timestamp") or 0, ticker.get("bid"), ticker.get("ask"), ticker.get("last"))
+
+
+class TickReader:
+    """Чтение кольца из любого процесса (только чтение, без блокировок)."""
+
+    def __init__(self, symbol: str, root: Path = TICKS_DIR):
+        self.raw, self.header, self.records = _map(_path(symbol, root), "r")
+        self.capacity = len(self.records)
+
+    @property
+    def count(self) -> int:
+        """Сколько записей сделано за всё время (индекс следующей записи)."""
+        return int(self.header[_COUNT])
+
+    def read(self, since: int = 0) -> Tuple[np.ndarray, int]:
+        """
+        Записи с порядковым номером >= since в хронологическом порядке (копия) и номер,
+        с которого продолжать чтение. Затёртые к моменту чтения записи пропускаются,
+        как и самая старая запись полного кольца: её слот писатель может переписывать прямо сейчас.
+        """
+        end = self.count
+        start = max(since, end - self.capacity, 0)
+        data = self.records[np.arange(start, end) % self.capacity]
+        # писатель мог обогнать нас на круг во время копирования — отбрасываем затёртое
+        # и слот count % capacity, который он, возможно, пишет (счётчик ещё не увеличен)
+        overwritten = self.count + 1 - self.capacity - start
+        if overwritten > 0:
+            data = data[overwritten:]
+        return data, end
+
+    def latest(self, n: int) -> np.ndarray:
+        return self.read(max(self.count - n, 0))[0]
+
+
+def read_ticks(symbol: str, root: Path = TICKS_DIR) -> np.ndarray:
+    """Все сохранённые тики символа (TICK_DTYPE), от старых к новым."""
+    return TickReader(symbol, root).read()[0]
@@ -1,15 +1,22 @@
 #utils.py
 import logging
 import asyncio
-import ccxt
 import time
-from typing import Dict, Any, Tuple, List
-from state_manager import load_strategies, save_strategies
-from settings import settings, EXCHANGE_NAME, USE_TESTNET
+import ccxt
+import contextvars
+import deadline
+from typing import Dict, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
 from load_manager import record_api_call
-from constants import MIN_ORDER_USD
-
-exchange = None  # глобальная переменная
+import metrics
+import executors
+from singleflight import ThreadSingleFlight
+from connection_manager import connection
+from order_journal import journal, INTENT, PLACED
+from fixed import Scale
+from tick_recorder import TickRecorder
+from settings import settings
+from constants import MAX_PARALLEL_PRICE_REQUESTS
 
 
 logger = logging.getLogger(__name__)
@@ -19,167 +26,57 @@ COMMON_QUOTES = ["USDT", "BTC", "ETH", "BUSD", "USDC", "USD", "EUR"]
 # Локи по символам (чтобы не было одновременных ордеров на одной паре)
 _order_locks: Dict[str, asyncio.Lock] = {}
 
+# Шаги объёма и цены по символам (fixed.Scale), из markets биржи
+_scales: Dict[str, Scale] = {}
 
+# Поштучные запросы цены (запасной путь get_prices): один пул на процесс, общий лимит
+# MAX_PARALLEL_PRICE_REQUESTS. Не полоса executors.market_data: get_prices уже выполняется
+# в её потоке и, ожидая свои же задачи в ней, мог бы занять все потоки полосы.
+_price_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_PRICE_REQUESTS, thread_name_prefix="ftb-prices")
 
-# utils.py
-import logging
-import asyncio
-import ccxt
-import time
-from typing import Dict, Any, Tuple, List
-from state_manager import load_strategies, save_strategies
+# Одинаковые одновременные запросы чтения (тикер, баланс) делят один вызов ccxt
+_reads = ThreadSingleFlight("ccxt")
 
-exchange = None
-logger = logging.getLogger(__name__)
-
-COMMON_QUOTES = ["USDT", "BTC", "ETH", "BUSD", "USDC", "USD", "EUR"]
-_order_locks: Dict[str, asyncio.Lock] = {}
+# Все полученные тикеры пишутся в кольцевые файлы data/ticks (см. tick_recorder)
+ticks = TickRecorder(enabled=settings.RECORD_TICKS)
 
 
 def get_exchange(force_reconnect: bool = False):
     """
-    Создаёт или восстанавливает подключение к бирже (например Binance).
-    При обрыве связи — делает повтор через 10 секунд.
+    Возвращает подключение к бирже (см. connection_manager).
+    Живость не проверяется на каждом вызове — о ней судят по результатам обычных запросов.
+    Блокирующая функция: из async-кода вызывать через asyncio.to_thread.
     """
-    global exchange
-
-    # ✅ Не пересоздаём соединение, если уже живое
-    if not force_reconnect and exchange and hasattr(exchange, "markets") and exchange.markets:
-        try:
-            # Проверка соединения лёгким запросом
-            exchange.fetch_time()
-            return exchange
-        except Exception:
-            logging.warning("⚠️ Старое соединение мертво, переподключение...")
-
-    while True:
-        try:
-            logging.info("🔄 Подключение к бирже...")
-
-            exchange_class = getattr(ccxt, EXCHANGE_NAME)
-            exchange = exchange_class({
-                "apiKey": settings.api_key,
-                "secret": settings.api_secret,
-                "enableRateLimit": True,
-                "options": {
-                    "defaultType": "spot",
-                    "adjustForTimeDifference": True
-                }
-            })
-
-            if USE_TESTNET and hasattr(exchange, "set_sandbox_mode"):
-                exchange.set_sandbox_mode(True)
-                logging.info("🧪 Используется тестовая сеть Binance (Testnet).")
-
-            exchange.check_required_credentials()
-            exchange.load_markets()
-            exchange.fetch_time()  # пробное обращение
-            logging.info("✅ Успешное подключение к бирже.")
-            return exchange
-
-        except ccxt.NetworkError as e:
-            logging.warning(f"⚠️ Ошибка сети: {e}. Повтор через 10 сек...")
-        except ccxt.AuthenticationError:
-            logging.error("❌ Ошибка API-ключей. Проверь config.py.")
-            raise
-        except Exception as e:
-            logging.error(f"❌ Неизвестная ошибка подключения: {e}")
-
-        time.sleep(10)
-
+    if force_reconnect:
+        return connection.reconnect_blocking()
+    return connection.get()
 
 
 async def reconnect_exchange(delay: int = 10):
     """
     Асинхронное и безопасное переподключение к бирже.
-    Не блокирует event loop и не мешает работе других задач.
+    Одновременно идёт не больше одного переподключения — остальные ждут его результат.
     """
-    global exchange
-    logging.warning(f"♻️ Переподключение к бирже через {delay} секунд...")
-    await asyncio.sleep(delay)  # не блокирует
-
-    try:
-        new_exchange = await asyncio.to_thread(get_exchange, True)  # форсируем reconnect
-        if new_exchange:
-            exchange = new_exchange
-            logging.info("✅ Переподключение успешно.")
-    except Exception as e:
-        logging.warning(f"⚠️ Ошибка переподключения: {e}")
-
+    return await connection.reconnect(delay)
 
 
-
-
-async def reconnect_exchange(delay: int = 10):
+def _call(fn, *args):
     """
-    Асинхронное и безопасное переподключение к бирже.
-    Не блокирует event loop и не мешает работе других задач.
+    Вызов ccxt с учётом результата в здоровье соединения (и в метриках).
+    Запрос ccxt не прервать на середине, поэтому дедлайн запуска проверяется до него.
     """
-    global exchange
-    logging.warning(f"♻️ Переподключение к бирже через {delay} секунд...")
-    await asyncio.sleep(delay)  # не блокирует
-
+    deadline.check(fn.__name__)
+    started = time.perf_counter()
     try:
-        new_exchange = await asyncio.to_thread(get_exchange)  # выполняет в отдельном потоке
-        if new_exchange:
-            exchange = new_exchange
-            logging.info("✅ Переподключение успешно.")
-    except Exception as e:
-        logging.warning(f"⚠️ Ошибка переподключения: {e}")
-
-
-# --- Безопасное добавление стратегии ---
-def safe_add_strategy(update_or_user, strategy_type, symbol, params):
-    """
-    Безопасно добавляет стратегию (через state_manager),
-    проверяя дубликаты и сохраняя в общем формате.
-    """
-    from state_manager import load_strategies, save_strategies
-    import datetime
-
-    try:
-        if hasattr(update_or_user, "effective_chat"):
-            chat_id = str(update_or_user.effective_chat.id)
-        elif isinstance(update_or_user, dict):
-            chat_id = str(update_or_user.get("chat_id", "unknown"))
-        else:
-            chat_id = "unknown"
-
-        all_data = load_strategies()
-        if chat_id not in all_data:
-            all_data[chat_id] = {}
-
-        # Проверяем дубликаты
-        exists = any(
-            s.get("symbol") == symbol and s.get("type") == strategy_type
-            for s in all_data[chat_id].values()
-        )
-        if exists:
-            logger.warning(f"[safe_add_strategy] ⚠️ Стратегия {strategy_type}:{symbol} уже существует — пропуск.")
-            return False
-
-        # Генерация ID
-        strategy_id = f"{strategy_type}_{symbol}_{datetime.datetime.now().strftime('%Y%m%dT%H%M%S%f')}"
-
-        all_data[chat_id][strategy_id] = {
-            "type": strategy_type,
-            "symbol": symbol,
-            "parameters": params,
-            "created_at": datetime.datetime.now().isoformat()
-        }
-
-        save_strategies(all_data)
-        logger.info(f"[safe_add_strategy] ✅ Добавлена стратегия {strategy_type}:{symbol} ({strategy_id})")
-        return True
-
+        result = fn(*args)
     except Exception as e:
-        logger.exception(f"[safe_add_strategy] ❌ Ошибка добавления стратегии: {e}")
-        return False
-
-
-
-
-
+        metrics.observe_rest("ccxt", fn.__name__, started, e)
+        connection.report_failure(e)
+        raise
+    metrics.observe_rest("ccxt", fn.__name__, started)
+    metrics.observe_weight("ccxt", getattr(getattr(fn, "__self__", None), "last_response_headers", None))
+    connection.report_success()
+    return result
 
 
 # --- Нормализация символа ---
@@ -194,11 +91,31 @@ def normalize_symbol(symbol: str) -> str:
     return s
 
 
+# --- Вызовы ccxt, которые объединяются через _reads ---
+def _fetch_balance():
+    record_api_call()
+    return _call(get_exchange().fetch_balance)
+
+
+def _fetch_ticker(symbol: str):
+    record_api_call()
+    ticker = _call(get_exchange().fetch_ticker, symbol)
+    ticks.record_ticker(symbol, ticker)
+    return ticker
+
+
+def _fetch_tickers(symbols: Tuple[str, ...]):
+    record_api_call()
+    tickers = _call(get_exchange().fetch_tickers, list(symbols))
+    for symbol, ticker in tickers.items():
+        ticks.record_ticker(symbol, ticker)
+    return tickers
+
+
 # --- Получение баланса ---
 def get_balance() -> Dict[str, float]:
     try:
-        record_api_call()
-        bal = exchange.fetch_balance()
+        bal = _reads.do("balance", _fetch_balance)
         totals = bal.get("total", bal)
         result = {
             asset: float(amt)
@@ -214,86 +131,282 @@ def get_balance() -> Dict[str, float]:
 # --- Получение цены ---
 def get_price(symbol: str):
     try:
-        record_api_call()
-        if symbol not in exchange.symbols:
+        if symbol not in get_exchange().symbols:
             logger.warning(f"❌ Пара {symbol} не поддерживается")
             return None
-        ticker = exchange.fetch_ticker(symbol)
+        ticker = _reads.do(("ticker", symbol), _fetch_ticker, symbol)
         return ticker.get("last")
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Ошибка get_price {symbol}: {e}")
         return None
 
 
+# --- Получение цен пачкой ---
+def get_prices(symbols: List[str]) -> Dict[str, float | None]:
+    """
+    Цены для нескольких пар одним запросом (fetch_tickers).
+    Если пакетный запрос не поддерживается или упал — поштучные fetch_ticker,
+    не более MAX_PARALLEL_PRICE_REQUESTS одновременно.
+    Для неподдерживаемых пар возвращается None.
+    """
+    exchange = get_exchange()
+    result: Dict[str, float | None] = {s: None for s in symbols}
+    known = [s for s in result if s in exchange.symbols]
+    for s in result:
+        if s not in exchange.symbols:
+            logger.warning(f"❌ Пара {s} не поддерживается")
+    if not known:
+        return result
+
+    if exchange.has.get("fetchTickers"):
+        try:
+            batch = tuple(known)
+            tickers = _reads.do(("tickers", batch), _fetch_tickers, batch)
+            for s in known:
+                ticker = tickers.get(s)
+                if ticker:
+                    result[s] = ticker.get("last")
+            return result
+        except deadline.DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Пакетный запрос цен не удался ({e}), запрашиваю по одной паре...")
+
+    # у каждой задачи своя копия контекста — дедлайн запуска действует и в пуле
+    futures = [_price_pool.submit(contextvars.copy_context().run, get_price, s) for s in known]
+    for s, future in zip(known, futures):
+        result[s] = future.result()
+    return result
+
+
+# --- Шаги пары ---
+def get_scale(symbol: str) -> Scale:
+    """
+    Разрядность и шаги объёма/цены пары для целочисленной арифметики (fixed.Scale).
+    Кэшируется на символ: после первого вызова — поиск в словаре, без обращения к бирже.
+    Первый вызов читает markets подключения (загружены при подключении).
+    """
+    scale = _scales.get(symbol)
+    if scale is None:
+        exchange = get_exchange()
+        market = exchange.markets.get(symbol)
+        if market is None:
+            return Scale()  # неизвестная пара — не кэшируем, вдруг появится после перезагрузки рынков
+        tick_size = getattr(exchange, "precisionMode", None) == ccxt.TICK_SIZE
+        scale = _scales[symbol] = Scale.from_market(market, tick_size=tick_size)
+    return scale
+
+
+async def scale_for(symbol: str) -> Scale:
+    """get_scale для event loop: из кэша сразу, в первый раз — в потоке executors.market_data."""
+    return _scales.get(symbol) or await executors.market_data.run(get_scale, symbol)
+
+
 # --- Проверка минимального ордера ---
-def _check_min_order(symbol: str, amount: float) -> Tuple[bool, str]:
-    market = exchange.markets.get(symbol)
+def _check_min_order(symbol: str, amount: float, price: float | None = None) -> Tuple[bool, str]:
+    """Объём не меньше шага пары, сумма — не меньше минимума биржи (по price, иначе по текущей цене)."""
+    market = get_exchange().markets.get(symbol)
     if not market:
         return False, f"❌ Пара {symbol} не найдена."
 
-    price = get_price(symbol)
+    price = price or get_price(symbol)
     if not price:
         return False, f"❌ Не удалось получить цену {symbol}"
 
-    cost = amount * price
-    min_cost = market["limits"]["cost"]["min"]
-    if min_cost and cost < min_cost:
-        return False, f"❌ Ордер слишком мал: {cost:.2f} < {min_cost:.2f} USDT"
+    scale = get_scale(symbol)
+    qty = scale.qty(amount)
+    if not qty:
+        return False, f"❌ Объём {amount} меньше шага пары {scale.format_qty(scale.lot)}"
+    cost = qty * scale.px(price)
+    if scale.min_cost and cost < scale.min_cost:
+        return False, (f"❌ Ордер слишком мал: {scale.format_cost(cost, 2)} < "
+                       f"{scale.format_cost(scale.min_cost, 2)} USDT")
     return True, ""
 
 
 # --- Проверка баланса ---
-def has_enough_balance(symbol: str, side: str, amount: float) -> Tuple[bool, str]:
+def has_enough_balance(symbol: str, side: str, amount: float, price: float | None = None) -> Tuple[bool, str]:
+    """Хватит ли свободного баланса на ордер (покупка — по price, иначе по текущей цене)."""
     try:
         balance = get_balance()
         base, quote = symbol.split("/")
-        price = get_price(symbol)
+        price = price or get_price(symbol)
 
         if not price:
             return False, "❌ Не удалось получить цену"
 
+        scale = get_scale(symbol)
+        qty = scale.qty(amount)
         if side == "buy":
-            required_quote = price * amount
             available_quote = float(balance.get(quote, 0))
             return (
-                available_quote >= required_quote,
-                f"Баланс {quote}={available_quote:.4f}, нужно {required_quote:.4f}"
+                scale.cost(available_quote) >= qty * scale.px(price),
+                f"Баланс {quote}={available_quote:.4f}, нужно {price * amount:.4f}"
             )
         elif side == "sell":
             available_base = float(balance.get(base, 0))
             return (
-                available_base >= amount,
+                scale.qty(available_base) >= qty,
                 f"Баланс {base}={available_base:.4f}, нужно {amount:.4f}"
             )
 
         return False, "❌ Неизвестный side"
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
         return False, f"❌ Ошибка проверки баланса: {e}"
 
 
+# --- Поиск ордера по clientOrderId ---
+def lookup_order(symbol: str, client_id: str):
+    """Ордер по origClientOrderId или None, если биржа его не знает."""
+    try:
+        record_api_call()
+        return _call(get_exchange().fetch_order, None, symbol, {"origClientOrderId": client_id})
+    except ccxt.OrderNotFound:
+        return None
+
+
+# --- Отмена ордера по clientOrderId ---
+def cancel_order(symbol: str, client_id: str):
+    """Отменяет открытый ордер; None — биржа его не знает или он уже исполнен / отменён."""
+    try:
+        record_api_call()
+        order = _call(get_exchange().cancel_order, None, symbol, {"origClientOrderId": client_id})
+    except ccxt.OrderNotFound:
+        return None
+    if journal.get(client_id) is not None:
+        journal.record_placed(client_id, order)
+    return order
+
+
 # --- Размещение ордера с блокировкой ---
-async def place_market_order_safe(symbol: str, side: str, amount: float):
+async def place_market_order_safe(symbol: str, side: str, amount: float, strategy: str | None = None, client_id: str | None = None):
+    """
+    Рыночный ордер с идемпотентным clientOrderId и записью в журнал (order_journal).
+    Повторный вызов с тем же client_id не создаёт второй ордер: сначала журнал,
+    затем проверка на бирже по origClientOrderId.
+    Проверки — в потоках executors.account, сам ордер — в executors.orders.
+    """
+    return await _place_order_safe(symbol, side, "market", amount, None, strategy, client_id)
+
+
+async def place_limit_order_safe(symbol: str, side: str, amount: float, price: float,
+                                 strategy: str | None = None, client_id: str | None = None, hold: bool = False):
+    """
+    Лимитный ордер (GTC) по цене price, округлённой до шага цены пары; те же гарантии,
+    что у place_market_order_safe. Минимум и баланс проверяются по цене ордера.
+    Возвращает ордер ccxt сразу после постановки — исполнение проверяется отдельно (lookup_order).
+    hold — покупка под продажу (см. OrderJournal.record_intent).
+    """
+    return await _place_order_safe(symbol, side, "limit", amount, price, strategy, client_id, hold)
+
+
+async def _place_order_safe(symbol: str, side: str, type_: str, amount: float, price: float | None,
+                            strategy: str | None, client_id: str | None, hold: bool = False):
     symbol = normalize_symbol(symbol)
     if symbol not in _order_locks:
         _order_locks[symbol] = asyncio.Lock()
 
     async with _order_locks[symbol]:
-        ok, msg = _check_min_order(symbol, amount)
+        if client_id:
+            entry = journal.get(client_id)
+            if entry and entry.get("status") == PLACED:
+                metrics.count_order(side, metrics.DUPLICATE)
+                return entry.get("order")
+            if entry and entry.get("status") == INTENT:
+                existing = await executors.orders.run(lookup_order, symbol, client_id)
+                if existing is not None:
+                    await executors.orders.run(journal.record_placed, client_id, existing)
+                    metrics.count_order(side, metrics.RECOVERED)
+                    return existing
+        else:
+            client_id = journal.new_client_id(strategy)
+
+        ok, msg = await executors.account.run(_check_min_order, symbol, amount, price)
         if not ok:
+            metrics.count_order(side, metrics.REJECTED)
             raise Exception(msg)
 
-        ok, msg = has_enough_balance(symbol, side, amount)
+        ok, msg = await executors.account.run(has_enough_balance, symbol, side, amount, price)
         if not ok:
+            metrics.count_order(side, metrics.REJECTED)
             raise Exception(msg)
 
-        try:
-            record_api_call()
-            order = await asyncio.to_thread(exchange.create_market_order, symbol, side, amount)
-            logger.info(f"✅ Market order {side} {amount} {symbol} executed.")
+        # объём — вниз до шага пары, цена — до шага цены: в журнал и на биржу уходят ровно они
+        scale = get_scale(symbol)  # уже в кэше после проверок
+        amount = scale.qty_float(scale.qty(amount))
+        if price is not None:
+            price = scale.px_float(scale.px(price))
+
+        deadline.check(f"create_{type_}_order")
+        # намерение на диске (fsync в потоке orders) до отправки ордера
+        await executors.orders.run(journal.record_intent, client_id, symbol, side, type_, amount, price,
+                                   strategy, hold)
+
+        async def _submit():
+            try:
+                record_api_call()
+                exchange = get_exchange()
+                create = exchange.create_market_order if type_ == "market" else exchange.create_limit_order
+                order = await executors.orders.run(
+                    _call, create, symbol, side, amount, price, {"newClientOrderId": client_id}
+                )
+            except ccxt.NetworkError as e:
+                # исход неизвестен — проверяем, дошёл ли ордер до биржи
+                logger.warning(f"⚠️ Неясный исход ордера {client_id}: {e}. Проверка по origClientOrderId...")
+                try:
+                    existing = await executors.orders.run(lookup_order, symbol, client_id)
+                except Exception:
+                    metrics.count_order(side, metrics.UNKNOWN)
+                    logger.error(f"place_{type_}_order error: {e} (ордер {client_id} остаётся незавершённым)")
+                    raise e
+                if existing is None:
+                    # ордер мог ещё не дойти до движка — оставляем его незавершённым до сверки
+                    metrics.count_order(side, metrics.UNKNOWN)
+                    logger.error(f"place_{type_}_order error: {e} (ордер {client_id} не найден, ждёт сверки)")
+                    raise
+                order = existing
+                metrics.count_order(side, metrics.RECOVERED)
+            except Exception as e:
+                await executors.orders.run(journal.record_failed, client_id, e)
+                metrics.count_order(side, metrics.FAILED)
+                logger.error(f"place_{type_}_order error: {e}")
+                raise
+            else:
+                metrics.count_order(side, metrics.PLACED)
+
+            await executors.orders.run(journal.record_placed, client_id, order)
+            if type_ == "market":
+                logger.info(f"✅ Market order {side} {amount} {symbol} executed ({client_id}).")
+            else:
+                logger.info(f"✅ Limit order {side} {amount} {symbol} @ {price} placed ({client_id}).")
             return order
-        except Exception as e:
-            logger.error(f"place_market_order error: {e}")
-            raise
 
-# --- Инициализация соединения ---
-exchange = get_exchange()
+        return await deadline.complete_if_cancelled(_submit())
+
+
+# --- Сверка незавершённых ордеров после рестарта ---
+def reconcile_orders() -> int:
+    """
+    Проверяет на бирже ордера из журнала с неизвестным исходом и записывает результат.
+    Возвращает число сверенных ордеров. Блокирующая: из async-кода — через asyncio.to_thread.
+    """
+    done = 0
+    for entry in journal.pending():
+        client_id = entry["client_id"]
+        try:
+            order = lookup_order(entry["symbol"], client_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сверить ордер {client_id}: {e}")
+            continue
+        if order is None:
+            journal.record_failed(client_id, "не найден на бирже при сверке")
+        else:
+            journal.record_placed(client_id, order)
+        done += 1
+    if done:
+        logger.info(f"🧾 Сверено незавершённых ордеров: {done}")
+    return done